@@ -1,24 +1,52 @@
-from flask import Flask, request, jsonify
+from flask import (Flask, request, jsonify, g, has_app_context, Response,
+                   stream_with_context, send_file)
 from flask_sqlalchemy import SQLAlchemy
 from flask_cors import CORS
 from datetime import datetime, timedelta, timezone
 import os
 import stripe
 from twilio.rest import Client
-from sendgrid import SendGridAPIClient
+from twilio.http.http_client import TwilioHttpClient
+from twilio.base.exceptions import TwilioRestException
+import requests
 from sendgrid.helpers.mail import Mail
 import random
-import string
 from dotenv import load_dotenv
 from functools import wraps
 import jwt
 import bcrypt
 from flask_migrate import Migrate
 from werkzeug.security import generate_password_hash
-from sqlalchemy import Text
+from sqlalchemy import Text, and_, or_, event, func, insert, update, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Engine
 import hashlib
+import hmac
 import time
 from flask_caching import Cache
+import json
+import csv
+import io
+import threading
+import tempfile
+import gzip
+import zlib
+import base64
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+from collections import OrderedDict
+from contextlib import contextmanager, ExitStack
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+try:
+    from PIL import Image, ImageOps, features as image_features
+except ImportError:  # without Pillow menu images are served from their original URLs
+    Image = None
 
 load_dotenv()
 
@@ -28,8 +56,9 @@ CORS(app, resources={
     r"/*": {
         "origins": ["http://localhost:3000"],
         "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS"],
-        "allow_headers": ["Content-Type", "Authorization"],
-        "expose_headers": ["Content-Type", "Authorization"],
+        "allow_headers": ["Content-Type", "Authorization", "Idempotency-Key"],
+        "expose_headers": ["Content-Type", "Authorization", "ETag", "X-Menu-Version", "X-Next-Cursor",
+                           "Idempotent-Replayed"],
         "supports_credentials": True
     }
 })
@@ -41,13 +70,42 @@ app.config['CORS_HEADERS'] = 'Content-Type'
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL')
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+# Raise instead of logging when a route goes over its SQL statement budget
+app.config['ENFORCE_QUERY_BUDGET'] = os.getenv('ENFORCE_QUERY_BUDGET') == '1'
+# Connection pool per worker process; size it to at least the worker's thread count
+if not (app.config['SQLALCHEMY_DATABASE_URI'] or '').startswith('sqlite'):
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+        'pool_size': int(os.getenv('DB_POOL_SIZE', '5')),
+        'max_overflow': int(os.getenv('DB_MAX_OVERFLOW', '10')),
+        'pool_timeout': int(os.getenv('DB_POOL_TIMEOUT', '30')),
+        'pool_recycle': int(os.getenv('DB_POOL_RECYCLE', '1800')),  # drop connections older than this
+        'pool_pre_ping': os.getenv('DB_POOL_PRE_PING', '1') == '1'
+    }
 db = SQLAlchemy(app)
 
 # Initialize Flask-Migrate
 migrate = Migrate(app, db)
 
+# Outbound HTTP: every provider shares keep-alive pools and bounded timeouts,
+# and a circuit breaker stops calling a provider that keeps failing
+OUTBOUND_TIMEOUT = (
+    float(os.getenv('OUTBOUND_CONNECT_TIMEOUT', '3.05')),
+    float(os.getenv('OUTBOUND_READ_TIMEOUT', '10'))
+)
+OUTBOUND_POOL_SIZE = int(os.getenv('OUTBOUND_POOL_SIZE', '10'))  # kept-alive connections per host
+BREAKER_FAILURE_THRESHOLD = int(os.getenv('BREAKER_FAILURE_THRESHOLD', '5'))  # consecutive failures
+BREAKER_RESET_SECONDS = float(os.getenv('BREAKER_RESET_SECONDS', '30'))  # open time before a trial call
+
+def pooled_session():
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=OUTBOUND_POOL_SIZE)
+    session.mount('https://', adapter)
+    return session
+
 # Stripe configuration
 stripe.api_key = os.getenv('STRIPE_SECRET_KEY')
+stripe.default_http_client = stripe.http_client.RequestsClient(timeout=OUTBOUND_TIMEOUT, session=pooled_session())
+stripe.max_network_retries = int(os.getenv('STRIPE_MAX_NETWORK_RETRIES', '1'))  # Stripe adds idempotency keys
 
 #payfast configuration
 PAYFAST_MERCHANT_ID = os.getenv('PAYFAST_MERCHANT_ID')
@@ -61,20 +119,162 @@ PAYFAST_URL = (
 )
 
 # Twilio configuration
+twilio_http_client = TwilioHttpClient(timeout=OUTBOUND_TIMEOUT[1])  # Twilio takes a single timeout
+twilio_http_client.session = pooled_session()
 twilio_client = Client(
     os.getenv('TWILIO_ACCOUNT_SID'),
-    os.getenv('TWILIO_AUTH_TOKEN')
+    os.getenv('TWILIO_AUTH_TOKEN'),
+    http_client=twilio_http_client
 )
 
-# SendGrid configuration
-sendgrid_client = SendGridAPIClient(os.getenv('SENDGRID_API_KEY'))
-
-# Caching configuration
+# SendGrid configuration; mail is posted over the shared pool rather than
+# the SendGrid client, which opens a new connection for every send
+SENDGRID_API_KEY = os.getenv('SENDGRID_API_KEY')
+SENDGRID_MAIL_URL = 'https://api.sendgrid.com/v3/mail/send'
+sendgrid_session = pooled_session()
+
+# Caching configuration; SimpleCache is per process, so with more than one
+# worker use RedisCache (CACHE_REDIS_URL) or, on a single host,
+# FileSystemCache (CACHE_DIR) and every worker shares one cache.
+# gunicorn.conf.py refuses SimpleCache with more than one worker
+CACHE_NAMESPACE = os.getenv('CACHE_NAMESPACE', 'kiosk')  # keeps deployments sharing a Redis apart
+CACHE_TYPE = os.getenv('CACHE_TYPE', 'SimpleCache')
+CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(tempfile.gettempdir(), f'{CACHE_NAMESPACE}-cache'))
 cache = Cache(config={
-    'CACHE_TYPE': 'simple',
-    'CACHE_DEFAULT_TIMEOUT': 300  # 5 minutes
+    'CACHE_TYPE': CACHE_TYPE,
+    'CACHE_DEFAULT_TIMEOUT': 300,  # 5 minutes
+    'CACHE_KEY_PREFIX': f'{CACHE_NAMESPACE}:',
+    'CACHE_REDIS_URL': os.getenv('CACHE_REDIS_URL', 'redis://localhost:6379/0'),
+    'CACHE_DIR': CACHE_DIR,
+    'CACHE_THRESHOLD': int(os.getenv('CACHE_THRESHOLD', '500'))
 })
 cache.init_app(app)
+# FileSystemCache.add() is check-then-set, so its locks are O_EXCL files instead
+CACHE_LOCK_DIR = f'{CACHE_DIR}.locks' if CACHE_TYPE.endswith('FileSystemCache') else None
+CACHE_LOCK_SECONDS = 10  # a lock left by a crashed worker expires after this
+CACHE_BUILD_WAIT_SECONDS = float(os.getenv('CACHE_BUILD_WAIT_SECONDS', '5'))  # then build it ourselves
+# How often each worker checks for invalidations broadcast by the others
+INVALIDATION_POLL_SECONDS = float(os.getenv('INVALIDATION_POLL_SECONDS', '1'))
+
+# Menu snapshots are keyed by version, so they never need a timer to go stale.
+# The version state itself lives in the shared_version table, since cache
+# backends evict entries without a timeout first; the cache holds a copy
+MENU_VERSION_KEY = 'menu:version'
+MENU_VERSION_CACHE_SECONDS = 60  # a copy that lost a race with a bump heals within this
+MENU_SNAPSHOT_TIMEOUT = 24 * 60 * 60  # 1 day, only to reclaim old versions
+MENU_SNAPSHOT_MEMO_SIZE = 32  # decoded snapshots each worker keeps in memory
+menu_version_lock = threading.Lock()
+
+# Admin order listing
+ORDERS_PAGE_SIZE = 50
+ORDERS_MAX_PAGE_SIZE = 200
+ORDER_FIELDS = ('id', 'order_number', 'email', 'phone', 'total_amount', 'status', 'created_at', 'items')
+
+# Pricing
+CENT = Decimal('0.01')
+# Reject orders whose client total disagrees with the server total; off by
+# default because the kiosk takes payment before it completes the order. The
+# kiosk displays and reports the amount create-payment-intent returns, so a
+# mismatch means the menu changed between payment and completion
+PRICING_ENFORCE_TOTALS = os.getenv('PRICING_ENFORCE_TOTALS') == '1'
+
+# Bulk menu import/export
+MENU_EXPORT_FIELDS = ('name', 'description', 'price', 'category', 'image_url', 'is_available',
+                      'extras', 'sizes', 'piece_options')
+MENU_IMPORT_BATCH_SIZE = 200  # rows inserted per statement
+MENU_IMPORT_MAX_PRICE = Decimal('100000000')  # prices are NUMERIC(10, 2)
+MENU_IMPORT_MAX_ROWS = int(os.getenv('MENU_IMPORT_MAX_ROWS', '5000'))
+MENU_IMPORT_MAX_ERRORS = 100  # stop reporting after this many bad rows
+
+# Order export reads this many line items per round trip of the server-side cursor
+ORDER_EXPORT_BATCH_SIZE = int(os.getenv('ORDER_EXPORT_BATCH_SIZE', '2000'))
+ORDER_EXPORT_FIELDS = ('order_number', 'created_at', 'status', 'email', 'phone', 'total_amount',
+                       'item_name', 'quantity', 'price', 'line_total', 'extras', 'size', 'piece_option')
+
+# Metrics are kept per process and exposed in Prometheus text format at /metrics
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')  # bearer token for /metrics; unset keeps it off
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+
+# Menu change log
+MENU_CHANGES_PAGE_SIZE = 500
+MENU_CHANGE_RETENTION_DAYS = int(os.getenv('MENU_CHANGE_RETENTION_DAYS', '30'))
+
+# Stock levels: sold-out flags and optional counts for items, extras and
+# sizes, read from a per-process index so 86'ing an item never touches the
+# cached menu; the database row stays authoritative for decrements
+STOCK_ENTITIES = ('menu_item', 'extra', 'size')
+STOCK_INDEX_TTL_SECONDS = float(os.getenv('STOCK_INDEX_TTL_SECONDS', '1'))
+
+# Image proxy: menu images are served as resized variants cached on disk.
+# Variant URLs are cached as immutable, so a replaced image needs a new URL
+IMAGE_CACHE_DIR = os.getenv('IMAGE_CACHE_DIR', os.path.join(tempfile.gettempdir(), f'{CACHE_NAMESPACE}-images'))
+IMAGE_BASE_URL = os.getenv('IMAGE_BASE_URL', '')  # empty means site-relative /api/images/ paths
+IMAGE_WIDTHS = (160, 320, 480, 640, 960, 1280)  # a requested width rounds up to one of these
+IMAGE_DEFAULT_WIDTH = 480
+IMAGE_QUALITY = {'avif': 50, 'webp': 75, 'jpeg': 80}
+IMAGE_MAX_SOURCE_BYTES = int(os.getenv('IMAGE_MAX_SOURCE_BYTES', str(15 * 1024 * 1024)))
+IMAGE_MAX_AGE = 365 * 24 * 60 * 60  # for URLs that carry the content hash
+IMAGE_DIGEST_LENGTH = 16  # hex digits of the content hash in a variant URL
+# A source URL is downloaded again after this, so an image replaced behind
+# the same URL reaches menus under a new hash
+IMAGE_SOURCE_TTL_SECONDS = int(os.getenv('IMAGE_SOURCE_TTL_SECONDS', str(24 * 60 * 60)))
+
+# Checkout retries are answered from the order they already created; the
+# unique key column is authoritative, this cache only saves the lookup
+CHECKOUT_KEY_CACHE_SIZE = int(os.getenv('CHECKOUT_KEY_CACHE_SIZE', '4096'))
+
+# Order numbers are handed out from blocks reserved in the database, so
+# workers never collide and only touch the database once per block. A
+# number is the sequence value, which keeps inserts into the order_number
+# index close to its end, followed by a check keyed with ORDER_NUMBER_KEY:
+# the public order-status lookup takes just the number, so a neighbour's
+# number cannot be worked out from your own
+ORDER_NUMBER_ALPHABET = '0123456789ABCDEFGHJKMNPQRSTVWXYZ'  # Crockford base32, in ASCII order
+ORDER_SEQUENCE_LENGTH = 6  # room for 32 ** 6, about a billion orders
+ORDER_CHECK_LENGTH = 4  # one guess in about a million finds an order
+ORDER_NUMBER_START = 32 ** 7  # where the sequence row is seeded; subtracted before encoding
+ORDER_NUMBER_BLOCK_SIZE = int(os.getenv('ORDER_NUMBER_BLOCK_SIZE', '50'))
+ORDER_NUMBER_KEY = os.getenv('ORDER_NUMBER_KEY', '').encode('utf-8')
+if not ORDER_NUMBER_KEY or ORDER_NUMBER_KEY == os.getenv('JWT_SECRET_KEY', '').encode('utf-8'):
+    # A key of its own, so rotating the JWT secret leaves order numbers alone
+    raise RuntimeError('Set ORDER_NUMBER_KEY to a secret that is not JWT_SECRET_KEY')
+# Numbers are longer than the random ones issued before the sequence, so
+# only a row written outside the allocator can hold one; draw again if so
+ORDER_NUMBER_ATTEMPTS = 5
+
+# Verified admin tokens are cached so authenticated requests skip the
+# database; revocations are broadcast, and the TTL bounds any that are missed
+TOKEN_CACHE_SIZE = int(os.getenv('TOKEN_CACHE_SIZE', '1024'))
+TOKEN_CACHE_TTL_SECONDS = int(os.getenv('TOKEN_CACHE_TTL_SECONDS', '60'))
+
+# Live order stream
+ORDER_STREAM_POLL_SECONDS = float(os.getenv('ORDER_STREAM_POLL_SECONDS', '1'))
+ORDER_STREAM_HEARTBEAT_SECONDS = 15
+ORDER_STREAM_BATCH_SIZE = 100
+# Each open stream holds a server thread for as long as the page is open, so
+# a worker serves only this many; see gunicorn.conf.py for the thread budget
+ORDER_STREAM_MAX_PER_WORKER = int(os.getenv('ORDER_STREAM_MAX_PER_WORKER', '4'))
+# EventSource cannot send headers, so it opens the stream with a ticket in the
+# URL instead of the admin token; a ticket is short-lived and opens nothing else
+ORDER_STREAM_TICKET_SECONDS = 60
+# How often an open stream checks that its admin and session are still valid
+ORDER_STREAM_REVALIDATE_SECONDS = float(os.getenv('ORDER_STREAM_REVALIDATE_SECONDS', '30'))
+
+# Notification outbox
+NOTIFICATION_PROVIDER = os.getenv('NOTIFICATION_PROVIDER', 'live')  # 'live' or 'fake'
+NOTIFICATION_POLL_SECONDS = float(os.getenv('NOTIFICATION_POLL_SECONDS', '5'))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv('NOTIFICATION_MAX_ATTEMPTS', '6'))
+NOTIFICATION_BACKOFF_SECONDS = 30  # doubled after every failed attempt
+NOTIFICATION_MAX_BACKOFF_SECONDS = 60 * 60
+NOTIFICATION_LEASE_SECONDS = 120  # a 'sending' row older than this is retried
+NOTIFICATION_CONCURRENCY = {
+    'sms': int(os.getenv('NOTIFICATION_SMS_CONCURRENCY', '2')),
+    'email': int(os.getenv('NOTIFICATION_EMAIL_CONCURRENCY', '4'))
+}
+
+# JSONB on Postgres so line-item options can be indexed and queried
+JSONType = db.JSON().with_variant(postgresql.JSONB(), 'postgresql')
 
 # Models
 class Order(db.Model):
@@ -82,20 +282,27 @@ class Order(db.Model):
     order_number = db.Column(db.String(10), unique=True, nullable=False)
     email = db.Column(db.String(120))
     phone = db.Column(db.String(20))
-    total_amount = db.Column(db.Float, nullable=False)
+    total_amount = db.Column(db.Numeric(10, 2), nullable=False)
     status = db.Column(db.String(20), default='pending')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    idempotency_key = db.Column(db.String(255), unique=True)  # Idempotency-Key header or payment intent id
     items = db.relationship('OrderItem', backref='order', lazy=True)
 
+    # Backs keyset pagination of the admin order list
+    __table_args__ = (db.Index('ix_order_created_at_id', 'created_at', 'id'),)
+
 class OrderItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     order_id = db.Column(db.Integer, db.ForeignKey('order.id'), nullable=False)
     item_name = db.Column(db.String(100), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
-    price = db.Column(db.Float, nullable=False)
-    extras = db.Column(db.Text)
-    size = db.Column(db.Text)
-    piece_option = db.Column(db.Text)
+    price = db.Column(db.Numeric(10, 2), nullable=False)
+    extras = db.Column(JSONType)  # [{'id', 'name', 'price'}, ...]
+    size = db.Column(JSONType)  # {'id', 'name', 'price'} or null
+    piece_option = db.Column(JSONType)  # {'id', 'quantity', 'price'} or null
+    # Snapshot of what was ordered; no foreign keys so history outlives menu edits
+    menu_item_id = db.Column(db.Integer)
+    category_id = db.Column(db.Integer)
 
 class Admin(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -107,33 +314,37 @@ class MenuItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
-    price = db.Column(db.Float, nullable=False)
-    category = db.Column(db.String(50), nullable=False)
+    price = db.Column(db.Numeric(10, 2), nullable=False)
+    category_id = db.Column(db.Integer, db.ForeignKey('category.id'), nullable=False)
     image_url = db.Column(db.String(200))
     is_available = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow)
+    category = db.relationship('Category', backref='menu_items')
     extras = db.relationship('Extra', backref='menu_item', lazy=True, cascade='all, delete-orphan')
     sizes = db.relationship('Size', backref='menu_item', lazy=True, cascade='all, delete-orphan')
     piece_options = db.relationship('PieceOption', backref='menu_item', lazy=True, cascade='all, delete-orphan')
 
+    # Category pages filter on both columns
+    __table_args__ = (db.Index('ix_menu_item_category_available', 'category_id', 'is_available'),)
+
 class Extra(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_item.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
-    price = db.Column(db.Float, nullable=False)
+    price = db.Column(db.Numeric(10, 2), nullable=False)
 
 class Size(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_item.id'), nullable=False)
     name = db.Column(db.String(100), nullable=False)
-    price = db.Column(db.Float, nullable=False)
+    price = db.Column(db.Numeric(10, 2), nullable=False)
 
 class PieceOption(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     menu_item_id = db.Column(db.Integer, db.ForeignKey('menu_item.id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)  # number of pieces
-    price = db.Column(db.Float, nullable=False)  # price for this quantity
+    price = db.Column(db.Numeric(10, 2), nullable=False)  # price for this quantity
     is_default = db.Column(db.Boolean, default=False)  # if this is the default option
 
 class Category(db.Model):
@@ -144,7 +355,323 @@ class Category(db.Model):
     icon = db.Column(db.String(10))  # For storing emoji icons
     is_default = db.Column(db.Boolean, default=False)  # To distinguish default categories
 
+class NotificationOutbox(db.Model):
+    __tablename__ = 'notification_outbox'
+
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey('order.id'))
+    channel = db.Column(db.String(10), nullable=False)  # 'sms' or 'email'
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200))
+    body = db.Column(db.Text, nullable=False)
+    status = db.Column(db.String(10), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    order = db.relationship('Order')
+
+    __table_args__ = (db.Index('ix_notification_outbox_due', 'status', 'next_attempt_at'),)
+
+class SalesRollup(db.Model):
+    __tablename__ = 'sales_rollup'
+
+    period = db.Column(db.String(5), primary_key=True)  # only 'day'; analytics never goes finer
+    bucket_start = db.Column(db.DateTime, primary_key=True)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+
+class ProductRollup(db.Model):
+    __tablename__ = 'product_rollup'
+
+    day = db.Column(db.Date, primary_key=True)
+    item_name = db.Column(db.String(100), primary_key=True)
+    category = db.Column(db.String(50), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+
+class OrderNumberSequence(db.Model):
+    __tablename__ = 'order_number_sequence'
+
+    id = db.Column(db.Integer, primary_key=True)
+    next_value = db.Column(db.BigInteger, nullable=False)
+
+class OrderEvent(db.Model):
+    __tablename__ = 'order_event'
+
+    id = db.Column(db.Integer, primary_key=True)  # doubles as the SSE event id
+    order_number = db.Column(db.String(10), nullable=False)
+    event_type = db.Column(db.String(30), nullable=False)
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class MenuChange(db.Model):
+    __tablename__ = 'menu_change'
+
+    id = db.Column(db.Integer, primary_key=True)  # doubles as the delta sync version
+    entity = db.Column(db.String(20), nullable=False)  # 'menu_item' or 'category'
+    entity_id = db.Column(db.Integer, nullable=False)
+    operation = db.Column(db.String(10), nullable=False)  # insert, update or delete
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+class SharedVersion(db.Model):
+    __tablename__ = 'shared_version'
+
+    # Menu versions and invalidation markers; kept out of the cache, which may evict them
+    name = db.Column(db.String(64), primary_key=True)
+    version = db.Column(db.BigInteger, nullable=False)
+
+class StockLevel(db.Model):
+    __tablename__ = 'stock_level'
+
+    entity = db.Column(db.String(20), primary_key=True)  # 'menu_item', 'extra' or 'size'
+    entity_id = db.Column(db.Integer, primary_key=True)
+    is_available = db.Column(db.Boolean, nullable=False, default=True)
+    remaining = db.Column(db.Integer)  # None means the count is not tracked
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+#shared cache
+def lock_path(name):
+    return os.path.join(CACHE_LOCK_DIR, hashlib.sha256(name.encode('utf-8')).hexdigest()[:32])
+
+def try_file_lock(name, token, timeout):
+    path = lock_path(name)
+    os.makedirs(CACHE_LOCK_DIR, exist_ok=True)
+    for _ in range(2):
+        try:
+            fd = os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o600)
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) < timeout:
+                    return None
+                os.remove(path)  # left behind by a worker that died holding it
+            except FileNotFoundError:
+                pass  # released while we looked, try again
+            continue
+        with os.fdopen(fd, 'w') as f:
+            f.write(token)
+        return token
+    return None
+
+def try_lock(name, timeout=CACHE_LOCK_SECONDS):
+    """Take a lock shared by every worker on the cache; returns a token or None."""
+    token = os.urandom(8).hex()
+    if CACHE_LOCK_DIR is not None:
+        return try_file_lock(name, token, timeout)
+    return token if cache.add(f'lock:{name}', token, timeout=timeout) else None
+
+def release_lock(name, token):
+    if CACHE_LOCK_DIR is not None:
+        try:
+            with open(lock_path(name)) as f:
+                if f.read() == token:
+                    os.remove(lock_path(name))
+        except FileNotFoundError:
+            pass
+        return
+    key = f'lock:{name}'
+    if cache.get(key) == token:
+        cache.delete(key)
+
+@contextmanager
+def shared_lock(name, timeout=CACHE_LOCK_SECONDS):
+    """Hold `name` across workers; after `timeout` carry on rather than hang."""
+    deadline = time.monotonic() + timeout
+    token = try_lock(name, timeout)
+    while token is None and time.monotonic() < deadline:
+        time.sleep(0.01)
+        token = try_lock(name, timeout)
+    try:
+        yield
+    finally:
+        if token is not None:
+            release_lock(name, token)
+
+def build_once(key, builder, timeout):
+    """Build a missing cache entry in one worker while the others wait for it.
+
+    Keeps a menu change from sending every worker to the database at once.
+    A waiter that outlasts CACHE_BUILD_WAIT_SECONDS builds the entry itself.
+    """
+    token = try_lock(key)
+    if token is None:
+        deadline = time.monotonic() + CACHE_BUILD_WAIT_SECONDS
+        while time.monotonic() < deadline:
+            time.sleep(0.02)
+            value = cache.get(key)
+            if value is not None:
+                increment('cache_build_waits_total', outcome='served')
+                return value
+        increment('cache_build_waits_total', outcome='timeout')
+    try:
+        value = builder()
+        cache.set(key, value, timeout=timeout)
+        return value
+    finally:
+        if token is not None:
+            release_lock(key, token)
+
+def read_shared_versions(connection, names):
+    """Return {name: version} for the shared_version rows that exist."""
+    return dict(connection.execute(
+        db.select(SharedVersion.name, SharedVersion.version).where(SharedVersion.name.in_(names))
+    ).all())
+
+def write_shared_versions(connection, versions):
+    """Upsert shared_version rows from {name: version}."""
+    table = SharedVersion.__table__
+    dialect = connection.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(table).values([{'name': name, 'version': version} for name, version in versions.items()])
+        connection.execute(stmt.on_conflict_do_update(index_elements=['name'], set_={'version': stmt.excluded.version}))
+        return
+
+    for name, version in versions.items():
+        if connection.execute(update(table).where(table.c.name == name).values(version=version)).rowcount == 0:
+            connection.execute(table.insert().values(name=name, version=version))
+
+# Invalidation broadcast: each topic has a generation marker in the
+# shared_version table, and workers poll the markers to learn what another
+# worker dropped. They are not kept in the cache, which may evict them
+invalidation_handlers = {}  # topic -> functions that clear per-process state
+invalidation_state = {'checked_at': 0.0, 'generations': {}}
+invalidation_lock = threading.Lock()
+
+def on_invalidate(topic):
+    def decorator(f):
+        invalidation_handlers.setdefault(topic, []).append(f)
+        return f
+    return decorator
+
+def new_generation():
+    # A random marker rather than a counter: setting it needs no read first
+    return int.from_bytes(os.urandom(7), 'big')
+
+def mark_invalidation_seen(topic, generation):
+    """Record a marker this worker wrote, so its own poll does not act on it."""
+    with invalidation_lock:
+        invalidation_state['generations'][topic] = generation
+
+def broadcast_invalidation(topic):
+    """Run `topic`'s handlers here now and in every other worker on its next poll."""
+    generation = new_generation()
+    # Its own transaction; this runs after the change it announces commits
+    with db.engine.begin() as connection:
+        write_shared_versions(connection, {f'invalidate:{topic}': generation})
+    mark_invalidation_seen(topic, generation)
+    for handler in invalidation_handlers.get(topic, []):
+        handler()
+
+@app.before_request
+def poll_invalidations():
+    """Run the handlers for topics other workers invalidated since the last poll."""
+    now = time.monotonic()
+    if now - invalidation_state['checked_at'] < INVALIDATION_POLL_SECONDS:
+        return
+    with invalidation_lock:
+        if now - invalidation_state['checked_at'] < INVALIDATION_POLL_SECONDS:
+            return
+        invalidation_state['checked_at'] = now
+        topics = list(invalidation_handlers)
+        try:
+            with db.engine.connect() as connection:
+                generations = read_shared_versions(connection, [f'invalidate:{topic}' for topic in topics])
+        except Exception as e:
+            # Serve the request anyway; the next poll tries again
+            app.logger.warning(f"Invalidation poll failed: {str(e)}")
+            return
+        stale = []
+        for topic in topics:
+            generation = generations.get(f'invalidate:{topic}')
+            seen = invalidation_state['generations'].get(topic, generation)
+            invalidation_state['generations'][topic] = generation
+            if generation != seen:
+                stale.append(topic)
+    for topic in stale:
+        for handler in invalidation_handlers[topic]:
+            handler()
+
 # Admin Authentication
+token_cache = OrderedDict()  # token -> (admin_id, expires_at)
+token_cache_lock = threading.Lock()
+token_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0, 'revocations': 0}
+
+def password_fingerprint(admin):
+    """Short digest of the password hash; changing the password voids old tokens."""
+    return hashlib.sha256(admin.password.encode('utf-8')).hexdigest()[:16]
+
+def check_admin_claims(payload):
+    """Return the admin a decoded token names, raising if it is gone or its password changed."""
+    admin = db.session.get(Admin, payload['admin_id'])
+    if not admin:
+        raise Exception('Admin not found')
+    if payload.get('pwd', password_fingerprint(admin)) != password_fingerprint(admin):
+        raise Exception('Password changed since the token was issued')
+    return admin
+
+def verify_admin_token(token):
+    """Return the id of the admin a JWT belongs to, raising if it is not valid."""
+    now = time.time()
+    with token_cache_lock:
+        entry = token_cache.get(token)
+        if entry is not None and entry[1] > now:
+            token_cache.move_to_end(token)
+            token_cache_stats['hits'] += 1
+            return entry[0]
+        if entry is not None:
+            del token_cache[token]
+        token_cache_stats['misses'] += 1
+
+    payload = jwt.decode(token, os.getenv('JWT_SECRET_KEY'), algorithms=['HS256'])
+    if 'purpose' in payload:
+        raise Exception('Not an access token')
+    admin = check_admin_claims(payload)
+
+    with token_cache_lock:
+        token_cache[token] = (admin.id, min(now + TOKEN_CACHE_TTL_SECONDS, payload['exp']))
+        token_cache.move_to_end(token)
+        while len(token_cache) > TOKEN_CACHE_SIZE:
+            token_cache.popitem(last=False)
+            token_cache_stats['evictions'] += 1
+    return admin.id
+
+def revoke_admin_tokens(admin_id):
+    """Drop every cached token of an admin so the next request re-verifies."""
+    with token_cache_lock:
+        for token in [t for t, (cached_id, _) in token_cache.items() if cached_id == admin_id]:
+            del token_cache[token]
+            token_cache_stats['revocations'] += 1
+
+@on_invalidate('admin_tokens')
+def clear_token_cache():
+    with token_cache_lock:
+        token_cache_stats['revocations'] += len(token_cache)
+        token_cache.clear()
+
+@event.listens_for(Admin, 'after_delete')
+def revoke_deleted_admin(mapper, connection, target):
+    revoke_admin_tokens(target.id)
+    db.inspect(target).session.info['revoked_admins'] = True
+
+@event.listens_for(Admin, 'after_update')
+def revoke_on_password_change(mapper, connection, target):
+    if db.inspect(target).attrs.password.history.has_changes():
+        revoke_admin_tokens(target.id)
+        db.inspect(target).session.info['revoked_admins'] = True
+
+@event.listens_for(db.session, 'after_commit')
+def broadcast_revocations(session):
+    # Other workers may have cached these tokens; tell them once it is final
+    if session.info.pop('revoked_admins', False):
+        broadcast_invalidation('admin_tokens')
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_revocations(session):
+    session.info.pop('revoked_admins', None)
+
 def admin_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -153,12 +680,7 @@ def admin_required(f):
             return jsonify({'error': 'No authorization header'}), 401
         
         try:
-            token = auth_header.split(' ')[1]
-            payload = jwt.decode(token, os.getenv('JWT_SECRET_KEY'), algorithms=['HS256'])
-            admin_id = payload['admin_id']
-            admin = db.session.get(Admin, admin_id)
-            if not admin:
-                raise Exception('Admin not found')
+            verify_admin_token(auth_header.split(' ')[1])
         except Exception as e:
             return jsonify({'error': 'Invalid token'}), 401
             
@@ -166,18 +688,670 @@ def admin_required(f):
     return decorated_function
 
 
+#metrics
+metrics_lock = threading.Lock()
+metric_help = {
+    'http_request_duration_seconds': ('histogram', 'Time spent handling a request, by route.'),
+    'http_request_db_seconds': ('histogram', 'Time spent in SQL per request, by route.'),
+    'http_request_db_statements': ('histogram', 'SQL statements issued per request, by route.'),
+    'db_query_duration_seconds': ('histogram', 'Duration of individual SQL statements.'),
+    'outbound_request_duration_seconds': ('histogram', 'Duration of calls to Stripe, Twilio and SendGrid.'),
+    'cache_requests_total': ('counter', 'Cache lookups by cache and result.'),
+    'outbound_rejected_total': ('counter', 'Calls refused because the provider circuit was open.'),
+    'outbound_circuit_open': ('gauge', '1 while the circuit breaker for a provider is open.'),
+    'cache_build_waits_total': ('counter', 'Requests that waited for another worker to build a cache entry.')
+}
+histograms = {}  # name -> {labels: [bucket counts, sum, count]}
+counters = {}  # name -> {labels: value}
+
+def observe(name, value, buckets=LATENCY_BUCKETS, **labels):
+    key = tuple(sorted(labels.items()))
+    with metrics_lock:
+        series = histograms.setdefault(name, {}).setdefault(key, [[0] * len(buckets), 0.0, 0, buckets])
+        for i, bound in enumerate(buckets):
+            if value <= bound:
+                series[0][i] += 1
+        series[1] += value
+        series[2] += 1
+
+def increment(name, amount=1, **labels):
+    key = tuple(sorted(labels.items()))
+    with metrics_lock:
+        series = counters.setdefault(name, {})
+        series[key] = series.get(key, 0) + amount
+
+def record_cache(cache_name, hit):
+    increment('cache_requests_total', cache=cache_name, result='hit' if hit else 'miss')
+
+@contextmanager
+def timed_call(service, operation):
+    """Time an outbound API call, labelling whether it raised."""
+    start = time.perf_counter()
+    outcome = 'error'
+    try:
+        yield
+        outcome = 'ok'
+    finally:
+        observe('outbound_request_duration_seconds', time.perf_counter() - start,
+                service=service, operation=operation, outcome=outcome)
+
+#circuit breakers
+class ProviderUnavailable(Exception):
+    """Raised without calling a provider while its circuit breaker is open."""
+
+breaker_lock = threading.Lock()
+provider_breakers = {
+    provider: {'failures': 0, 'opened_at': None, 'trial': False}
+    for provider in ('stripe', 'twilio', 'sendgrid')
+}
+
+def breaker_allows(provider):
+    """Closed: allow. Open: refuse until the reset time, then let one trial call through."""
+    with breaker_lock:
+        state = provider_breakers[provider]
+        if state['opened_at'] is None:
+            return True
+        if time.monotonic() - state['opened_at'] < BREAKER_RESET_SECONDS or state['trial']:
+            return False
+        state['trial'] = True
+        return True
+
+def breaker_record(provider, failed):
+    with breaker_lock:
+        state = provider_breakers[provider]
+        state['trial'] = False
+        if not failed:
+            state.update(failures=0, opened_at=None)
+            return
+        state['failures'] += 1
+        if state['opened_at'] is not None or state['failures'] >= BREAKER_FAILURE_THRESHOLD:
+            state['opened_at'] = time.monotonic()
+            app.logger.warning(f"Circuit open for {provider} after {state['failures']} failures")
+
+def is_provider_outage(error):
+    """Timeouts, connection errors and 5xx count against a provider; 4xx do not."""
+    if isinstance(error, requests.RequestException):
+        return error.response is None or error.response.status_code >= 500
+    if isinstance(error, stripe.error.APIConnectionError):
+        return True
+    if isinstance(error, stripe.error.StripeError):
+        return (error.http_status or 0) >= 500
+    if isinstance(error, TwilioRestException):
+        return error.status >= 500
+    return False
+
+@contextmanager
+def provider_call(provider, operation):
+    """Guard and time an outbound call; raises ProviderUnavailable while the circuit is open."""
+    if not breaker_allows(provider):
+        increment('outbound_rejected_total', provider=provider)
+        raise ProviderUnavailable(f'{provider} is unavailable, try again shortly')
+    try:
+        with timed_call(provider, operation):
+            yield
+    except Exception as e:
+        breaker_record(provider, is_provider_outage(e))
+        raise
+    breaker_record(provider, False)
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def format_labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{name}="{escape_label(value)}"' for name, value in labels) + '}'
+
+def render_metrics():
+    with metrics_lock:
+        histogram_copy = {name: {k: (list(v[0]), v[1], v[2], v[3]) for k, v in series.items()}
+                          for name, series in histograms.items()}
+        counter_copy = {name: dict(series) for name, series in counters.items()}
+    # The admin token cache keeps its own counters for /api/admin/cache-stats
+    with token_cache_lock:
+        counter_copy.setdefault('cache_requests_total', {}).update({
+            (('cache', 'admin_token'), ('result', 'hit')): token_cache_stats['hits'],
+            (('cache', 'admin_token'), ('result', 'miss')): token_cache_stats['misses']
+        })
+    with breaker_lock:
+        counter_copy['outbound_circuit_open'] = {
+            (('provider', provider),): int(state['opened_at'] is not None)
+            for provider, state in provider_breakers.items()
+        }
+
+    lines = []
+    for name in sorted(set(histogram_copy) | set(counter_copy)):
+        kind, help_text = metric_help[name]
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} {kind}')
+        for labels, value in sorted(counter_copy.get(name, {}).items()):
+            lines.append(f'{name}{format_labels(labels)} {value}')
+        for labels, (bucket_counts, total, count, buckets) in sorted(histogram_copy.get(name, {}).items()):
+            for bound, bucket_count in zip(buckets, bucket_counts):
+                lines.append(f'{name}_bucket{format_labels(labels + (("le", str(bound)),))} {bucket_count}')
+            lines.append(f'{name}_bucket{format_labels(labels + (("le", "+Inf"),))} {count}')
+            lines.append(f'{name}_sum{format_labels(labels)} {total}')
+            lines.append(f'{name}_count{format_labels(labels)} {count}')
+    return '\n'.join(lines) + '\n'
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.sql_seconds = 0.0
+    g.sql_statements = 0
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.get('request_started')
+    if started is not None:
+        # Streaming responses are timed until their first byte is ready
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        observe('http_request_duration_seconds', time.perf_counter() - started,
+                method=request.method, route=route, status=str(response.status_code))
+        observe('http_request_db_seconds', g.get('sql_seconds', 0.0), route=route)
+        observe('http_request_db_statements', g.get('sql_statements', 0), buckets=STATEMENT_BUCKETS, route=route)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Route names, error rates and provider state are not for the public
+    if not METRICS_TOKEN:
+        return jsonify({'error': 'Not found'}), 404
+    supplied = request.headers.get('Authorization', '').encode('utf-8')
+    if not hmac.compare_digest(supplied, f'Bearer {METRICS_TOKEN}'.encode('utf-8')):
+        return jsonify({'error': 'Invalid token'}), 401
+    return Response(render_metrics(), mimetype='text/plain; version=0.0.4')
+
+#query budgets
+@event.listens_for(Engine, 'before_cursor_execute')
+def count_sql_statement(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+    if has_app_context():
+        g.sql_statements = g.get('sql_statements', 0) + 1
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def time_sql_statement(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['query_started'].pop()
+    observe('db_query_duration_seconds', elapsed)
+    if has_app_context():
+        g.sql_seconds = g.get('sql_seconds', 0.0) + elapsed
+
+def query_budget(limit):
+    """Flag a read that issues more than `limit` SQL statements per call.
+
+    Only GET and HEAD are budgeted; writes vary with their payload, so their
+    statement counts are pinned by tests/test_query_budgets.py instead.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return f(*args, **kwargs)
+            start = g.get('sql_statements', 0)
+            response = f(*args, **kwargs)
+            used = g.get('sql_statements', 0) - start
+            if used > limit:
+                message = f"{request.endpoint} issued {used} SQL statements (budget {limit})"
+                if app.config['ENFORCE_QUERY_BUDGET']:
+                    raise AssertionError(message)
+                app.logger.warning(message)
+            return response
+        return decorated_function
+    return decorator
+
+#eager loading
+def find_category(name):
+    """Look a category up by name; the admin UI sends lower-cased names."""
+    return Category.query.filter(func.lower(Category.name) == name.strip().lower()).first()
+
+def menu_items_query():
+    """MenuItem query that loads extras, sizes and piece options in one IN query each."""
+    return MenuItem.query.options(
+        db.joinedload(MenuItem.category),
+        db.selectinload(MenuItem.extras),
+        db.selectinload(MenuItem.sizes),
+        db.selectinload(MenuItem.piece_options)
+    )
+
+def orders_query(with_items=True):
+    """Order query that loads all line items of the result in one IN query."""
+    query = Order.query
+    if with_items:
+        query = query.options(db.selectinload(Order.items))
+    return query
+
+def serialize_menu_item(item, include_availability=False, stock=None):
+    data = {
+        'id': item.id,
+        'name': item.name,
+        'description': item.description,
+        'price': float(item.price),
+        'category': item.category.name,
+        'category_id': item.category_id,
+        'image_url': proxied_image_url(item.image_url),
+        'extras': [{'id': e.id, 'name': e.name, 'price': float(e.price)} for e in item.extras],
+        'sizes': [{'id': s.id, 'name': s.name, 'price': float(s.price)} for s in item.sizes],
+        'piece_options': [{'id': p.id, 'quantity': p.quantity, 'price': float(p.price), 'is_default': p.is_default}
+                        for p in item.piece_options]
+    }
+    if include_availability:
+        data['is_available'] = item.is_available
+        data['image_url'] = item.image_url  # admins edit the original
+    if stock is not None:
+        data['stock'] = stock_state(stock, 'menu_item', item.id)
+    return data
+
+#menu snapshot cache
+def load_menu_state(connection):
+    """Read the menu version, its reset version and per-category versions.
+
+    Rows are 'menu', 'menu:reset' (a client older than this needs the whole
+    menu) and 'menu:category:<id>' (the version its items last changed).
+    """
+    versions = dict(connection.execute(
+        db.select(SharedVersion.name, SharedVersion.version).where(SharedVersion.name.like('menu%'))
+    ).all())
+    if 'menu' not in versions:
+        return None
+    return {
+        'version': versions['menu'],
+        'reset': versions['menu:reset'],
+        'categories': {int(name.rsplit(':', 1)[1]): version for name, version in versions.items()
+                       if name.startswith('menu:category:')}
+    }
+
+def get_menu_state():
+    """Return the menu version state, from the cache when it holds a copy."""
+    state = cache.get(MENU_VERSION_KEY)
+    if state is None:
+        state = load_menu_state(db.session)
+        if state is None:
+            return write_menu_state(None, seed=True)
+        # add, not set: a bump that lands meanwhile has cached a newer copy
+        cache.add(MENU_VERSION_KEY, state, timeout=MENU_VERSION_CACHE_SECONDS)
+    return state
+
+def write_menu_state(category_ids, seed=False):
+    """Move the menu to a new version in the database, then cache the result."""
+    # The read-modify-write must not interleave with another worker's, so
+    # the lock is held on the shared cache too and, on Postgres, the row
+    generation = None
+    with menu_version_lock, shared_lock(MENU_VERSION_KEY):
+        with db.engine.begin() as connection:
+            if connection.dialect.name == 'postgresql':
+                connection.execute(
+                    db.select(SharedVersion.version).where(SharedVersion.name == 'menu').with_for_update()
+                )
+            state = load_menu_state(connection)
+            if state is None or not seed:
+                # From the clock too, so versions stay ahead of ones kiosks
+                # cached before the database was reset
+                version = max((state['version'] if state else 0) + 1, int(time.time() * 1000))
+                if state is None or category_ids is None:
+                    # Per-category history starts here; older clients reload everything
+                    connection.execute(db.delete(SharedVersion).where(SharedVersion.name.like('menu:category:%')))
+                    state = {'version': version, 'reset': version, 'categories': {}}
+                    versions = {'menu:reset': version}
+                else:
+                    state['version'] = version
+                    state['categories'].update({category_id: version for category_id in category_ids})
+                    versions = {f'menu:category:{category_id}': version for category_id in category_ids}
+                versions['menu'] = version
+                # Workers with a cache of their own drop their copy on the
+                # next poll rather than serving the old version for a minute
+                generation = versions['invalidate:menu'] = new_generation()
+                write_shared_versions(connection, versions)
+        cache.set(MENU_VERSION_KEY, state, timeout=MENU_VERSION_CACHE_SECONDS)
+    if generation is not None:
+        mark_invalidation_seen('menu', generation)
+    return state
+
+@on_invalidate('menu')
+def forget_menu_state():
+    cache.delete(MENU_VERSION_KEY)
+
+def get_menu_version():
+    """Return the current menu version, seeding it on first use."""
+    return get_menu_state()['version']
+
+def bump_menu_version(category_ids=None):
+    """Move to a new menu version, invalidating every cached snapshot.
+
+    `category_ids` names the categories whose items changed, so kiosks can
+    fetch just those; None marks the whole menu as changed.
+    """
+    return write_menu_state(category_ids)['version']
+
+def changed_category_ids(since):
+    """Categories whose items changed after `since`, or None if that is unknown."""
+    state = get_menu_state()
+    if since < state['reset']:
+        return None
+    return {category_id for category_id, version in state['categories'].items() if version > since}
+
+def known_menu_version(since):
+    """Round a client's `since` down to the newest recorded version at or before it.
+
+    Every `since` between two recorded versions asks for the same delta, so
+    snapshots keyed by the rounded value are bounded by the number of
+    categories; None means the client predates the history and needs it all.
+    """
+    state = get_menu_state()
+    if since < state['reset']:
+        return None
+    return max([state['reset']] + [version for version in state['categories'].values() if version <= since])
+
+category_index_lock = threading.Lock()
+category_index = {'version': None, 'by_name': {}}
+
+def find_category_id(name):
+    """Resolve a category name the way find_category does, without a query per call."""
+    version = get_menu_version()
+    record_cache('category_index', category_index['version'] == version)
+    if category_index['version'] != version:
+        with category_index_lock:
+            if category_index['version'] != version:
+                by_name = {category_name.lower(): category_id
+                           for category_id, category_name in db.session.query(Category.id, Category.name)}
+                category_index.update(by_name=by_name, version=version)
+    return category_index['by_name'].get(name.strip().lower())
+
+def build_menu_items(category_id=None):
+    """Query the available menu items, optionally for a single category."""
+    query = menu_items_query().filter_by(is_available=True)
+    if category_id is not None:
+        query = query.filter(MenuItem.category_id == category_id)
+    return [serialize_menu_item(item) for item in query.all()]
+
+#menu change log
+def record_menu_changes(connection, changes):
+    """Append (entity, entity_id, operation) rows to the change log in the caller's transaction."""
+    if not changes:
+        return
+    transaction = connection.get_transaction()
+    if connection.dialect.name == 'postgresql' and connection.info.get('menu_change_lock') is not transaction:
+        # Writers take turns so change ids commit in order and a reader
+        # can never move past an id that is still uncommitted; once per
+        # transaction, and only by one that really writes to the log
+        connection.exec_driver_sql('LOCK TABLE menu_change IN SHARE ROW EXCLUSIVE MODE')
+        connection.info['menu_change_lock'] = transaction
+    now = datetime.utcnow()
+    connection.execute(MenuChange.__table__.insert(), [
+        {'entity': entity, 'entity_id': entity_id, 'operation': operation, 'created_at': now}
+        for entity, entity_id, operation in changes
+    ])
+
+MENU_CHANGE_PRIORITY = {'update': 0, 'insert': 1, 'delete': 2}
+
+@event.listens_for(db.session, 'after_flush')
+def log_menu_changes(session, flush_context):
+    """Log menu items and categories touched by this flush, one row per entity."""
+    changes = {}
+    renamed_categories = []
+
+    def log(key, operation):
+        if MENU_CHANGE_PRIORITY[operation] >= MENU_CHANGE_PRIORITY[changes.get(key, 'update')]:
+            changes[key] = operation
+
+    for row_operation, objects in (('insert', session.new), ('update', session.dirty), ('delete', session.deleted)):
+        for obj in objects:
+            if not isinstance(obj, (MenuItem, Category, Extra, Size, PieceOption)):
+                continue
+            # Backrefs mark rows dirty without changing any column
+            if row_operation == 'update' and not session.is_modified(obj, include_collections=False):
+                continue
+            if isinstance(obj, MenuItem):
+                log(('menu_item', obj.id), row_operation)
+            elif isinstance(obj, Category):
+                log(('category', obj.id), row_operation)
+                # Items embed their category's name
+                if row_operation == 'update' and db.inspect(obj).attrs.name.history.has_changes():
+                    renamed_categories.append(obj.id)
+            else:
+                # Options belong to their item, so changing one changes the item;
+                # an orphaned option has already lost its key, so use the old one
+                history = db.inspect(obj).attrs.menu_item_id.history
+                for menu_item_id in {obj.menu_item_id, *history.deleted} - {None}:
+                    log(('menu_item', menu_item_id), 'update')
+    if renamed_categories:
+        item_ids = session.connection().execute(
+            db.select(MenuItem.id).where(MenuItem.category_id.in_(renamed_categories))
+        ).scalars()
+        for item_id in item_ids:
+            log(('menu_item', item_id), 'update')
+    record_menu_changes(session.connection(), [
+        (entity, entity_id, operation) for (entity, entity_id), operation in changes.items()
+    ])
+
+@app.cli.command('prune-menu-changes')
+def prune_menu_changes_command():
+    """Drop change log entries older than MENU_CHANGE_RETENTION_DAYS; lagging kiosks reload."""
+    cutoff = datetime.utcnow() - timedelta(days=MENU_CHANGE_RETENTION_DAYS)
+    # Always keep the newest entry so the log never looks empty to a client
+    deleted = MenuChange.query.filter(
+        MenuChange.created_at < cutoff, MenuChange.id < latest_menu_change()
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    print(f"Pruned {deleted} menu changes")
+
+def latest_menu_change():
+    return db.session.query(func.coalesce(func.max(MenuChange.id), 0)).scalar()
+
+def build_menu_changes(since, limit):
+    """Current state of everything changed after `since`, oldest change first.
+
+    Items that were deleted or are no longer available become tombstones,
+    so a kiosk can drop them without knowing why they went away.
+    """
+    earliest = db.session.query(func.min(MenuChange.id)).scalar()
+    if earliest is not None and since < earliest - 1:
+        # The log has been pruned past this client; it has to reload the menu
+        return {'version': latest_menu_change(), 'reset': True, 'more': False, 'changes': []}
+
+    rows = MenuChange.query.filter(MenuChange.id > since).order_by(MenuChange.id).limit(limit + 1).all()
+    more = len(rows) > limit
+    rows = rows[:limit]
+    # Keep one entry per entity, ordered by its latest change
+    latest = {}
+    for row in rows:
+        latest.pop((row.entity, row.entity_id), None)
+        latest[(row.entity, row.entity_id)] = row.id
+
+    category_ids = [entity_id for entity, entity_id in latest if entity == 'category']
+    item_ids = [entity_id for entity, entity_id in latest if entity == 'menu_item']
+    categories = {category['id']: category for category in build_categories(category_ids)} if category_ids else {}
+    items = {item.id: item for item in menu_items_query().filter(MenuItem.id.in_(item_ids))} if item_ids else {}
+
+    changes = []
+    for (entity, entity_id) in latest:
+        if entity == 'category':
+            data = categories.get(entity_id)
+        else:
+            item = items.get(entity_id)
+            data = serialize_menu_item(item) if item is not None and item.is_available else None
+        change = {'type': entity, 'id': entity_id, 'op': 'upsert' if data else 'delete'}
+        if data:
+            change['data'] = data
+        changes.append(change)
+
+    return {
+        'version': rows[-1].id if rows else since,
+        'reset': False,
+        'more': more,
+        'changes': changes
+    }
+
+def build_bootstrap(since=None):
+    """Categories plus their available items grouped by category id.
+
+    Categories are always listed in full so removed ones can be dropped;
+    with `since`, items are only included for categories changed after it.
+    """
+    version = get_menu_version()
+    # Read before the menu so a change made meanwhile is replayed, never missed
+    change_version = latest_menu_change()
+    changed = changed_category_ids(since) if since is not None else None
+    categories = build_categories()
+    if changed is None:
+        category_ids = [category['id'] for category in categories]
+    else:
+        category_ids = sorted(changed)
+
+    items = {str(category_id): [] for category_id in category_ids}
+    if category_ids:
+        query = menu_items_query().filter_by(is_available=True)
+        if changed is not None:
+            query = query.filter(MenuItem.category_id.in_(category_ids))
+        for item in query.order_by(MenuItem.id):
+            items[str(item.category_id)].append(serialize_menu_item(item))
+    return {
+        'version': version,
+        'change_version': change_version,
+        'full': changed is None,
+        'categories': categories,
+        'items': items
+    }
+
+def build_categories(category_ids=None):
+    """Query all categories, or just `category_ids`, in their public shape."""
+    query = Category.query
+    if category_ids is not None:
+        query = query.filter(Category.id.in_(category_ids))
+    return [{
+        'id': cat.id,
+        'name': cat.name,
+        'description': cat.description,
+        'image_url': proxied_image_url(cat.image_url),
+        'icon': cat.icon,
+        'is_default': cat.is_default
+    } for cat in query.all()]
+
+snapshot_memo = OrderedDict()  # versioned snapshot key -> snapshot
+snapshot_memo_lock = threading.Lock()
+
+def get_menu_snapshot(name, builder):
+    """Return the serialized snapshot for `name`, building it once per version."""
+    # Read the version before querying so a concurrent write can only ever
+    # leave a snapshot behind under a version nobody asks for any more
+    version = get_menu_version()
+    key = f'menu:snapshot:{version}:{name}'
+    # A versioned key never changes, so a decoded copy can be kept per worker
+    with snapshot_memo_lock:
+        snapshot = snapshot_memo.get(key)
+        if snapshot is not None:
+            snapshot_memo.move_to_end(key)
+    if snapshot is None:
+        snapshot = cache.get(key)
+        record_cache('menu_snapshot', snapshot is not None)
+        if snapshot is None:
+            snapshot = build_once(key, lambda: encode_snapshot(version, builder()), MENU_SNAPSHOT_TIMEOUT)
+        with snapshot_memo_lock:
+            snapshot_memo[key] = snapshot
+            while len(snapshot_memo) > MENU_SNAPSHOT_MEMO_SIZE:
+                snapshot_memo.popitem(last=False)
+    else:
+        record_cache('menu_snapshot', True)
+    return snapshot
+
+def encode_snapshot(version, data):
+    body = json.dumps(data).encode('utf-8')
+    # Compress once per version so requests never pay for re-encoding
+    encoded = {'identity': body, 'gzip': gzip.compress(body, compresslevel=9, mtime=0)}
+    if brotli is not None:
+        encoded['br'] = brotli.compress(body, mode=brotli.MODE_TEXT)
+    return {
+        'version': version,
+        'encoded': encoded,
+        'etag': hashlib.sha256(body).hexdigest()[:32]
+    }
+
+def snapshot_response(snapshot):
+    """Build a conditional JSON response, answering 304 when the ETag matches."""
+    encoded = snapshot['encoded']
+    encoding = request.accept_encodings.best_match(
+        [e for e in ('br', 'gzip') if e in encoded], default='identity'
+    )
+    response = app.response_class(encoded[encoding], status=200, mimetype='application/json')
+    response.vary.add('Accept-Encoding')
+    if encoding == 'identity':
+        response.set_etag(snapshot['etag'])
+    else:
+        # Each encoding is a distinct representation and needs its own strong ETag
+        response.headers['Content-Encoding'] = encoding
+        response.set_etag(f"{snapshot['etag']}-{encoding}")
+    response.headers['X-Menu-Version'] = str(snapshot['version'])
+    # Kiosks may keep the body but must revalidate; a 304 costs only headers
+    response.headers['Cache-Control'] = 'public, no-cache'
+    return response.make_conditional(request)
+
 #generators of order number
+order_number_lock = threading.Lock()
+order_number_block = {'next': 0, 'end': 0}
+
+def reserve_order_number_block(size):
+    """Claim `size` consecutive values from the shared sequence row."""
+    table = OrderNumberSequence.__table__
+    # Use a separate connection so the reservation commits on its own and
+    # never waits on, or is rolled back with, the caller's transaction
+    while True:
+        with db.engine.begin() as conn:
+            end = conn.execute(
+                table.update()
+                .where(table.c.id == 1)
+                .values(next_value=table.c.next_value + size)
+                .returning(table.c.next_value)
+            ).scalar()
+        if end is not None:
+            return end - size
+        try:
+            with db.engine.begin() as conn:
+                conn.execute(table.insert().values(id=1, next_value=ORDER_NUMBER_START + size))
+            return ORDER_NUMBER_START
+        except IntegrityError:
+            pass  # another worker seeded the row first, reserve again
+
+def encode_base32(value, length):
+    chars = []
+    for _ in range(length):
+        value, remainder = divmod(value, 32)
+        chars.append(ORDER_NUMBER_ALPHABET[remainder])
+    return ''.join(reversed(chars))
+
+def encode_order_number(value):
+    """Encode a sequence value as its zero-padded digits plus a keyed check.
+
+    The digits sort like the values they encode, so numbers from one block
+    land next to each other in the order_number index.
+    """
+    offset = value - ORDER_NUMBER_START
+    if not 0 <= offset < 32 ** ORDER_SEQUENCE_LENGTH:
+        raise RuntimeError(f'Order number sequence is out of range: {value}')
+    sequence = encode_base32(offset, ORDER_SEQUENCE_LENGTH)
+    digest = hmac.new(ORDER_NUMBER_KEY, sequence.encode('ascii'), hashlib.sha256).digest()
+    check = int.from_bytes(digest[:8], 'big') % 32 ** ORDER_CHECK_LENGTH
+    return sequence + encode_base32(check, ORDER_CHECK_LENGTH)
+
 def generate_order_number():
-    return ''.join(random.choices(string.ascii_uppercase + string.digits, k=8))
+    """Return a unique 10-character order number, roughly in allocation order."""
+    with order_number_lock:
+        if order_number_block['next'] >= order_number_block['end']:
+            start = reserve_order_number_block(ORDER_NUMBER_BLOCK_SIZE)
+            order_number_block.update(next=start, end=start + ORDER_NUMBER_BLOCK_SIZE)
+        value = order_number_block['next']
+        order_number_block['next'] += 1
+    return encode_order_number(value)
 #services
 def send_sms(phone_number, message):
     try:
-        twilio_client.messages.create(
-            body=message,
-            from_=os.getenv('TWILIO_PHONE_NUMBER'),
-            to=phone_number
-        )
+        with provider_call('twilio', 'messages.create'):
+            twilio_client.messages.create(
+                body=message,
+                from_=os.getenv('TWILIO_PHONE_NUMBER'),
+                to=phone_number
+            )
         return True
+    except ProviderUnavailable:
+        raise
     except Exception as e:
         print(f"SMS Error: {str(e)}")
         return False
@@ -190,11 +1364,276 @@ def send_email(to_email, subject, content):
             subject=subject,
             html_content=content
         )
-        sendgrid_client.send(message)
+        with provider_call('sendgrid', 'mail.send'):
+            response = sendgrid_session.post(
+                SENDGRID_MAIL_URL,
+                json=message.get(),
+                headers={'Authorization': f'Bearer {SENDGRID_API_KEY}'},
+                timeout=OUTBOUND_TIMEOUT
+            )
+            response.raise_for_status()
         return True
+    except ProviderUnavailable:
+        raise
     except Exception as e:
         print(f"Email Error: {str(e)}")
         return False
+#notification outbox
+notification_wakeup = threading.Event()
+notification_executors = {}
+notification_in_flight = {channel: 0 for channel in NOTIFICATION_CONCURRENCY}
+notification_lock = threading.Lock()
+fake_notifications = []  # deliveries recorded by the fake provider
+
+def deliver_sms(recipient, subject, body):
+    if not send_sms(recipient, body):
+        raise RuntimeError('SMS provider rejected the message')
+
+def deliver_email(recipient, subject, body):
+    if not send_email(recipient, subject, body):
+        raise RuntimeError('Email provider rejected the message')
+
+def deliver_fake(channel):
+    def deliver(recipient, subject, body):
+        fake_notifications.append({'channel': channel, 'recipient': recipient, 'subject': subject, 'body': body})
+        app.logger.info(f"Fake {channel} notification to {recipient}")
+    return deliver
+
+def get_notification_provider(channel):
+    if NOTIFICATION_PROVIDER == 'fake':
+        return deliver_fake(channel)
+    return {'sms': deliver_sms, 'email': deliver_email}[channel]
+
+def enqueue_notification(channel, recipient, body, subject=None, order=None):
+    """Add a notification to the session; it is sent once the caller commits."""
+    notification = NotificationOutbox(
+        channel=channel,
+        recipient=recipient,
+        subject=subject,
+        body=body,
+        order=order
+    )
+    db.session.add(notification)
+    return notification
+
+def notification_backoff(attempts):
+    delay = NOTIFICATION_BACKOFF_SECONDS * (2 ** max(attempts - 1, 0))
+    return min(delay, NOTIFICATION_MAX_BACKOFF_SECONDS) * random.uniform(0.8, 1.2)
+
+def claim_notifications(channel, limit):
+    """Mark up to `limit` due notifications as sending and return their ids."""
+    now = datetime.utcnow()
+    rows = NotificationOutbox.query.filter(
+        NotificationOutbox.channel == channel,
+        or_(
+            and_(NotificationOutbox.status == 'pending', NotificationOutbox.next_attempt_at <= now),
+            # Rows left 'sending' by a worker that died are picked up again
+            and_(NotificationOutbox.status == 'sending',
+                 NotificationOutbox.locked_at < now - timedelta(seconds=NOTIFICATION_LEASE_SECONDS))
+        )
+    ).order_by(NotificationOutbox.next_attempt_at).limit(limit).with_for_update(skip_locked=True).all()
+
+    for row in rows:
+        row.status = 'sending'
+        row.locked_at = now
+        row.attempts += 1
+    db.session.commit()
+    return [row.id for row in rows]
+
+def deliver_notification(notification_id):
+    with app.app_context():
+        try:
+            notification = db.session.get(NotificationOutbox, notification_id)
+            provider = get_notification_provider(notification.channel)
+            try:
+                provider(notification.recipient, notification.subject, notification.body)
+                notification.status = 'sent'
+                notification.sent_at = datetime.utcnow()
+                notification.last_error = None
+            except Exception as e:
+                notification.last_error = str(e)
+                if isinstance(e, ProviderUnavailable):
+                    # Nothing was sent, so waiting out an open circuit costs no attempt
+                    notification.attempts -= 1
+                if notification.attempts >= NOTIFICATION_MAX_ATTEMPTS:
+                    notification.status = 'failed'
+                    app.logger.error(f"Giving up on notification {notification_id}: {str(e)}")
+                else:
+                    notification.status = 'pending'
+                    notification.next_attempt_at = datetime.utcnow() + timedelta(
+                        seconds=notification_backoff(notification.attempts))
+            notification.locked_at = None
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            app.logger.error(f"Error delivering notification {notification_id}: {str(e)}")
+
+def drain_notifications():
+    """Hand due notifications to the per-channel pools, respecting their limits."""
+    for channel, limit in NOTIFICATION_CONCURRENCY.items():
+        with notification_lock:
+            free = limit - notification_in_flight[channel]
+        if free <= 0:
+            continue
+        for notification_id in claim_notifications(channel, free):
+            with notification_lock:
+                notification_in_flight[channel] += 1
+            future = notification_executors[channel].submit(deliver_notification, notification_id)
+            future.add_done_callback(lambda _, channel=channel: finish_notification(channel))
+
+def finish_notification(channel):
+    with notification_lock:
+        notification_in_flight[channel] -= 1
+    # A slot opened up, so look for more work straight away
+    notification_wakeup.set()
+
+def run_notification_worker():
+    while True:
+        notification_wakeup.clear()
+        try:
+            with app.app_context():
+                drain_notifications()
+        except Exception as e:
+            app.logger.error(f"Notification worker error: {str(e)}")
+        notification_wakeup.wait(NOTIFICATION_POLL_SECONDS)
+
+def start_notification_worker():
+    """Start the background thread that drains the notification outbox."""
+    for channel, limit in NOTIFICATION_CONCURRENCY.items():
+        notification_executors[channel] = ThreadPoolExecutor(
+            max_workers=limit, thread_name_prefix=f'notify-{channel}')
+    thread = threading.Thread(target=run_notification_worker, name='notification-worker', daemon=True)
+    thread.start()
+    return thread
+
+#analytics rollups
+def guess_category(item_name):
+    """Fallback for order items whose menu item no longer exists."""
+    name = item_name.lower()
+    if 'burger' in name:
+        return 'Burgers'
+    elif 'pizza' in name:
+        return 'Pizza'
+    elif 'drink' in name or 'soda' in name:
+        return 'Drinks'
+    elif 'side' in name:
+        return 'Sides'
+    elif 'breakfast' in name:
+        return 'Breakfast'
+    return 'Uncategorized'
+
+def increment_rollup(model, keys, increments, extra=None):
+    """Atomically add `increments` to the rollup row identified by `keys`."""
+    extra = extra or {}
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        table = model.__table__
+        stmt = insert(table).values(**keys, **increments, **extra)
+        updates = {column: table.c[column] + stmt.excluded[column] for column in increments}
+        updates.update({column: stmt.excluded[column] for column in extra})
+        db.session.execute(stmt.on_conflict_do_update(index_elements=list(keys), set_=updates))
+        return
+
+    row = db.session.get(model, tuple(keys.values()))
+    if row is None:
+        db.session.add(model(**keys, **increments, **extra))
+    else:
+        for column, value in increments.items():
+            setattr(row, column, getattr(row, column) + value)
+        for column, value in extra.items():
+            setattr(row, column, value)
+
+def record_order_rollups(order, sign=1):
+    """Add (sign=1) or remove (sign=-1) a completed order from the rollups."""
+    if order.created_at is None:
+        db.session.flush()
+    day = order.created_at.replace(hour=0, minute=0, second=0, microsecond=0)
+    increment_rollup(
+        SalesRollup,
+        {'period': 'day', 'bucket_start': day},
+        {'revenue': sign * order.total_amount, 'order_count': sign}
+    )
+
+    category_ids = {item.category_id for item in order.items if item.category_id}
+    categories = dict(
+        db.session.query(Category.id, Category.name).filter(Category.id.in_(category_ids)).all()
+    ) if category_ids else {}
+    for item in order.items:
+        increment_rollup(
+            ProductRollup,
+            {'day': day.date(), 'item_name': item.item_name},
+            {'quantity': sign * item.quantity, 'revenue': sign * item.price * item.quantity},
+            extra={'category': categories.get(item.category_id) or guess_category(item.item_name)}
+        )
+
+def set_order_status(order, status):
+    """Change an order's status, keeping the analytics rollups and stock in step.
+
+    Cancelling an order gives its counted stock back; reopening a cancelled
+    order takes it again and raises SoldOut if it is no longer there.
+    """
+    if order.status == status:
+        return
+    previous_status = order.status
+    if status == 'cancelled':
+        if release_stock(order_stock_lines(order)):
+            db.session.info['stock_changed'] = True
+    elif previous_status == 'cancelled':
+        if reserve_stock(order_stock_lines(order)):
+            db.session.info['stock_changed'] = True
+    if previous_status == 'completed':
+        record_order_rollups(order, -1)
+    order.status = status
+    if status == 'completed':
+        record_order_rollups(order, 1)
+    record_order_event(order, 'order.status_changed', previous_status=previous_status)
+
+def rebuild_rollups():
+    """Recompute every rollup from the order history."""
+    SalesRollup.query.delete()
+    ProductRollup.query.delete()
+    for order in orders_query().filter(Order.status == 'completed').yield_per(500):
+        record_order_rollups(order)
+    db.session.commit()
+
+@app.cli.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Rebuild the analytics rollup tables from existing orders."""
+    rebuild_rollups()
+    print("Analytics rollups rebuilt successfully")
+
+#order events
+order_event_condition = threading.Condition()
+
+def record_order_event(order, event_type, **extra):
+    """Add an order event to the session; it is streamed once committed."""
+    if order.id is None:
+        db.session.flush()
+    if event_type == 'order.created':
+        payload = serialize_order(order)
+    else:
+        payload = {'order_number': order.order_number, 'status': order.status, **extra}
+    db.session.add(OrderEvent(
+        order_number=order.order_number,
+        event_type=event_type,
+        payload=json.dumps(payload)
+    ))
+    db.session.info['order_events'] = True
+
+@event.listens_for(db.session, 'after_commit')
+def wake_order_streams(session):
+    if session.info.pop('order_events', False):
+        with order_event_condition:
+            order_event_condition.notify_all()
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_order_events(session):
+    session.info.pop('order_events', None)
+
+def format_sse(order_event):
+    return f"id: {order_event.id}\nevent: {order_event.event_type}\ndata: {order_event.payload}\n\n"
+
 #routes
 #payments
 #stripe
@@ -202,16 +1641,28 @@ def send_email(to_email, subject, content):
 def create_payment_intent():
     try:
         data = request.json
-        amount = int(float(data['amount']) * 100)  # Convert to cents
+        if data.get('items'):
+            # Charge the server-side price when the cart is sent along
+            _, total = price_order(data['items'])
+            amount = int(total * 100)
+        else:
+            amount = int(money(data['amount']) * 100)  # Convert to cents
         if amount <= 0:
             return jsonify({'error': 'Amount must be greater than zero'}), 400
 
-        intent = stripe.PaymentIntent.create(
-            amount=amount,
-            currency='zar'
-        )
+        with provider_call('stripe', 'PaymentIntent.create'):
+            intent = stripe.PaymentIntent.create(
+                amount=amount,
+                currency='zar'
+            )
 
-        return jsonify({'clientSecret': intent['client_secret']})
+        # The kiosk shows this amount, not its own cart total
+        return jsonify({'clientSecret': intent['client_secret'], 'amount': amount / 100})
+    except SoldOut as e:
+        # Checked before charging so a customer is never billed for an 86'd item
+        return jsonify({'error': str(e)}), 409
+    except ProviderUnavailable as e:
+        return jsonify({'error': 'Payments are temporarily unavailable', 'message': str(e)}), 503
     except Exception as e:
         print(f"Error creating payment intent: {str(e)}")
         return jsonify({'error': 'Failed to create payment intent', 'message': str(e)}), 400
@@ -281,8 +1732,8 @@ def payment_notification():
             # Update order status in database
             order = Order.query.filter_by(order_number=order_id).first()
             if order:
-                order.status = 'paid'
-                order.total_amount = float(amount_gross)
+                set_order_status(order, 'paid')
+                order.total_amount = money(amount_gross)
                 db.session.commit()
                 return "Payment processed successfully", 200
 
@@ -308,6 +1759,339 @@ def payment_notification():
         return str(e), 500
 
 
+#pricing engine
+class PricingError(Exception):
+    """Raised when an order references items or options that cannot be priced."""
+
+def money(value):
+    return Decimal(str(value)).quantize(CENT, rounding=ROUND_HALF_UP)
+
+price_table_lock = threading.Lock()
+price_table = {'version': None, 'by_id': {}, 'by_name': {}}
+
+def build_price_table():
+    """Index every menu item and option price for lookups without queries."""
+    by_id, by_name = {}, {}
+    for item in menu_items_query().all():
+        entry = {
+            'id': item.id,
+            'name': item.name,
+            'category_id': item.category_id,
+            'is_available': item.is_available,
+            'price': money(item.price),
+            'extras': {e.id: {'id': e.id, 'name': e.name, 'price': money(e.price)} for e in item.extras},
+            'sizes': {s.id: {'id': s.id, 'name': s.name, 'price': money(s.price)} for s in item.sizes},
+            'piece_options': {p.id: {'id': p.id, 'quantity': p.quantity, 'price': money(p.price)}
+                              for p in item.piece_options}
+        }
+        entry['extras_by_name'] = {e['name']: e for e in entry['extras'].values()}
+        entry['sizes_by_name'] = {s['name']: s for s in entry['sizes'].values()}
+        by_id[item.id] = entry
+        by_name.setdefault(item.name, entry)
+    return by_id, by_name
+
+def get_price_table():
+    """Return the price table for the current menu version, rebuilding on change."""
+    version = get_menu_version()
+    record_cache('price_table', price_table['version'] == version)
+    if price_table['version'] != version:
+        with price_table_lock:
+            if price_table['version'] != version:
+                by_id, by_name = build_price_table()
+                price_table.update(by_id=by_id, by_name=by_name, version=version)
+    return price_table
+
+def lookup_option(options, by_name, selected, kind, item_name):
+    """Find a selected extra or size by id, falling back to its name."""
+    option = None
+    if isinstance(selected, dict):
+        option = options.get(selected.get('id')) or by_name.get(selected.get('name'))
+    if option is None:
+        raise PricingError(f"Unknown {kind} for {item_name}")
+    return option
+
+def price_line(item, table):
+    """Price one cart line: (piece option, or base plus size surcharge) plus extras, times quantity."""
+    entry = None
+    if isinstance(item.get('id'), int):
+        entry = table['by_id'].get(item['id'])
+    if entry is None:
+        entry = table['by_name'].get(item.get('name'))
+    if entry is None:
+        raise PricingError(f"Unknown menu item: {item.get('name', 'unknown')}")
+    if not entry['is_available']:
+        raise PricingError(f"{entry['name']} is not available")
+
+    quantity = item.get('quantity')
+    if not isinstance(quantity, int) or quantity < 1:
+        raise PricingError(f"Invalid quantity for {entry['name']}")
+
+    extras = [
+        lookup_option(entry['extras'], entry['extras_by_name'], extra, 'extra', entry['name'])
+        for extra in item.get('selectedExtras') or []
+    ]
+
+    size = None
+    piece_option = None
+    selected_option = item.get('selectedOption')
+    if isinstance(selected_option, dict):
+        selected_option = selected_option.get('id')
+    if selected_option not in (None, ''):
+        try:
+            piece_option = entry['piece_options'][int(selected_option)]
+        except (KeyError, ValueError, TypeError):
+            raise PricingError(f"Unknown piece option for {entry['name']}")
+        unit_price = piece_option['price']
+    else:
+        unit_price = entry['price']
+        if item.get('selectedSize') and (item['selectedSize'].get('id') or item['selectedSize'].get('name')):
+            size = lookup_option(entry['sizes'], entry['sizes_by_name'], item['selectedSize'], 'size', entry['name'])
+            unit_price += size['price']
+
+    unit_price += sum((extra['price'] for extra in extras), Decimal('0'))
+    return {
+        'menu_item_id': entry['id'],
+        'category_id': entry['category_id'],
+        'name': entry['name'],
+        'quantity': quantity,
+        'unit_price': unit_price,
+        'line_total': unit_price * quantity,
+        'extras': [{'id': e['id'], 'name': e['name'], 'price': float(e['price'])} for e in extras],
+        'size': {'id': size['id'], 'name': size['name'], 'price': float(size['price'])} if size else None,
+        'piece_option': {'id': piece_option['id'], 'quantity': piece_option['quantity'],
+                         'price': float(piece_option['price'])} if piece_option else None
+    }
+
+def price_order(items):
+    """Price a whole order from the in-memory table; raises PricingError."""
+    table = get_price_table()
+    lines = [price_line(item, table) for item in items]
+    check_stock(lines, get_stock_index()['levels'])
+    return lines, sum((line['line_total'] for line in lines), Decimal('0'))
+
+def serialize_quote(lines, total):
+    return {
+        'lines': [{
+            'menu_item_id': line['menu_item_id'],
+            'name': line['name'],
+            'quantity': line['quantity'],
+            'unit_price': float(line['unit_price']),
+            'line_total': float(line['line_total'])
+        } for line in lines],
+        'total': float(total)
+    }
+
+@app.route('/api/price-order', methods=['POST'])
+def quote_order():
+    """Price a cart server-side so the kiosk can charge the authoritative total."""
+    data = request.get_json(silent=True) or {}
+    if not data.get('items'):
+        return jsonify({'error': 'No items in order'}), 400
+    try:
+        lines, total = price_order(data['items'])
+    except PricingError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(serialize_quote(lines, total))
+
+#stock levels
+class SoldOut(PricingError):
+    """Raised when an order asks for more of an item or option than is left."""
+
+stock_index_lock = threading.Lock()
+stock_index = {'loaded_at': None, 'levels': {}, 'overlay': None}
+
+def load_stock_index():
+    """Read every stock row in one query, with the public overlay pre-encoded."""
+    levels = {
+        (entity, entity_id): (is_available, remaining)
+        for entity, entity_id, is_available, remaining in db.session.query(
+            StockLevel.entity, StockLevel.entity_id, StockLevel.is_available, StockLevel.remaining
+        )
+    }
+    overlay = {entity: {'sold_out': [], 'remaining': {}} for entity in STOCK_ENTITIES}
+    for (entity, entity_id), (is_available, remaining) in sorted(levels.items()):
+        if entity not in overlay:
+            continue
+        if not is_available or (remaining is not None and remaining <= 0):
+            overlay[entity]['sold_out'].append(entity_id)
+        elif remaining is not None:
+            overlay[entity]['remaining'][str(entity_id)] = remaining
+    body = json.dumps(overlay, separators=(',', ':')).encode('utf-8')
+    return levels, {'body': body, 'etag': hashlib.sha256(body).hexdigest()[:32]}
+
+def get_stock_index():
+    """Return the stock index, reloading it once it is older than the TTL."""
+    loaded_at = stock_index['loaded_at']
+    fresh = loaded_at is not None and time.monotonic() - loaded_at < STOCK_INDEX_TTL_SECONDS
+    record_cache('stock_index', fresh)
+    if not fresh:
+        with stock_index_lock:
+            loaded_at = stock_index['loaded_at']
+            if loaded_at is None or time.monotonic() - loaded_at >= STOCK_INDEX_TTL_SECONDS:
+                started = time.monotonic()
+                levels, overlay = load_stock_index()
+                stock_index.update(levels=levels, overlay=overlay, loaded_at=started)
+    return stock_index
+
+@on_invalidate('stock_levels')
+def invalidate_stock_index():
+    with stock_index_lock:
+        stock_index['loaded_at'] = None
+
+def stock_state(levels, entity, entity_id):
+    is_available, remaining = levels.get((entity, entity_id), (True, None))
+    return {'is_available': is_available, 'remaining': remaining}
+
+def stock_needs(lines):
+    """Total quantity of every item, extra and size an order uses, with its name."""
+    needs = {}
+    for line in lines:
+        used = [('menu_item', line['menu_item_id'], line['name'])]
+        used += [('extra', extra['id'], extra['name']) for extra in line['extras']]
+        if line['size']:
+            used.append(('size', line['size']['id'], f"{line['size']['name']} {line['name']}"))
+        for entity, entity_id, name in used:
+            need = needs.setdefault((entity, entity_id), [0, name])
+            need[0] += line['quantity']
+    return needs
+
+def check_stock(lines, levels):
+    """Reject an order the index already knows cannot be filled."""
+    for key, (quantity, name) in stock_needs(lines).items():
+        is_available, remaining = levels.get(key, (True, None))
+        if not is_available or (remaining is not None and remaining <= 0):
+            raise SoldOut(f"{name} is sold out")
+        if remaining is not None and remaining < quantity:
+            raise SoldOut(f"Only {remaining} {name} left")
+
+def reserve_stock(lines):
+    """Check and decrement stock in the order's transaction; raises SoldOut.
+
+    The rows are read inside the transaction, not from the per-process index,
+    which can lag a change made on another worker. Counts are decremented by
+    guarded UPDATEs, so concurrent checkouts can never take one below zero.
+    Returns how many counts were decremented.
+    """
+    needs = stock_needs(lines)
+    # Locked in key order on Postgres so concurrent checkouts queue instead of deadlocking
+    levels = (
+        db.session.query(StockLevel.entity, StockLevel.entity_id, StockLevel.is_available, StockLevel.remaining)
+        .filter(tuple_(StockLevel.entity, StockLevel.entity_id).in_(list(needs)))
+        .order_by(StockLevel.entity, StockLevel.entity_id)
+        .with_for_update()
+        .all()
+    )
+    reserved = 0
+    for entity, entity_id, is_available, remaining in levels:
+        quantity, name = needs[(entity, entity_id)]
+        if not is_available:
+            raise SoldOut(f"{name} is sold out")
+        if remaining is None:
+            continue
+        result = db.session.execute(
+            update(StockLevel)
+            .where(
+                StockLevel.entity == entity,
+                StockLevel.entity_id == entity_id,
+                StockLevel.is_available.is_(True),
+                StockLevel.remaining >= quantity
+            )
+            .values(remaining=StockLevel.remaining - quantity, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        if result.rowcount == 0:
+            raise SoldOut(f"{name} is sold out")
+        reserved += 1
+    return reserved
+
+def order_stock_lines(order):
+    """Rebuild stock_needs lines from what an order recorded at checkout."""
+    return [
+        {
+            'menu_item_id': item.menu_item_id,
+            'name': item.item_name,
+            'extras': [extra for extra in item.extras or [] if extra.get('id')],
+            'size': item.size if item.size and item.size.get('id') else None,
+            'quantity': item.quantity
+        }
+        for item in order.items
+        if item.menu_item_id  # lines from before menu ids were recorded took no stock
+    ]
+
+def release_stock(lines):
+    """Put counted stock back in the current transaction; returns how many counts went up."""
+    released = 0
+    for (entity, entity_id), (quantity, name) in sorted(stock_needs(lines).items()):
+        result = db.session.execute(
+            update(StockLevel)
+            .where(
+                StockLevel.entity == entity,
+                StockLevel.entity_id == entity_id,
+                StockLevel.remaining.isnot(None)
+            )
+            .values(remaining=StockLevel.remaining + quantity, updated_at=datetime.utcnow())
+            .execution_options(synchronize_session=False)
+        )
+        released += result.rowcount
+    return released
+
+@event.listens_for(db.session, 'after_commit')
+def broadcast_stock_changes(session):
+    # Other workers may be refusing an item that a cancellation put back
+    if session.info.pop('stock_changed', False):
+        broadcast_invalidation('stock_levels')
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_stock_changes(session):
+    session.info.pop('stock_changed', None)
+
+def set_stock_level(entity, entity_id, values):
+    """Upsert the stock row for one entity, leaving unspecified columns alone."""
+    values = dict(values, updated_at=datetime.utcnow())
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        stmt = insert(StockLevel.__table__).values(
+            entity=entity, entity_id=entity_id, **dict({'is_available': True, 'remaining': None}, **values)
+        )
+        db.session.execute(stmt.on_conflict_do_update(index_elements=['entity', 'entity_id'], set_=values))
+        return
+
+    level = db.session.get(StockLevel, (entity, entity_id))
+    if level is None:
+        level = StockLevel(entity=entity, entity_id=entity_id)
+        db.session.add(level)
+    for column, value in values.items():
+        setattr(level, column, value)
+
+#checkout idempotency
+checkout_keys = OrderedDict()  # idempotency key -> order number
+checkout_keys_lock = threading.Lock()
+
+def remember_checkout(key, order_number):
+    with checkout_keys_lock:
+        checkout_keys[key] = order_number
+        checkout_keys.move_to_end(key)
+        while len(checkout_keys) > CHECKOUT_KEY_CACHE_SIZE:
+            checkout_keys.popitem(last=False)
+
+def find_checkout(key):
+    """Return the order number already created for a checkout key, if any."""
+    with checkout_keys_lock:
+        order_number = checkout_keys.get(key)
+    record_cache('checkout_key', order_number is not None)
+    if order_number is None:
+        order_number = db.session.query(Order.order_number).filter_by(idempotency_key=key).scalar()
+        if order_number is not None:
+            remember_checkout(key, order_number)
+    return order_number
+
+def replay_checkout(order_number):
+    app.logger.info(f"Replaying completed checkout for order {order_number}")
+    response = jsonify({'success': True, 'order_number': order_number})
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
 @app.route('/api/complete-order', methods=['POST'])
 def complete_order():
     try:
@@ -330,99 +2114,137 @@ def complete_order():
             app.logger.error("Payment intent not provided")
             return jsonify({'error': 'Payment intent not provided', 'success': False}), 400
 
-        order_number = generate_order_number()
-        app.logger.info(f"Generated order number: {order_number}")
-        
-        # Create order in database
-        order = Order(
-            order_number=order_number,
-            email=data.get('email'),
-            phone=data.get('phone'),
-            total_amount=float(data['amount']),
-            status='completed'
-        )
-        db.session.add(order)
-        app.logger.info(f"Created order: {order_number}")
+        # A resubmitted checkout gets the original order back instead of a duplicate
+        idempotency_key = request.headers.get('Idempotency-Key') or str(data['paymentIntent'])
+        existing_order_number = find_checkout(idempotency_key)
+        if existing_order_number:
+            return replay_checkout(existing_order_number)
 
-        # Add order items with all details
-        for item in data['items']:
-            try:
-                # Create the order item with base details
-                order_item = OrderItem(
-                    order=order,
-                    item_name=item['name'],
-                    quantity=item['quantity'],
-                    price=float(item['price'])
-                )
-                
-                # Store additional details as JSON in the database
-                order_item.extras = str(item.get('selectedExtras', []))
-                order_item.size = str(item.get('selectedSize', {}))
-                order_item.piece_option = str(item.get('selectedOption', None))
-                
-                db.session.add(order_item)
-                app.logger.info(f"Added item to order {order_number}: {item['name']}")
-            except Exception as item_error:
-                app.logger.error(f"Error adding item {item.get('name', 'unknown')}: {str(item_error)}")
-                db.session.rollback()
+        try:
+            lines, total = price_order(data['items'])
+            client_total = money(data['amount'])
+        except SoldOut as sold_out:
+            app.logger.warning(f"Order rejected: {str(sold_out)}")
+            return jsonify({'error': str(sold_out), 'success': False}), 409
+        except (PricingError, InvalidOperation) as pricing_error:
+            app.logger.error(f"Order pricing failed: {str(pricing_error)}")
+            return jsonify({'error': str(pricing_error), 'success': False}), 400
+
+        if abs(client_total - total) > CENT:
+            app.logger.warning(f"Client total R{client_total} differs from server total R{total}")
+            if PRICING_ENFORCE_TOTALS:
                 return jsonify({
-                    'error': f'Failed to add item {item.get("name", "unknown")} to order',
+                    'error': 'Order total does not match menu prices',
+                    'expected_amount': float(total),
                     'success': False
-                }), 500
+                }), 400
+
+        for attempt in range(1, ORDER_NUMBER_ATTEMPTS + 1):
+            order_number = generate_order_number()
+            app.logger.info(f"Generated order number: {order_number}")
+
+            # Create order in database
+            order = Order(
+                order_number=order_number,
+                email=data.get('email'),
+                phone=data.get('phone'),
+                total_amount=total,
+                status='completed',
+                idempotency_key=idempotency_key
+            )
+            db.session.add(order)
+            try:
+                # Claim the key before anything else is written; a concurrent
+                # duplicate blocks here until the first checkout commits
+                db.session.flush()
+                break
+            except IntegrityError:
+                db.session.rollback()
+                existing_order_number = find_checkout(idempotency_key)
+                if existing_order_number:
+                    return replay_checkout(existing_order_number)
+                # Not our key, so another row holds the number; draw another
+                if attempt == ORDER_NUMBER_ATTEMPTS:
+                    raise
+                app.logger.warning(f"Order number {order_number} is already taken, drawing another")
+        app.logger.info(f"Created order: {order_number}")
+
+        # Take the stock; the decrements commit or roll back with the order
+        try:
+            reserved = reserve_stock(lines)
+        except SoldOut as sold_out:
+            db.session.rollback()
+            app.logger.warning(f"Order {order_number} rejected: {str(sold_out)}")
+            return jsonify({'error': str(sold_out), 'success': False}), 409
+
+        # Add order items with their server-side prices and resolved options
+        for line in lines:
+            db.session.add(OrderItem(
+                order=order,
+                item_name=line['name'],
+                quantity=line['quantity'],
+                price=line['unit_price'],
+                extras=line['extras'],
+                size=line['size'],
+                piece_option=line['piece_option'],
+                menu_item_id=line['menu_item_id'],
+                category_id=line['category_id']
+            ))
+
+        record_order_rollups(order)
+        record_order_event(order, 'order.created')
+
+        # Queue notifications in the same transaction as the order; the
+        # outbox worker sends them so checkout never waits on Twilio/SendGrid
+        if order.phone:
+            enqueue_notification(
+                'sms',
+                order.phone,
+                f"Your KIOSK order number is: {order_number}. Thank you for your order!",
+                order=order
+            )
+        if order.email:
+            email_content = f"""
+            <h2>Order Confirmation</h2>
+            <p>Thank you for your order!</p>
+            <p>Order Number: {order_number}</p>
+            <h3>Order Details:</h3>
+            <ul>
+            {"".join(f"<li>{line['name']} x {line['quantity']} - R{line['line_total']}</li>" for line in lines)}
+            </ul>
+            <p>Total Amount: R{order.total_amount}</p>
+            """
+            enqueue_notification(
+                'email',
+                order.email,
+                email_content,
+                subject="Your KIOSK Order Confirmation",
+                order=order
+            )
 
         try:
             db.session.commit()
+            remember_checkout(idempotency_key, order_number)
+            if reserved:
+                invalidate_stock_index()
+            notification_wakeup.set()
             app.logger.info(f"Successfully committed order {order_number} to database")
         except Exception as db_error:
             db.session.rollback()
+            existing_order_number = find_checkout(idempotency_key)
+            if existing_order_number:
+                return replay_checkout(existing_order_number)
             app.logger.error(f"Database error while saving order {order_number}: {str(db_error)}")
             return jsonify({
                 'error': 'Failed to save order to database',
                 'success': False
             }), 500
 
-        # Send notifications
-        notification_errors = []
-        try:
-            if order.phone:
-                try:
-                    sms_message = f"Your KIOSK order number is: {order_number}. Thank you for your order!"
-                    send_sms(order.phone, sms_message)
-                    app.logger.info(f"SMS sent for order {order_number}")
-                except Exception as sms_error:
-                    notification_errors.append(f"SMS error: {str(sms_error)}")
-                    app.logger.error(f"Failed to send SMS for order {order_number}: {str(sms_error)}")
-
-            if order.email:
-                try:
-                    email_subject = "Your KIOSK Order Confirmation"
-                    email_content = f"""
-                    <h2>Order Confirmation</h2>
-                    <p>Thank you for your order!</p>
-                    <p>Order Number: {order_number}</p>
-                    <h3>Order Details:</h3>
-                    <ul>
-                    {"".join(f"<li>{item['name']} x {item['quantity']} - R{item['price']}</li>" for item in data['items'])}
-                    </ul>
-                    <p>Total Amount: R{order.total_amount}</p>
-                    """
-                    send_email(order.email, email_subject, email_content)
-                    app.logger.info(f"Email sent for order {order_number}")
-                except Exception as email_error:
-                    notification_errors.append(f"Email error: {str(email_error)}")
-                    app.logger.error(f"Failed to send email for order {order_number}: {str(email_error)}")
-        except Exception as notification_error:
-            app.logger.error(f"Notification error for order {order_number}: {str(notification_error)}")
-            notification_errors.append(str(notification_error))
-
         response_data = {
             'success': True,
             'order_number': order_number
         }
-        
-        if notification_errors:
-            response_data['notification_errors'] = notification_errors
-            
+
         app.logger.info(f"Order {order_number} completed successfully")
         return jsonify(response_data)
 
@@ -476,6 +2298,7 @@ def admin_login():
         token = jwt.encode(
             {
                 'admin_id': admin.id,
+                'pwd': password_fingerprint(admin),
                 'exp': datetime.now(timezone.utc) + timedelta(days=1)  # Token expiration
             },
             os.getenv('JWT_SECRET_KEY'),
@@ -527,36 +2350,21 @@ def create_admin():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/admin/cache-stats', methods=['GET'])
+@admin_required
+def get_cache_stats():
+    with token_cache_lock:
+        token_stats = dict(token_cache_stats, size=len(token_cache))
+    return jsonify({'token_cache': token_stats})
+
 @app.route('/api/admin/menu-items', methods=['GET', 'POST'])
 @admin_required
+@query_budget(5)
 def manage_menu_items():
     if request.method == 'GET':
-        items = MenuItem.query.all()
-        return jsonify([{
-            'id': item.id,
-            'name': item.name,
-            'description': item.description,
-            'price': item.price,
-            'category': item.category,
-            'image_url': item.image_url,
-            'is_available': item.is_available,
-            'extras': [{
-                'id': extra.id,
-                'name': extra.name,
-                'price': extra.price
-            } for extra in item.extras],
-            'sizes': [{
-                'id': size.id,
-                'name': size.name,
-                'price': size.price
-            } for size in item.sizes],
-            'piece_options': [{
-                'id': p.id,
-                'quantity': p.quantity,
-                'price': p.price,
-                'is_default': p.is_default
-            } for p in item.piece_options]
-        } for item in items])
+        items = menu_items_query().all()
+        stock = get_stock_index()['levels']
+        return jsonify([serialize_menu_item(item, include_availability=True, stock=stock) for item in items])
     
     if request.method == 'POST':
         try:
@@ -569,16 +2377,20 @@ def manage_menu_items():
                 if not data.get(field):
                     return jsonify({'error': f'{field} is required'}), 400
 
+            category = find_category(data['category'])
+            if category is None:
+                return jsonify({'error': f"Unknown category: {data['category']}"}), 400
+
             # Create new menu item
             new_item = MenuItem(
                 name=data['name'],
                 description=data['description'],
                 price=float(data['price']),
-                category=data['category'],
+                category=category,
                 image_url=data.get('image_url', ''),
                 is_available=data.get('is_available', True)
             )
-            print(f"Creating menu item with category: {new_item.category}")  # Debug log
+            print(f"Creating menu item with category: {category.name}")  # Debug log
 
             # Add extras if provided
             if 'extras' in data and data['extras']:
@@ -609,12 +2421,16 @@ def manage_menu_items():
                     new_item.piece_options.append(option)
 
             db.session.add(new_item)
+            db.session.flush()
+            # Read the keys before the commit expires them, saving a reload
+            item_id, category_id = new_item.id, new_item.category_id
             db.session.commit()
-            print(f"Successfully created menu item with ID: {new_item.id}")  # Debug log
+            bump_menu_version([category_id])
+            print(f"Successfully created menu item with ID: {item_id}")  # Debug log
 
             return jsonify({
                 'message': 'Menu item created successfully',
-                'id': new_item.id
+                'id': item_id
             }), 201
 
         except Exception as e:
@@ -625,99 +2441,558 @@ def manage_menu_items():
 @app.route('/api/admin/menu-items/<int:item_id>', methods=['PUT', 'DELETE'])
 @admin_required
 def manage_menu_item(item_id):
-    item = MenuItem.query.get_or_404(item_id)
+    item = menu_items_query().filter_by(id=item_id).first_or_404()
     
+    category_ids = {item.category_id}
     if request.method == 'DELETE':
         db.session.delete(item)
         db.session.commit()
+        bump_menu_version(category_ids)
         return '', 204
     
     data = request.json
     item.name = data.get('name', item.name)
     item.description = data.get('description', item.description)
     item.price = data.get('price', item.price)
-    item.category = data.get('category', item.category)
+    if data.get('category'):
+        category = find_category(data['category'])
+        if category is None:
+            return jsonify({'error': f"Unknown category: {data['category']}"}), 400
+        item.category = category
     item.image_url = data.get('image_url', item.image_url)
     item.is_available = data.get('is_available', item.is_available)
+    category_ids.add(item.category.id)
     
     db.session.commit()
-    return jsonify({
-        'id': item.id,
+    bump_menu_version(category_ids)
+    # The commit expired the item, so reload it with its children in one go
+    item = menu_items_query().filter_by(id=item_id).one()
+    return jsonify(serialize_menu_item(item, include_availability=True, stock=get_stock_index()['levels']))
+
+#bulk menu import/export
+def menu_row(item):
+    """Flatten a menu item into the shape used by bulk export and import."""
+    return {
         'name': item.name,
         'description': item.description,
-        'price': item.price,
-        'category': item.category,
+        'price': float(item.price),
+        'category': item.category.name,
         'image_url': item.image_url,
         'is_available': item.is_available,
-        'extras': [{
-            'id': extra.id,
-            'name': extra.name,
-            'price': extra.price
-        } for extra in item.extras],
-        'sizes': [{
-            'id': size.id,
-            'name': size.name,
-            'price': size.price
-        } for size in item.sizes],
-        'piece_options': [{
-            'id': p.id,
-            'quantity': p.quantity,
-            'price': p.price,
-            'is_default': p.is_default
-        } for p in item.piece_options]
-    })
+        'extras': [{'name': e.name, 'price': float(e.price)} for e in item.extras],
+        'sizes': [{'name': s.name, 'price': float(s.price)} for s in item.sizes],
+        'piece_options': [{'quantity': p.quantity, 'price': float(p.price), 'is_default': p.is_default}
+                          for p in item.piece_options]
+    }
+
+def bulk_format():
+    """Pick csv or ndjson from ?format=, falling back to the request content type."""
+    requested = request.args.get('format')
+    if requested:
+        return requested.lower()
+    return 'csv' if 'csv' in (request.content_type or '') else 'ndjson'
+
+def export_menu_rows(fmt):
+    items = menu_items_query().order_by(MenuItem.id).yield_per(MENU_IMPORT_BATCH_SIZE)
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=MENU_EXPORT_FIELDS)
+        writer.writeheader()
+        for item in items:
+            row = menu_row(item)
+            for field in ('extras', 'sizes', 'piece_options'):
+                row[field] = json.dumps(row[field]) if row[field] else ''
+            row['is_available'] = 'true' if row['is_available'] else 'false'
+            writer.writerow(row)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    else:
+        for item in items:
+            yield json.dumps(menu_row(item)) + '\n'
+
+def read_menu_rows(fmt):
+    """Yield (row number, row) from the request body without buffering it."""
+    stream = io.TextIOWrapper(request.stream, encoding='utf-8-sig')
+    if fmt == 'csv':
+        for number, row in enumerate(csv.DictReader(stream), start=1):
+            yield number, row
+    else:
+        for number, line in enumerate(stream, start=1):
+            if line.strip():
+                yield number, line
+
+def parse_flag(value, default):
+    if value is None or value == '':
+        return default
+    if isinstance(value, bool):
+        return value
+    if str(value).strip().lower() in ('1', 'true', 'yes', 'y'):
+        return True
+    if str(value).strip().lower() in ('0', 'false', 'no', 'n'):
+        return False
+    raise ValueError(f"Invalid boolean: {value}")
+
+def parse_options(value, fields):
+    """Nested options are lists in NDJSON and JSON-encoded lists in CSV cells."""
+    if isinstance(value, str):
+        value = json.loads(value) if value.strip() else []
+    if not isinstance(value or [], list):
+        raise ValueError('Options must be a list')
+    options = []
+    for option in value or []:
+        missing = [field for field in fields if option.get(field) in (None, '')]
+        if missing:
+            raise ValueError(f"Option is missing {', '.join(missing)}")
+        options.append(option)
+    return options
+
+def parse_menu_row(row, categories):
+    """Validate one import row; raises ValueError with a message for the admin."""
+    if isinstance(row, str):
+        row = json.loads(row)
+    if not isinstance(row, dict):
+        raise ValueError('Row must be an object')
+    # A zero price and an empty description are valid, and export writes both
+    for field in ('name', 'price', 'category'):
+        if row.get(field) in (None, ''):
+            raise ValueError(f'{field} is required')
+    category_id = categories.get(str(row['category']).strip().lower())
+    if category_id is None:
+        raise ValueError(f"Unknown category: {row['category']}")
+
+    def price(value):
+        # NaN and infinity parse as decimals but cannot be compared or stored
+        try:
+            amount = Decimal(str(value))
+            if amount.is_finite():
+                amount = money(amount)
+        except InvalidOperation:
+            raise ValueError(f"Invalid price: {value}")
+        if not amount.is_finite() or amount < 0 or amount >= MENU_IMPORT_MAX_PRICE:
+            raise ValueError(f"Invalid price: {value}")
+        return amount
+
+    return {
+        'item': {
+            'name': str(row['name']).strip(),
+            'description': row.get('description') or '',
+            'price': price(row['price']),
+            'category_id': category_id,
+            'image_url': row.get('image_url') or None,
+            'is_available': parse_flag(row.get('is_available'), True)
+        },
+        'extras': [{'name': e['name'], 'price': price(e['price'])}
+                   for e in parse_options(row.get('extras'), ('name', 'price'))],
+        'sizes': [{'name': s['name'], 'price': price(s['price'])}
+                  for s in parse_options(row.get('sizes'), ('name', 'price'))],
+        'piece_options': [{'quantity': int(p['quantity']), 'price': price(p['price']),
+                           'is_default': parse_flag(p.get('is_default'), False)}
+                          for p in parse_options(row.get('piece_options'), ('quantity', 'price'))]
+    }
+
+def insert_menu_rows(rows):
+    """Insert a batch of parsed rows with one statement per table."""
+    item_ids = db.session.execute(
+        insert(MenuItem).returning(MenuItem.id, sort_by_parameter_order=True),
+        [row['item'] for row in rows]
+    ).scalars().all()
+    # Bulk inserts skip mapper events, so log the new items here
+    record_menu_changes(db.session.connection(), [('menu_item', item_id, 'insert') for item_id in item_ids])
+    for model, key in ((Extra, 'extras'), (Size, 'sizes'), (PieceOption, 'piece_options')):
+        children = [dict(child, menu_item_id=item_id)
+                    for item_id, row in zip(item_ids, rows) for child in row[key]]
+        if children:
+            db.session.execute(insert(model), children)
+
+@app.route('/api/admin/menu-items/bulk', methods=['GET', 'POST'])
+@admin_required
+def bulk_menu_items():
+    fmt = bulk_format()
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+
+    if request.method == 'GET':
+        mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+        response = Response(stream_with_context(export_menu_rows(fmt)), mimetype=mimetype)
+        response.headers['Content-Disposition'] = f'attachment; filename=menu.{fmt if fmt == "csv" else "ndjson"}'
+        return response
+
+    # Validate every row, inserting in batches inside one transaction; any
+    # bad row rolls the whole import back so a menu never loads half-way
+    categories = {name.lower(): category_id for category_id, name in db.session.query(Category.id, Category.name)}
+    errors = []
+    batch = []
+    imported = 0
+    category_ids = set()
+    try:
+        for number, row in read_menu_rows(fmt):
+            if number > MENU_IMPORT_MAX_ROWS:
+                errors.append({'row': number, 'error': f'Imports are limited to {MENU_IMPORT_MAX_ROWS} rows'})
+                break
+            try:
+                batch.append(parse_menu_row(row, categories))
+                category_ids.add(batch[-1]['item']['category_id'])
+            except (ValueError, KeyError, TypeError, AttributeError, ArithmeticError) as e:
+                errors.append({'row': number, 'error': str(e)})
+                if len(errors) >= MENU_IMPORT_MAX_ERRORS:
+                    break
+                continue
+            if len(batch) >= MENU_IMPORT_BATCH_SIZE and not errors:
+                insert_menu_rows(batch)
+                imported += len(batch)
+                batch = []
+        if batch and not errors:
+            insert_menu_rows(batch)
+            imported += len(batch)
+    except (ValueError, csv.Error) as e:
+        db.session.rollback()
+        return jsonify({'error': f'Could not read import: {str(e)}'}), 400
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(f"Error importing menu items: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+    if errors:
+        db.session.rollback()
+        return jsonify({'error': 'Import rejected', 'errors': errors}), 400
+    if not imported:
+        return jsonify({'error': 'No rows to import'}), 400
+
+    db.session.commit()
+    bump_menu_version(category_ids)
+    return jsonify({'message': 'Menu items imported successfully', 'imported': imported}), 201
 
 @app.route('/api/menu-items', methods=['GET'])
-# @cache.cached(timeout=300, query_string=True)  # Cache for 5 minutes, vary by query string
+@query_budget(5)
 def get_menu_items():
     try:
         # Get category from query parameters
         category = request.args.get('category', None)
-        
-        # Base query with eager loading of relationships
-        query = MenuItem.query.options(
-            db.joinedload(MenuItem.extras),
-            db.joinedload(MenuItem.sizes),
-            db.joinedload(MenuItem.piece_options)
-        ).filter_by(is_available=True)
-        
-        # Apply category filter if provided
+        category_id = None
         if category:
-            query = query.filter(MenuItem.category == category)
-        
-        # Execute query
-        menu_items = query.all()
-        
-        items_list = [{
-            'id': item.id,
-            'name': item.name,
-            'description': item.description,
-            'price': float(item.price),
-            'category': item.category,
-            'image_url': item.image_url,
-            'extras': [{'id': e.id, 'name': e.name, 'price': float(e.price)} for e in item.extras],
-            'sizes': [{'id': s.id, 'name': s.name, 'price': float(s.price)} for s in item.sizes],
-            'piece_options': [{'id': p.id, 'quantity': p.quantity, 'price': float(p.price), 'is_default': p.is_default} 
-                            for p in item.piece_options]
-        } for item in menu_items]
-        
-        return jsonify(items_list), 200
+            # Keyed by id, so spellings of a name share one snapshot and
+            # names that match nothing never get one
+            category_id = find_category_id(category)
+            if category_id is None:
+                return jsonify([])
+
+        snapshot = get_menu_snapshot(
+            f'items:{category_id or "*"}',
+            lambda: build_menu_items(category_id)
+        )
+        return snapshot_response(snapshot)
     except Exception as e:
         app.logger.error(f"Error in get_menu_items: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/menu/bootstrap', methods=['GET'])
+@query_budget(7)
+def get_menu_bootstrap():
+    """Everything a kiosk needs at start-up in one cached, compressed response."""
+    try:
+        since = request.args.get('since', type=int)
+        if since is not None:
+            since = known_menu_version(since)
+        name = f'bootstrap:{since}' if since is not None else 'bootstrap'
+        return snapshot_response(get_menu_snapshot(name, lambda: build_bootstrap(since)))
+    except Exception as e:
+        app.logger.error(f"Error in get_menu_bootstrap: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/menu/changes', methods=['GET'])
+@query_budget(7)
+def get_menu_changes():
+    """Menu deltas after a change version, for kiosks that patch an in-memory menu."""
+    since = request.args.get('since', type=int)
+    if since is None or since < 0:
+        return jsonify({'error': 'since must be a change version'}), 400
+    limit = min(request.args.get('limit', MENU_CHANGES_PAGE_SIZE, type=int), MENU_CHANGES_PAGE_SIZE)
+    if limit <= 0:
+        return jsonify({'error': 'limit must be positive'}), 400
+    try:
+        return jsonify(build_menu_changes(since, limit))
+    except Exception as e:
+        app.logger.error(f"Error in get_menu_changes: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/api/menu/stock', methods=['GET'])
+def get_menu_stock():
+    """Sold-out and remaining counts for kiosks to lay over their cached menu."""
+    try:
+        overlay = get_stock_index()['overlay']
+    except Exception as e:
+        app.logger.error(f"Error in get_menu_stock: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+    response = app.response_class(overlay['body'], status=200, mimetype='application/json')
+    response.set_etag(overlay['etag'])
+    response.headers['Cache-Control'] = 'no-cache'
+    return response.make_conditional(request)
+
+#stock admin
+STOCK_MODELS = {'menu_item': MenuItem, 'extra': Extra, 'size': Size}
+
+def serialize_stock_level(level):
+    return {
+        'entity': level.entity,
+        'id': level.entity_id,
+        'is_available': level.is_available,
+        'remaining': level.remaining,
+        'updated_at': level.updated_at.isoformat() if level.updated_at else None
+    }
+
+@app.route('/api/admin/stock', methods=['GET'])
+@admin_required
+@query_budget(2)
+def get_stock_levels():
+    levels = StockLevel.query.order_by(StockLevel.entity, StockLevel.entity_id).all()
+    return jsonify([serialize_stock_level(level) for level in levels])
+
+@app.route('/api/admin/stock/<entity>/<int:entity_id>', methods=['PUT', 'DELETE'])
+@admin_required
+def update_stock_level(entity, entity_id):
+    """Flip availability or set a count without touching the menu or its caches."""
+    if entity not in STOCK_MODELS:
+        return jsonify({'error': f'Unknown stock entity: {entity}'}), 404
+
+    if request.method == 'DELETE':
+        # Back to the default: available and not counted
+        StockLevel.query.filter_by(entity=entity, entity_id=entity_id).delete()
+        db.session.commit()
+        broadcast_invalidation('stock_levels')
+        return '', 204
+
+    data = request.get_json(silent=True) or {}
+    values = {}
+    if 'is_available' in data:
+        if not isinstance(data['is_available'], bool):
+            return jsonify({'error': 'is_available must be true or false'}), 400
+        values['is_available'] = data['is_available']
+    if 'remaining' in data:
+        remaining = data['remaining']
+        if remaining is not None and (isinstance(remaining, bool) or not isinstance(remaining, int) or remaining < 0):
+            return jsonify({'error': 'remaining must be a non-negative integer or null'}), 400
+        values['remaining'] = remaining
+    if not values:
+        return jsonify({'error': 'Provide is_available and/or remaining'}), 400
+
+    if db.session.get(STOCK_MODELS[entity], entity_id) is None:
+        return jsonify({'error': f'{entity} {entity_id} not found'}), 404
+    try:
+        set_stock_level(entity, entity_id, values)
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+    # Every worker drops its index on its next invalidation poll
+    broadcast_invalidation('stock_levels')
+    return jsonify(serialize_stock_level(db.session.get(StockLevel, (entity, entity_id))))
+
+#image proxy
+image_session = pooled_session()
+image_sources_lock = threading.Lock()
+image_sources = {'version': None, 'by_id': {}}
+
+def image_source_id(url):
+    return hashlib.sha256(url.encode('utf-8')).hexdigest()[:24]
+
+def image_pointer_path(source_id):
+    return os.path.join(IMAGE_CACHE_DIR, 'urls', source_id)
+
+def read_image_digest(source_id):
+    """Return the content hash a source was last stored under, or None if never fetched."""
+    try:
+        with open(image_pointer_path(source_id)) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def proxied_image_url(url):
+    """Point a menu image at its variants, leaving anything we cannot proxy alone."""
+    if Image is None or not url or not url.startswith(('http://', 'https://')):
+        return url
+    source_id = image_source_id(url)
+    # Never the host this request came in on: snapshots are shared by
+    # every client, whatever address each of them used
+    path = f"{IMAGE_BASE_URL.rstrip('/')}/api/images/{source_id}"
+    # The content hash makes the URL safe to cache for good; until the
+    # source has been fetched once, the bare URL is revalidated instead
+    digest = read_image_digest(source_id)
+    return f'{path}/{digest[:IMAGE_DIGEST_LENGTH]}' if digest else path
+
+def get_image_sources():
+    """Map source ids to the image URLs on the menu; nothing else is ever fetched."""
+    version = get_menu_version()
+    record_cache('image_sources', image_sources['version'] == version)
+    if image_sources['version'] != version:
+        with image_sources_lock:
+            if image_sources['version'] != version:
+                urls = [url for (url,) in db.session.query(MenuItem.image_url).filter(MenuItem.image_url != '')]
+                urls += [url for (url,) in db.session.query(Category.image_url).filter(Category.image_url != '')]
+                by_id = {image_source_id(url): url for url in urls if url}
+                image_sources.update(by_id=by_id, version=version)
+    return image_sources['by_id']
+
+def write_file_atomic(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.{threading.get_ident()}.tmp'
+    with open(temp_path, 'wb') as f:
+        f.write(data)
+    os.replace(temp_path, path)
+
+def fetch_image_source(url):
+    with timed_call('images', 'fetch'):
+        response = image_session.get(url, timeout=OUTBOUND_TIMEOUT, stream=True)
+        response.raise_for_status()
+        chunks, size = [], 0
+        for chunk in response.iter_content(64 * 1024):
+            size += len(chunk)
+            if size > IMAGE_MAX_SOURCE_BYTES:
+                raise ValueError(f'Image is larger than {IMAGE_MAX_SOURCE_BYTES} bytes')
+            chunks.append(chunk)
+    return b''.join(chunks)
+
+def image_source_fresh(source_id):
+    try:
+        return time.time() - os.path.getmtime(image_pointer_path(source_id)) < IMAGE_SOURCE_TTL_SECONDS
+    except FileNotFoundError:
+        return False
+
+def image_category_ids(url):
+    """Categories whose menu shows `url`, on an item or on the category itself."""
+    category_ids = {category_id for (category_id,) in
+                    db.session.query(MenuItem.category_id).filter(MenuItem.image_url == url)}
+    category_ids |= {category_id for (category_id,) in db.session.query(Category.id).filter(Category.image_url == url)}
+    return category_ids
+
+def load_image_source(source_id, url, refresh=False):
+    """Return the hash a source image is stored under, downloading it when due.
+
+    A stored source is downloaded again once it is older than
+    IMAGE_SOURCE_TTL_SECONDS, or at once with `refresh`; if that fails the
+    old content is kept. A new hash moves the menu to a new version so
+    menus link the variants under their new URL.
+    """
+    previous = read_image_digest(source_id)
+    if previous and not refresh and image_source_fresh(source_id):
+        return previous
+    pointer = image_pointer_path(source_id)
+    with shared_lock(f'image:{source_id}'):
+        previous = read_image_digest(source_id)
+        if previous and not refresh and image_source_fresh(source_id):
+            return previous  # another worker downloaded it meanwhile
+        try:
+            data = fetch_image_source(url)
+        except (requests.RequestException, ValueError) as e:
+            if previous is None:
+                raise
+            app.logger.warning(f"Keeping image {source_id}, could not download {url} again: {str(e)}")
+            os.utime(pointer)  # try again after another TTL
+            return previous
+        # Stored by content, so menu entries sharing a picture share its variants
+        digest = hashlib.sha256(data).hexdigest()
+        if digest != previous:
+            write_file_atomic(os.path.join(IMAGE_CACHE_DIR, 'sources', digest), data)
+        write_file_atomic(pointer, digest.encode('utf-8'))
+    if digest != previous:
+        category_ids = image_category_ids(url)
+        if category_ids:
+            bump_menu_version(category_ids)
+    return digest
+
+def render_image_variant(source_path, width, fmt):
+    # Each step returns a new image; close them all, not just the source
+    with Image.open(source_path) as source, ExitStack() as images:
+        # Let the JPEG decoder scale down while decoding instead of after
+        source.draft('RGB', (width, width * source.height // max(source.width, 1)))
+        image = images.enter_context(ImageOps.exif_transpose(source))
+        if image.width > width:
+            image = images.enter_context(
+                image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+            )
+        has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+        if fmt == 'jpeg' or not has_alpha:
+            if has_alpha:
+                rgba = images.enter_context(image.convert('RGBA'))
+                image = images.enter_context(Image.new('RGB', image.size, 'white'))
+                image.paste(rgba, mask=images.enter_context(rgba.getchannel('A')))
+            image = images.enter_context(image.convert('RGB'))
+        else:
+            image = images.enter_context(image.convert('RGBA'))
+        output = io.BytesIO()
+        options = {'progressive': True, 'optimize': True} if fmt == 'jpeg' else {}
+        image.save(output, format=fmt.upper(), quality=IMAGE_QUALITY[fmt], **options)
+    return output.getvalue()
+
+def image_variant_format():
+    """Pick the smallest format the client says it takes; */* does not count."""
+    accepted = {value for value, quality in request.accept_mimetypes if quality > 0}
+    for fmt in ('avif', 'webp'):
+        if f'image/{fmt}' in accepted and image_features.check(fmt):
+            return fmt
+    return 'jpeg'
+
+def image_variant_width(requested):
+    if requested is None or requested <= 0:
+        return IMAGE_DEFAULT_WIDTH
+    return next((width for width in IMAGE_WIDTHS if width >= requested), IMAGE_WIDTHS[-1])
+
+@app.route('/api/images/<source_id>', methods=['GET'])
+@app.route('/api/images/<source_id>/<digest_prefix>', methods=['GET'])
+def get_image(source_id, digest_prefix=None):
+    """A menu image resized to ?w= and encoded as AVIF, WebP or JPEG, built once."""
+    if Image is None:
+        return jsonify({'error': 'Image resizing is not available'}), 503
+    url = get_image_sources().get(source_id)
+    if url is None:
+        return jsonify({'error': 'Image not found'}), 404
+    width = image_variant_width(request.args.get('w', type=int))
+    fmt = image_variant_format()
+    try:
+        digest = load_image_source(source_id, url)
+        path = os.path.join(IMAGE_CACHE_DIR, 'variants', digest[:2], f'{digest}-{width}.{fmt}')
+        record_cache('image_variant', os.path.exists(path))
+        if not os.path.exists(path):
+            with shared_lock(f'image:{digest}:{width}:{fmt}'):
+                if not os.path.exists(path):
+                    source_path = os.path.join(IMAGE_CACHE_DIR, 'sources', digest)
+                    write_file_atomic(path, render_image_variant(source_path, width, fmt))
+    except (requests.RequestException, ValueError, OSError, Image.DecompressionBombError) as e:
+        app.logger.error(f"Error serving image {source_id} from {url}: {str(e)}")
+        return jsonify({'error': 'Image unavailable'}), 502
+
+    # Only a URL naming the content served is cached for good; the bare URL
+    # and one naming replaced content are checked against the ETag each time
+    immutable = digest_prefix is not None and digest[:IMAGE_DIGEST_LENGTH] == digest_prefix
+    response = send_file(path, mimetype=f'image/{fmt}', etag=f'{digest[:IMAGE_DIGEST_LENGTH]}-{width}-{fmt}',
+                         max_age=IMAGE_MAX_AGE if immutable else 0, conditional=True)
+    response.cache_control.public = True
+    if immutable:
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    response.vary.add('Accept')
+    return response
+
+@app.cli.command('refresh-images')
+def refresh_images_command():
+    """Download every menu image again; menus link any that changed under a new URL."""
+    changed = failed = 0
+    sources = get_image_sources()
+    for source_id, url in sources.items():
+        previous = read_image_digest(source_id)
+        try:
+            if load_image_source(source_id, url, refresh=True) != previous:
+                changed += 1
+        except (requests.RequestException, ValueError, OSError) as e:
+            failed += 1
+            print(f"Could not download {url}: {str(e)}")
+    print(f"Checked {len(sources)} images: {changed} changed, {failed} failed")
+
 @app.route('/api/categories', methods=['GET'])
 def get_public_categories():
     try:
-        categories = Category.query.all()
-        return jsonify([{
-            'id': cat.id,
-            'name': cat.name,
-            'description': cat.description,
-            'image_url': cat.image_url,
-            'icon': cat.icon,
-            'is_default': cat.is_default
-        } for cat in categories])
+        return snapshot_response(get_menu_snapshot('categories', build_categories))
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -761,6 +3036,7 @@ def create_category():
         
         db.session.add(new_category)
         db.session.commit()
+        bump_menu_version([new_category.id])
         
         return jsonify({
             'id': new_category.id,
@@ -797,6 +3073,8 @@ def update_category(id):
             category.is_default = data['is_default']
             
         db.session.commit()
+        # Items carry their category's name, so a rename changes them too
+        bump_menu_version([category.id])
         
         return jsonify({
             'id': category.id,
@@ -815,41 +3093,301 @@ def update_category(id):
 def delete_category(id):
     try:
         category = Category.query.get_or_404(id)
+        if MenuItem.query.filter_by(category_id=category.id).first():
+            return jsonify({'error': 'Category still has menu items'}), 400
+        category_id = category.id
         db.session.delete(category)
         db.session.commit()
+        bump_menu_version([category_id])
         return jsonify({'message': 'Category deleted successfully'})
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
-@app.route('/api/admin/orders', methods=['GET'])
-@admin_required
-def get_all_orders():
-    orders = Order.query.order_by(Order.created_at.desc()).all()
-    return jsonify([{
+#order listing helpers
+def encode_order_cursor(order):
+    raw = json.dumps([order.created_at.isoformat(), order.id])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii')
+
+def decode_order_cursor(cursor):
+    created_at, order_id = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    return datetime.fromisoformat(created_at), int(order_id)
+
+def parse_date_param(value, end_of_day=False):
+    """Parse an ISO date or datetime; a bare end date covers the whole day."""
+    parsed = datetime.fromisoformat(value)
+    if end_of_day and len(value) == 10:
+        parsed += timedelta(days=1) - timedelta(microseconds=1)
+    return parsed
+
+def serialize_order_item(item):
+    return {
+        'item_name': item.item_name,
+        'quantity': item.quantity,
+        'price': float(item.price),
+        'extras': item.extras,
+        'size': item.size,
+        'piece_option': item.piece_option
+    }
+
+def serialize_order(order, fields=ORDER_FIELDS):
+    data = {
         'id': order.id,
         'order_number': order.order_number,
         'email': order.email,
         'phone': order.phone,
-        'total_amount': order.total_amount,
+        'total_amount': float(order.total_amount),
         'status': order.status,
         'created_at': order.created_at.isoformat(),
-        'items': [{
-            'item_name': item.item_name,
-            'quantity': item.quantity,
-            'price': item.price,
-            'extras': item.extras,
-            'size': item.size,
-            'piece_option': item.piece_option
-        } for item in order.items]
-    } for order in orders])
+    }
+    if 'items' in fields:
+        data['items'] = [serialize_order_item(item) for item in order.items]
+    return {field: data[field] for field in fields}
+
+def filter_orders(query):
+    """Apply the status and date range filters shared by listing and export."""
+    if request.args.get('status'):
+        query = query.filter(Order.status.in_(request.args['status'].split(',')))
+    if request.args.get('start_date'):
+        query = query.filter(Order.created_at >= parse_date_param(request.args['start_date']))
+    if request.args.get('end_date'):
+        query = query.filter(Order.created_at <= parse_date_param(request.args['end_date'], end_of_day=True))
+    return query
+
+def export_order_rows(query, fmt):
+    """Yield export text one cursor batch at a time, one row per line item."""
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=ORDER_EXPORT_FIELDS) if fmt == 'csv' else None
+    if writer:
+        writer.writeheader()
+    result = db.session.execute(query, execution_options={'yield_per': ORDER_EXPORT_BATCH_SIZE})
+    for partition in result.partitions():
+        for row in partition:
+            data = {
+                'order_number': row.order_number,
+                'created_at': row.created_at.isoformat() if row.created_at else None,
+                'status': row.status,
+                'email': row.email,
+                'phone': row.phone,
+                'total_amount': float(row.total_amount),
+                'item_name': row.item_name,
+                'quantity': row.quantity,
+                'price': float(row.price) if row.price is not None else None,
+                'line_total': float(row.price * row.quantity) if row.price is not None else None,
+                'extras': row.extras,
+                'size': row.size,
+                'piece_option': row.piece_option
+            }
+            if writer:
+                for field in ('extras', 'size', 'piece_option'):
+                    data[field] = json.dumps(data[field]) if data[field] else ''
+                writer.writerow(data)
+            else:
+                buffer.write(json.dumps(data) + '\n')
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31 writes a gzip header
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode())
+        if data:
+            yield data
+    yield compressor.flush()
+
+@app.route('/api/admin/orders/export', methods=['GET'])
+@admin_required
+def export_orders():
+    """Stream line items for accounting in constant memory, as CSV or NDJSON."""
+    fmt = request.args.get('format', 'csv').lower()
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': f'Unsupported format: {fmt}'}), 400
+    compress = request.args.get('gzip') in ('1', 'true')
+    try:
+        query = filter_orders(db.session.query(
+            Order.order_number, Order.created_at, Order.status, Order.email, Order.phone,
+            Order.total_amount, OrderItem.item_name, OrderItem.quantity, OrderItem.price,
+            OrderItem.extras, OrderItem.size, OrderItem.piece_option
+        ).outerjoin(OrderItem, OrderItem.order_id == Order.id))
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid filter parameters'}), 400
+
+    # yield_per streams through a server-side cursor on Postgres, so only one
+    # batch of rows is held in memory at a time
+    query = query.order_by(Order.created_at, Order.id, OrderItem.id).statement
+
+    chunks = export_order_rows(query, fmt)
+    filename = f"orders.{fmt}"
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    if compress:
+        chunks = gzip_stream(chunks)
+        filename += '.gz'
+        mimetype = 'application/gzip'
+    response = Response(stream_with_context(chunks), mimetype=mimetype)
+    response.headers['Content-Disposition'] = f'attachment; filename={filename}'
+    return response
+
+@app.route('/api/admin/orders', methods=['GET'])
+@admin_required
+@query_budget(2)
+def get_all_orders():
+    try:
+        limit = min(int(request.args.get('limit', ORDERS_PAGE_SIZE)), ORDERS_MAX_PAGE_SIZE)
+        if limit <= 0:
+            raise ValueError('limit must be positive')
+
+        fields = ORDER_FIELDS
+        if request.args.get('fields'):
+            fields = tuple(f for f in request.args['fields'].split(',') if f)
+            unknown = [f for f in fields if f not in ORDER_FIELDS]
+            if unknown:
+                return jsonify({'error': f'Unknown fields: {", ".join(unknown)}'}), 400
+
+        query = filter_orders(orders_query(with_items='items' in fields))
+        if request.args.get('cursor'):
+            cursor_created_at, cursor_id = decode_order_cursor(request.args['cursor'])
+            query = query.filter(or_(
+                Order.created_at < cursor_created_at,
+                and_(Order.created_at == cursor_created_at, Order.id < cursor_id)
+            ))
+    except (ValueError, TypeError):
+        return jsonify({'error': 'Invalid pagination or filter parameters'}), 400
+
+    # Fetch one extra row to learn whether another page exists
+    orders = query.order_by(Order.created_at.desc(), Order.id.desc()).limit(limit + 1).all()
+    has_more = len(orders) > limit
+    orders = orders[:limit]
+
+    response = jsonify([serialize_order(order, fields) for order in orders])
+    if has_more:
+        response.headers['X-Next-Cursor'] = encode_order_cursor(orders[-1])
+    return response
+
+order_stream_slots = threading.BoundedSemaphore(ORDER_STREAM_MAX_PER_WORKER)
+
+@app.route('/api/admin/orders/stream-ticket', methods=['POST'])
+@admin_required
+def issue_order_stream_ticket():
+    """A short-lived credential that opens the order stream and nothing else."""
+    token = request.headers['Authorization'].split(' ')[1]
+    payload = jwt.decode(token, os.getenv('JWT_SECRET_KEY'), algorithms=['HS256'])
+    admin = db.session.get(Admin, payload['admin_id'])
+    now = int(time.time())
+    ticket = jwt.encode(
+        {
+            'admin_id': admin.id,
+            'pwd': password_fingerprint(admin),
+            'purpose': 'order_stream',
+            'session_exp': payload['exp'],  # the stream ends with the admin's session
+            'exp': min(now + ORDER_STREAM_TICKET_SECONDS, payload['exp'])
+        },
+        os.getenv('JWT_SECRET_KEY'),
+        algorithm='HS256'
+    )
+    return jsonify({'ticket': ticket, 'expires_in': ORDER_STREAM_TICKET_SECONDS})
+
+def verify_stream_credentials():
+    """Return (admin id, password fingerprint, session expiry) for a stream request."""
+    auth_header = request.headers.get('Authorization')
+    if auth_header:
+        token = auth_header.split(' ')[1]
+        verify_admin_token(token)
+        payload = jwt.decode(token, os.getenv('JWT_SECRET_KEY'), algorithms=['HS256'])
+        expires_at = payload['exp']
+    else:
+        payload = jwt.decode(request.args['ticket'], os.getenv('JWT_SECRET_KEY'), algorithms=['HS256'])
+        if payload.get('purpose') != 'order_stream':
+            raise Exception('Not an order stream ticket')
+        expires_at = payload['session_exp']
+    admin = check_admin_claims(payload)
+    return admin.id, password_fingerprint(admin), expires_at
+
+def stream_still_authorized(admin_id, fingerprint, expires_at):
+    if time.time() >= expires_at:
+        return False
+    admin = db.session.get(Admin, admin_id)
+    authorized = admin is not None and password_fingerprint(admin) == fingerprint
+    db.session.rollback()
+    return authorized
+
+@app.route('/api/admin/orders/stream', methods=['GET'])
+def stream_orders():
+    """Server-Sent Events feed of order creations and status changes."""
+    if not request.headers.get('Authorization') and not request.args.get('ticket'):
+        return jsonify({'error': 'No authorization header'}), 401
+    try:
+        admin_id, fingerprint, expires_at = verify_stream_credentials()
+    except Exception:
+        return jsonify({'error': 'Invalid token'}), 401
+
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        return jsonify({'error': 'Invalid Last-Event-ID'}), 400
+    if last_event_id is None:
+        last_event_id = db.session.query(func.coalesce(func.max(OrderEvent.id), 0)).scalar()
+    db.session.rollback()
+
+    def generate(last_event_id):
+        yield "retry: 3000\n\n"
+        last_sent = time.time()
+        next_check = time.monotonic() + ORDER_STREAM_REVALIDATE_SECONDS
+        while True:
+            # A revoked admin or an expired session must not keep the feed
+            if time.monotonic() >= next_check:
+                next_check = time.monotonic() + ORDER_STREAM_REVALIDATE_SECONDS
+                if not stream_still_authorized(admin_id, fingerprint, expires_at):
+                    yield "event: unauthorized\ndata: {}\n\n"
+                    return
+
+            events = OrderEvent.query.filter(
+                OrderEvent.id > last_event_id
+            ).order_by(OrderEvent.id).limit(ORDER_STREAM_BATCH_SIZE).all()
+            # End the transaction so an idle stream does not pin a pooled connection
+            db.session.rollback()
+
+            for order_event in events:
+                last_event_id = order_event.id
+                yield format_sse(order_event)
+            if events:
+                last_sent = time.time()
+                if len(events) == ORDER_STREAM_BATCH_SIZE:
+                    continue
+            elif time.time() - last_sent >= ORDER_STREAM_HEARTBEAT_SECONDS:
+                yield ": keep-alive\n\n"
+                last_sent = time.time()
+
+            # Commits in this process wake us at once; the timeout picks up
+            # events written by other workers
+            with order_event_condition:
+                order_event_condition.wait(ORDER_STREAM_POLL_SECONDS)
+
+    if not order_stream_slots.acquire(blocking=False):
+        response = jsonify({'error': 'Too many order streams open on this server'})
+        response.headers['Retry-After'] = '10'
+        return response, 503
+
+    response = Response(stream_with_context(generate(last_event_id)), mimetype='text/event-stream')
+    # Runs when the client goes away, whether or not the stream was ever read
+    response.call_on_close(order_stream_slots.release)
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
 
 @app.route('/api/admin/orders/<order_number>/status', methods=['PUT'])
 @admin_required
 def update_order_status(order_number):
     order = Order.query.filter_by(order_number=order_number).first_or_404()
     data = request.json
-    order.status = data['status']
+    try:
+        set_order_status(order, data['status'])
+    except SoldOut as e:
+        # Reopening a cancelled order needs its stock back
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 409
     db.session.commit()
     return jsonify({
         'order_number': order.order_number,
@@ -859,6 +3397,7 @@ def update_order_status(order_number):
 # Business Intelligence Routes
 @app.route('/api/admin/analytics', methods=['GET'])
 @admin_required
+@query_budget(4)
 def get_analytics():
     try:
         timeframe = request.args.get('timeframe', 'daily')
@@ -868,8 +3407,8 @@ def get_analytics():
                 'message': 'Timeframe must be one of: daily, weekly, monthly'
             }), 400
         
-        # Get current date
-        today = datetime.now()
+        # Rollups are bucketed by the UTC order timestamps
+        today = datetime.utcnow()
         
         if timeframe == 'daily':
             start_date = today - timedelta(days=7)
@@ -881,12 +3420,6 @@ def get_analytics():
             start_date = today - timedelta(days=365)
             group_format = '%Y-%m'
 
-        # Get orders within the timeframe
-        orders = Order.query.filter(
-            Order.created_at >= start_date,
-            Order.status == 'completed'
-        ).all()
-
         # Initialize response data
         response_data = {
             'totalRevenue': 0,
@@ -897,62 +3430,64 @@ def get_analytics():
             'topProducts': []    # Initialize as array
         }
 
-        if orders:
-            # Calculate total revenue and orders
-            total_revenue = sum(order.total_amount for order in orders)
-            total_orders = len(orders)
-            avg_order_value = total_revenue / total_orders if total_orders > 0 else 0
+        # Everything below reads the rollups kept up to date as orders
+        # complete, so the cost is independent of the order volume. Product
+        # rollups are only kept per day, so every figure starts at the same
+        # midnight and the totals always match the lists beside them
+        start_day = start_date.replace(hour=0, minute=0, second=0, microsecond=0)
+        total_revenue, total_orders = db.session.query(
+            func.coalesce(func.sum(SalesRollup.revenue), 0),
+            func.coalesce(func.sum(SalesRollup.order_count), 0)
+        ).filter(
+            SalesRollup.period == 'day',
+            SalesRollup.bucket_start >= start_day
+        ).one()
+
+        if total_orders:
+            avg_order_value = total_revenue / total_orders
 
             # Daily revenue trend
             daily_sales = {}
-            category_sales = {}  # Track category sales
-            product_sales = {}   # Track product sales
-            
-            for order in orders:
-                # Process daily sales
-                date_key = order.created_at.strftime(group_format)
-                daily_sales[date_key] = daily_sales.get(date_key, 0) + order.total_amount
-
-                # Process items
-                for item in order.items:
-                    # Track product sales
-                    product_sales[item.item_name] = product_sales.get(item.item_name, 0) + item.quantity
-                    
-                    # Categorize items
-                    category = 'Uncategorized'  # Default category
-                    if 'burger' in item.item_name.lower():
-                        category = 'Burgers'
-                    elif 'pizza' in item.item_name.lower():
-                        category = 'Pizza'
-                    elif 'drink' in item.item_name.lower() or 'soda' in item.item_name.lower():
-                        category = 'Drinks'
-                    elif 'side' in item.item_name.lower():
-                        category = 'Sides'
-                    elif 'breakfast' in item.item_name.lower():
-                        category = 'Breakfast'
-                      
-                    
-                    category_sales[category] = category_sales.get(category, 0) + item.quantity
+            day_rows = SalesRollup.query.filter(
+                SalesRollup.period == 'day',
+                SalesRollup.bucket_start >= start_day,
+                SalesRollup.order_count > 0
+            ).order_by(SalesRollup.bucket_start)
+            for row in day_rows:
+                date_key = row.bucket_start.strftime(group_format)
+                daily_sales[date_key] = daily_sales.get(date_key, 0) + row.revenue
+
+            category_sales = db.session.query(
+                ProductRollup.category, func.sum(ProductRollup.quantity)
+            ).filter(
+                ProductRollup.day >= start_day.date()
+            ).group_by(ProductRollup.category).having(func.sum(ProductRollup.quantity) > 0).all()
+
+            top_products = db.session.query(
+                ProductRollup.item_name, func.sum(ProductRollup.quantity).label('quantity')
+            ).filter(
+                ProductRollup.day >= start_day.date()
+            ).group_by(ProductRollup.item_name).having(
+                func.sum(ProductRollup.quantity) > 0
+            ).order_by(func.sum(ProductRollup.quantity).desc()).limit(5).all()
 
             # Format the response data
             response_data.update({
                 'totalRevenue': float(total_revenue),
-                'totalOrders': total_orders,
+                'totalOrders': int(total_orders),
                 'averageOrderValue': float(avg_order_value),
                 'daily': [
                     {'date': date, 'revenue': float(amount)}
                     for date, amount in daily_sales.items()
                 ],
                 'categoryWise': [
-                    {'name': category, 'value': quantity}
-                    for category, quantity in category_sales.items()
+                    {'name': category, 'value': int(quantity)}
+                    for category, quantity in category_sales
                 ],
-                'topProducts': sorted(
-                    [{'name': product, 'quantity': quantity}
-                     for product, quantity in product_sales.items()],
-                    key=lambda x: x['quantity'],
-                    reverse=True
-                )[:5]  # Get top 5 products
+                'topProducts': [
+                    {'name': product, 'quantity': int(quantity)}
+                    for product, quantity in top_products
+                ]
             })
 
         return jsonify(response_data)
@@ -1031,16 +3566,41 @@ def create_initial_admin():
         print(f"Error creating initial admin: {e}")
         db.session.rollback()
 
+def init_database():
+    """Create missing tables and seed the admin and default categories."""
+    try:
+        # Drop all tables and recreate them
+        # db.drop_all()
+        db.create_all()
+        create_initial_admin()
+        create_default_categories()
+        print("Database initialized successfully")
+    except Exception as e:
+        print(f"Error initializing database: {e}")
+        raise e
+
+@app.cli.command('init-db')
+def init_db_command():
+    """One-off setup; run before starting the production server, not in each worker."""
+    init_database()
+
+def configure_app(config=None):
+    """Apply config overrides to the module-level app and return it, for wsgi.py.
+
+    This is not an application factory: routes, extensions and listeners are
+    bound to the one app when this module is imported, so every call returns
+    the same object. It never touches the database, which keeps worker
+    start-up cheap and free of side effects.
+    """
+    if config:
+        app.config.update(config)
+    return app
+
 if __name__ == '__main__':
     with app.app_context():
-        try:
-            # Drop all tables and recreate them
-            # db.drop_all()
-            db.create_all()
-            create_initial_admin()
-            create_default_categories()
-            print("Database initialized successfully")
-        except Exception as e:
-            print(f"Error initializing database: {e}")
-            raise e
+        init_database()
+    # With the reloader on, only the child process that serves requests
+    # drains the outbox
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_notification_worker()
     app.run(debug=True)
@@ -0,0 +1,276 @@
+"""Benchmark the kiosk API hot paths and print the results as JSON.
+
+Seeds a throwaway database with a menu and order history, replaces the
+Stripe, Twilio and SendGrid clients with local fakes, then drives the app
+in-process from a pool of threads. Network time is not included, so the
+numbers track the cost of the Flask app and the database.
+
+    python benchmark.py --orders 20000 --requests 500 --output bench.json
+    python benchmark.py --database-url postgresql://localhost/kiosk_bench --reset
+
+Seeding drops every table first, so a --database-url is only used
+together with --reset.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import jwt
+
+parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+parser.add_argument('--database-url', help='database to seed; defaults to a temporary SQLite file')
+parser.add_argument('--reset', action='store_true', help='allow dropping every table of --database-url')
+parser.add_argument('--categories', type=int, default=8)
+parser.add_argument('--menu-items', type=int, default=200)
+parser.add_argument('--orders', type=int, default=5000, help='orders of history to seed')
+parser.add_argument('--requests', type=int, default=300, help='requests per scenario')
+parser.add_argument('--concurrency', type=int, default=4, help='client threads per scenario')
+parser.add_argument('--provider-latency-ms', type=float, default=0, help='delay added by the fake Stripe client')
+parser.add_argument('--seed', type=int, default=1)
+parser.add_argument('--output', help='write the JSON here instead of stdout')
+
+
+class FakePaymentIntent:
+    latency_seconds = 0
+
+    @classmethod
+    def create(cls, amount, currency):
+        time.sleep(cls.latency_seconds)
+        return {'client_secret': f'pi_bench_{random.getrandbits(64):x}_secret'}
+
+
+def load_app(args):
+    """Configure the environment, then import the app with every provider faked."""
+    # The app reads its configuration at import time
+    scratch = tempfile.mkdtemp(prefix='kiosk-bench-')
+    os.environ['DATABASE_URL'] = args.database_url or f"sqlite:///{os.path.join(scratch, 'bench.db')}"
+    os.environ['NOTIFICATION_PROVIDER'] = 'fake'
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-secret-key-not-for-production-use')
+    os.environ.setdefault('ORDER_NUMBER_KEY', 'benchmark-order-number-key')
+    # Twilio's client insists on credentials when the app module is imported
+    os.environ.setdefault('TWILIO_ACCOUNT_SID', 'ACbenchmark')
+    os.environ.setdefault('TWILIO_AUTH_TOKEN', 'benchmark')
+
+    import app as kiosk
+
+    # Notifications also go through the fake outbox provider; these catch any
+    # direct call so a benchmark can never reach a real provider
+    FakePaymentIntent.latency_seconds = args.provider_latency_ms / 1000
+    kiosk.stripe.PaymentIntent = FakePaymentIntent
+    kiosk.send_sms = lambda phone_number, message: True
+    kiosk.send_email = lambda to_email, subject, content: True
+    return kiosk
+
+
+def seed(kiosk, args):
+    from app import db, Admin, Category, MenuItem, Extra, Size, PieceOption, Order, OrderItem
+
+    db.drop_all()
+    db.create_all()
+
+    admin = Admin(username='bench', password=kiosk.generate_password_hash('bench'), email='bench@example.com')
+    categories = [Category(name=f'Category {i}') for i in range(args.categories)]
+    db.session.add_all([admin] + categories)
+    db.session.flush()
+
+    items = []
+    for i in range(args.menu_items):
+        item = MenuItem(
+            name=f'Item {i}',
+            description='Benchmark item',
+            price=round(random.uniform(20, 150), 2),
+            category=categories[i % len(categories)],
+            is_available=True
+        )
+        item.extras = [Extra(name=f'Extra {j}', price=round(random.uniform(5, 20), 2)) for j in range(3)]
+        item.sizes = [Size(name=name, price=price) for name, price in (('Regular', 0), ('Large', 15))]
+        if i % 5 == 0:
+            item.piece_options = [PieceOption(quantity=q, price=q * 12, is_default=q == 6) for q in (6, 12)]
+        items.append(item)
+    db.session.add_all(items)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    for i in range(args.orders):
+        order = Order(
+            order_number=f'B{i:07d}',
+            email='customer@example.com',
+            total_amount=0,
+            status=random.choice(('completed', 'completed', 'completed', 'paid')),
+            created_at=now - timedelta(minutes=random.randint(0, 90 * 24 * 60))
+        )
+        total = 0
+        for item in random.sample(items, random.randint(1, 4)):
+            quantity = random.randint(1, 3)
+            total += float(item.price) * quantity
+            db.session.add(OrderItem(
+                order=order, item_name=item.name, quantity=quantity, price=item.price,
+                extras=[], menu_item_id=item.id, category_id=item.category_id
+            ))
+        order.total_amount = round(total, 2)
+        db.session.add(order)
+        if i % 1000 == 999:
+            db.session.flush()
+    db.session.commit()
+    kiosk.rebuild_rollups()
+    kiosk.bump_menu_version()
+
+    token = jwt.encode({
+        'admin_id': admin.id,
+        'pwd': kiosk.password_fingerprint(admin),
+        'exp': datetime.now(timezone.utc) + timedelta(days=1)
+    }, os.environ['JWT_SECRET_KEY'], algorithm='HS256')
+    menu = [{
+        'id': item.id,
+        'name': item.name,
+        'price': float(item.price),
+        'extras': [{'id': e.id, 'name': e.name} for e in item.extras],
+        'sizes': [{'id': s.id, 'name': s.name} for s in item.sizes]
+    } for item in items]
+    return {'Authorization': f'Bearer {token}'}, [c.name for c in categories], menu
+
+
+def random_cart(menu):
+    cart = []
+    for item in random.sample(menu, random.randint(1, 4)):
+        cart.append({
+            'id': item['id'],
+            'name': item['name'],
+            'quantity': random.randint(1, 3),
+            'selectedExtras': random.sample(item['extras'], random.randint(0, 2)),
+            'selectedSize': random.choice(item['sizes'])
+        })
+    return cart
+
+
+def scenarios(headers, category_names, menu):
+    def menu_items(client):
+        return client.get('/api/menu-items', query_string={'category': random.choice(category_names)})
+
+    def complete_order(client):
+        cart = random_cart(menu)
+        quote = client.post('/api/price-order', json={'items': cart}).get_json()
+        return client.post('/api/complete-order', json={
+            'items': cart,
+            'amount': quote['total'],
+            'paymentIntent': f'pi_bench_{random.getrandbits(64):x}',
+            'email': 'customer@example.com',
+            'phone': '+27000000000'
+        })
+
+    def admin_orders(client):
+        return client.get('/api/admin/orders', headers=headers, query_string={'limit': 50})
+
+    def analytics(client):
+        timeframe = random.choice(('daily', 'weekly', 'monthly'))
+        return client.get('/api/admin/analytics', headers=headers, query_string={'timeframe': timeframe})
+
+    return {
+        'menu_items': menu_items,
+        'complete_order': complete_order,
+        'admin_orders': admin_orders,
+        'analytics': analytics
+    }
+
+
+def percentile(samples, fraction):
+    """Nearest-rank percentile of an already sorted list."""
+    return samples[max(0, min(len(samples) - 1, round(fraction * len(samples)) - 1))]
+
+
+def run(app, scenario, args):
+    def worker(count):
+        timings, errors = [], 0
+        client = app.test_client()
+        for _ in range(count):
+            start = time.perf_counter()
+            response = scenario(client)
+            timings.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+            response.close()
+        return timings, errors
+
+    # Warm caches and connections so the first request does not skew p99
+    worker(min(10, args.requests))
+
+    shares = [args.requests // args.concurrency + (i < args.requests % args.concurrency)
+              for i in range(args.concurrency)]
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        results = list(pool.map(worker, shares))
+    elapsed = time.perf_counter() - started
+
+    timings = sorted(t * 1000 for result in results for t in result[0])
+    return {
+        'requests': len(timings),
+        'errors': sum(result[1] for result in results),
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(timings) / elapsed, 1),
+        'latency_ms': {
+            'mean': round(statistics.fmean(timings), 3),
+            'p50': round(percentile(timings, 0.50), 3),
+            'p95': round(percentile(timings, 0.95), 3),
+            'p99': round(percentile(timings, 0.99), 3),
+            'max': round(timings[-1], 3)
+        }
+    }
+
+
+def git_revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    args = parser.parse_args(argv)
+    if args.database_url and not args.reset:
+        parser.error('seeding drops every table of --database-url; pass --reset to allow it')
+    random.seed(args.seed)
+
+    kiosk = load_app(args)
+    app = kiosk.app
+    app.logger.disabled = True
+    with app.app_context():
+        seed_started = time.perf_counter()
+        headers, category_names, menu = seed(kiosk, args)
+        seed_seconds = time.perf_counter() - seed_started
+        dialect = kiosk.db.engine.dialect.name
+
+    report = {
+        'meta': {
+            'timestamp': datetime.now(timezone.utc).isoformat(),
+            'revision': git_revision(),
+            'python': platform.python_version(),
+            'database': dialect,
+            'seed_seconds': round(seed_seconds, 2),
+            'config': {key: value for key, value in vars(args).items()
+                       if key not in ('database_url', 'reset', 'output')}
+        },
+        'results': {name: run(app, scenario, args)
+                    for name, scenario in scenarios(headers, category_names, menu).items()}
+    }
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    return 1 if any(result['errors'] for result in report['results'].values()) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,47 @@
+# Production server settings: gunicorn -c gunicorn.conf.py wsgi:app
+# Run `flask --app app init-db` (or `flask --app app db upgrade`) once before starting.
+import multiprocessing
+import os
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:5000')
+workers = int(os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count()))
+# Threads let a worker keep serving while admin order streams hold a connection open.
+# Every open stream holds one thread until its page closes, so at most half of a
+# worker's threads go to streams; the app answers 503 for any more
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+os.environ.setdefault('ORDER_STREAM_MAX_PER_WORKER', str(max(1, threads // 2)))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = 30
+keepalive = 5
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', '0'))  # recycle workers after this many requests
+max_requests_jitter = max_requests // 10
+# Import the app once in the master so workers fork with it already loaded
+preload_app = True
+accesslog = '-'
+# A per-process cache would give every worker its own menu snapshots and
+# build locks, so several workers share one on disk unless CACHE_TYPE says
+# otherwise; use RedisCache when running on more than one host
+if workers > 1:
+    os.environ.setdefault('CACHE_TYPE', 'FileSystemCache')
+
+
+def on_starting(server):
+    from app import CACHE_TYPE
+
+    if server.cfg.workers > 1 and CACHE_TYPE.rsplit('.', 1)[-1].lower() in ('simplecache', 'simple'):
+        raise RuntimeError(
+            f'CACHE_TYPE={CACHE_TYPE} keeps a separate cache in each of the {server.cfg.workers} workers; '
+            'use RedisCache, or FileSystemCache on a single host'
+        )
+
+
+def post_fork(server, worker):
+    from app import app, db, start_notification_worker
+
+    # Connections opened in the master must not be shared with the children
+    with app.app_context():
+        db.engine.dispose(close=False)
+    # Outbox claims use SKIP LOCKED, so every worker can drain it safely
+    if os.getenv('NOTIFICATION_WORKER', '1') == '1':
+        start_notification_worker()
@@ -0,0 +1,92 @@
+"""Link menu_item to category by foreign key and snapshot ids on order_item
+
+Revision ID: 2d8f6a3b5e41
+Revises: 9a6b2f4e8c17
+Create Date: 2026-10-17 15:31:47.208553
+
+Revision 66e81f274719 replaced menu_item.category with a string
+category_id, but databases created with db.create_all() still have the
+category name column. Both layouts are handled: each distinct name is
+matched case-insensitively to a category (created if missing) and stored
+as an integer category_id.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2d8f6a3b5e41'
+down_revision = '9a6b2f4e8c17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    columns = {column['name']: column for column in sa.inspect(conn).get_columns('menu_item')}
+    name_column = 'category' if 'category' in columns else 'category_id'
+
+    with op.batch_alter_table('menu_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('category_ref', sa.Integer(), nullable=True))
+
+    categories = {
+        name.lower(): category_id
+        for category_id, name in conn.execute(sa.text('SELECT id, name FROM category'))
+    }
+    names = [row[0] for row in conn.execute(
+        sa.text(f'SELECT DISTINCT {name_column} FROM menu_item WHERE {name_column} IS NOT NULL'))]
+    for name in names:
+        key = name.strip().lower()
+        if key not in categories:
+            conn.execute(
+                sa.text('INSERT INTO category (name, description, is_default) VALUES (:name, \'\', false)'),
+                {'name': name.strip()}
+            )
+            categories[key] = conn.execute(
+                sa.text('SELECT id FROM category WHERE name = :name'), {'name': name.strip()}
+            ).scalar()
+        conn.execute(
+            sa.text(f'UPDATE menu_item SET category_ref = :category_id WHERE {name_column} = :name'),
+            {'category_id': categories[key], 'name': name}
+        )
+
+    with op.batch_alter_table('menu_item', schema=None) as batch_op:
+        batch_op.drop_column(name_column)
+        batch_op.alter_column('category_ref', new_column_name='category_id',
+                              existing_type=sa.Integer(), nullable=False)
+
+    with op.batch_alter_table('menu_item', schema=None) as batch_op:
+        batch_op.create_foreign_key('fk_menu_item_category_id', 'category', ['category_id'], ['id'])
+        batch_op.create_index('ix_menu_item_category_available', ['category_id', 'is_available'], unique=False)
+
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('menu_item_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('category_id', sa.Integer(), nullable=True))
+
+    # Best-effort snapshot for existing order lines, matched by item name
+    conn.execute(sa.text(
+        'UPDATE order_item SET '
+        'menu_item_id = (SELECT MIN(menu_item.id) FROM menu_item WHERE menu_item.name = order_item.item_name), '
+        'category_id = (SELECT MIN(menu_item.category_id) FROM menu_item WHERE menu_item.name = order_item.item_name)'
+    ))
+
+
+def downgrade():
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.drop_column('category_id')
+        batch_op.drop_column('menu_item_id')
+
+    with op.batch_alter_table('menu_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('category', sa.String(length=50), nullable=True))
+
+    op.execute(
+        'UPDATE menu_item SET category = '
+        '(SELECT category.name FROM category WHERE category.id = menu_item.category_id)'
+    )
+
+    with op.batch_alter_table('menu_item', schema=None) as batch_op:
+        batch_op.drop_index('ix_menu_item_category_available')
+        batch_op.drop_constraint('fk_menu_item_category_id', type_='foreignkey')
+        batch_op.drop_column('category_id')
+        batch_op.alter_column('category', existing_type=sa.String(length=50), nullable=False)
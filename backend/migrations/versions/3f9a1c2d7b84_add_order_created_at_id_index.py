@@ -0,0 +1,26 @@
+"""Add (created_at, id) index to order for keyset pagination
+
+Revision ID: 3f9a1c2d7b84
+Revises: 66e81f274719
+Create Date: 2026-10-17 09:12:41.208115
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f9a1c2d7b84'
+down_revision = '66e81f274719'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.create_index('ix_order_created_at_id', ['created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_created_at_id')
@@ -0,0 +1,30 @@
+"""Add order_number_sequence for block-allocated order numbers
+
+Revision ID: 5c0f8e21a6d3
+Revises: e4a7d13c9b52
+Create Date: 2026-10-17 13:18:33.049621
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c0f8e21a6d3'
+down_revision = 'e4a7d13c9b52'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    sequence = op.create_table('order_number_sequence',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('next_value', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # 32 ** 7 encodes to '10000000', the first 8-character order number
+    op.bulk_insert(sequence, [{'id': 1, 'next_value': 32 ** 7}])
+
+
+def downgrade():
+    op.drop_table('order_number_sequence')
@@ -0,0 +1,120 @@
+"""Backfill the analytics rollups from existing orders
+
+Revision ID: 6b1d9e4f2a70
+Revises: d2f7a9c4e318
+Create Date: 2026-10-18 09:12:44.530218
+
+Recomputes sales_rollup and product_rollup from completed orders so the
+dashboard is complete straight after an upgrade. Rollups are now kept per
+day only, so the hourly rows written before are dropped along the way.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b1d9e4f2a70'
+down_revision = 'd2f7a9c4e318'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+
+order_table = sa.table(
+    'order',
+    sa.column('id', sa.Integer),
+    sa.column('created_at', sa.DateTime),
+    sa.column('total_amount', sa.Numeric(10, 2)),
+    sa.column('status', sa.String)
+)
+order_item_table = sa.table(
+    'order_item',
+    sa.column('order_id', sa.Integer),
+    sa.column('item_name', sa.String),
+    sa.column('quantity', sa.Integer),
+    sa.column('price', sa.Numeric(10, 2)),
+    sa.column('category_id', sa.Integer)
+)
+category_table = sa.table('category', sa.column('id', sa.Integer), sa.column('name', sa.String))
+sales_rollup_table = sa.table(
+    'sales_rollup',
+    sa.column('period', sa.String),
+    sa.column('bucket_start', sa.DateTime),
+    sa.column('revenue', sa.Numeric(12, 2)),
+    sa.column('order_count', sa.Integer)
+)
+product_rollup_table = sa.table(
+    'product_rollup',
+    sa.column('day', sa.Date),
+    sa.column('item_name', sa.String),
+    sa.column('category', sa.String),
+    sa.column('quantity', sa.Integer),
+    sa.column('revenue', sa.Numeric(12, 2))
+)
+
+
+def guess_category(item_name):
+    # As app.guess_category when this revision was written
+    name = item_name.lower()
+    if 'burger' in name:
+        return 'Burgers'
+    elif 'pizza' in name:
+        return 'Pizza'
+    elif 'drink' in name or 'soda' in name:
+        return 'Drinks'
+    elif 'side' in name:
+        return 'Sides'
+    elif 'breakfast' in name:
+        return 'Breakfast'
+    return 'Uncategorized'
+
+
+def insert_batches(conn, table, rows):
+    for start in range(0, len(rows), BATCH_SIZE):
+        conn.execute(table.insert(), rows[start:start + BATCH_SIZE])
+
+
+def upgrade():
+    conn = op.get_bind()
+    conn.execute(sales_rollup_table.delete())
+    conn.execute(product_rollup_table.delete())
+
+    completed = order_table.c.status == 'completed'
+    sales = {}  # day -> [revenue, order count]
+    for created_at, total_amount in conn.execute(
+        sa.select(order_table.c.created_at, order_table.c.total_amount).where(completed)
+    ):
+        totals = sales.setdefault(created_at.replace(hour=0, minute=0, second=0, microsecond=0), [0, 0])
+        totals[0] += total_amount
+        totals[1] += 1
+
+    categories = dict(conn.execute(sa.select(category_table.c.id, category_table.c.name)).all())
+    products = {}  # (day, item name) -> [category, quantity, revenue]
+    for created_at, item_name, quantity, price, category_id in conn.execute(
+        sa.select(
+            order_table.c.created_at, order_item_table.c.item_name, order_item_table.c.quantity,
+            order_item_table.c.price, order_item_table.c.category_id
+        ).select_from(order_item_table.join(order_table, order_item_table.c.order_id == order_table.c.id))
+        .where(completed)
+    ):
+        totals = products.setdefault(
+            (created_at.date(), item_name),
+            [categories.get(category_id) or guess_category(item_name), 0, 0]
+        )
+        totals[1] += quantity
+        totals[2] += price * quantity
+
+    insert_batches(conn, sales_rollup_table, [
+        {'period': 'day', 'bucket_start': day, 'revenue': revenue, 'order_count': order_count}
+        for day, (revenue, order_count) in sales.items()
+    ])
+    insert_batches(conn, product_rollup_table, [
+        {'day': day, 'item_name': item_name, 'category': category, 'quantity': quantity, 'revenue': revenue}
+        for (day, item_name), (category, quantity, revenue) in products.items()
+    ])
+
+
+def downgrade():
+    # The backfilled rows are what the app maintains anyway; nothing to undo
+    pass
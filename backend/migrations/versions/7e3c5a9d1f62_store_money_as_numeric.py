@@ -0,0 +1,46 @@
+"""Store prices, order totals and rollup revenue as fixed-point numerics
+
+Revision ID: 7e3c5a9d1f62
+Revises: 2d8f6a3b5e41
+Create Date: 2026-10-17 16:12:05.418377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7e3c5a9d1f62'
+down_revision = '2d8f6a3b5e41'
+branch_labels = None
+depends_on = None
+
+MONEY_COLUMNS = (
+    ('order', 'total_amount', sa.Numeric(precision=10, scale=2)),
+    ('order_item', 'price', sa.Numeric(precision=10, scale=2)),
+    ('menu_item', 'price', sa.Numeric(precision=10, scale=2)),
+    ('extra', 'price', sa.Numeric(precision=10, scale=2)),
+    ('size', 'price', sa.Numeric(precision=10, scale=2)),
+    ('piece_option', 'price', sa.Numeric(precision=10, scale=2)),
+    ('sales_rollup', 'revenue', sa.Numeric(precision=12, scale=2)),
+    ('product_rollup', 'revenue', sa.Numeric(precision=12, scale=2)),
+)
+
+
+def upgrade():
+    for table, column, numeric in MONEY_COLUMNS:
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column,
+                   existing_type=sa.Float(),
+                   type_=numeric,
+                   existing_nullable=False,
+                   postgresql_using=f'round({column}::numeric, 2)')
+
+
+def downgrade():
+    for table, column, numeric in reversed(MONEY_COLUMNS):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.alter_column(column,
+                   existing_type=numeric,
+                   type_=sa.Float(),
+                   existing_nullable=False)
@@ -0,0 +1,161 @@
+"""Store order item extras, size and piece option as JSON
+
+Revision ID: 9a6b2f4e8c17
+Revises: 5c0f8e21a6d3
+Create Date: 2026-10-17 14:05:12.661830
+
+Existing rows hold Python reprs written with str(); they are parsed with
+ast.literal_eval and rewritten as JSON in batches.
+
+"""
+import ast
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = '9a6b2f4e8c17'
+down_revision = '5c0f8e21a6d3'
+branch_labels = None
+depends_on = None
+
+BATCH_SIZE = 1000
+JSONType = sa.JSON().with_variant(postgresql.JSONB(), 'postgresql')
+
+
+def parse_repr(value):
+    if value is None:
+        return None
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return None
+
+
+def convert_extras(value):
+    extras = parse_repr(value)
+    if not isinstance(extras, list):
+        return []
+    return [{
+        'id': extra.get('id'),
+        'name': extra.get('name'),
+        'price': float(extra.get('price') or 0)
+    } for extra in extras if isinstance(extra, dict)]
+
+
+def convert_size(value):
+    size = parse_repr(value)
+    if not isinstance(size, dict) or not size.get('name'):
+        return None
+    return {'id': size.get('id'), 'name': size['name'], 'price': float(size.get('price') or 0)}
+
+
+def convert_piece_option(value, piece_options):
+    option = parse_repr(value)
+    option_id = option.get('id') if isinstance(option, dict) else option
+    if option_id is None or not str(option_id).isdigit():
+        return None
+    quantity, price = piece_options.get(int(option_id), (None, None))
+    return {'id': int(option_id), 'quantity': quantity, 'price': price}
+
+
+def upgrade():
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('extras_json', JSONType, nullable=True))
+        batch_op.add_column(sa.Column('size_json', JSONType, nullable=True))
+        batch_op.add_column(sa.Column('piece_option_json', JSONType, nullable=True))
+
+    conn = op.get_bind()
+    order_item = sa.table(
+        'order_item',
+        sa.column('id', sa.Integer),
+        sa.column('extras', sa.Text),
+        sa.column('size', sa.Text),
+        sa.column('piece_option', sa.Text),
+        sa.column('extras_json', JSONType),
+        sa.column('size_json', JSONType),
+        sa.column('piece_option_json', JSONType),
+    )
+    piece_options = {
+        row.id: (row.quantity, float(row.price))
+        for row in conn.execute(sa.text('SELECT id, quantity, price FROM piece_option'))
+    }
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(order_item.c.id, order_item.c.extras, order_item.c.size, order_item.c.piece_option)
+            .where(order_item.c.id > last_id)
+            .order_by(order_item.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            conn.execute(
+                order_item.update().where(order_item.c.id == row.id).values(
+                    extras_json=convert_extras(row.extras),
+                    size_json=convert_size(row.size),
+                    piece_option_json=convert_piece_option(row.piece_option, piece_options)
+                )
+            )
+        last_id = rows[-1].id
+
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.drop_column('extras')
+        batch_op.drop_column('size')
+        batch_op.drop_column('piece_option')
+        batch_op.alter_column('extras_json', new_column_name='extras')
+        batch_op.alter_column('size_json', new_column_name='size')
+        batch_op.alter_column('piece_option_json', new_column_name='piece_option')
+
+
+def downgrade():
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.alter_column('extras', new_column_name='extras_json')
+        batch_op.alter_column('size', new_column_name='size_json')
+        batch_op.alter_column('piece_option', new_column_name='piece_option_json')
+        batch_op.add_column(sa.Column('extras', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('size', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('piece_option', sa.Text(), nullable=True))
+
+    conn = op.get_bind()
+    order_item = sa.table(
+        'order_item',
+        sa.column('id', sa.Integer),
+        sa.column('extras', sa.Text),
+        sa.column('size', sa.Text),
+        sa.column('piece_option', sa.Text),
+        sa.column('extras_json', JSONType),
+        sa.column('size_json', JSONType),
+        sa.column('piece_option_json', JSONType),
+    )
+
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.select(order_item.c.id, order_item.c.extras_json, order_item.c.size_json,
+                      order_item.c.piece_option_json)
+            .where(order_item.c.id > last_id)
+            .order_by(order_item.c.id)
+            .limit(BATCH_SIZE)
+        ).fetchall()
+        if not rows:
+            break
+        for row in rows:
+            piece_option = row.piece_option_json
+            conn.execute(
+                order_item.update().where(order_item.c.id == row.id).values(
+                    extras=str(row.extras_json or []),
+                    size=str(row.size_json or {}),
+                    piece_option=str(str(piece_option['id']) if piece_option else None)
+                )
+            )
+        last_id = rows[-1].id
+
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.drop_column('extras_json')
+        batch_op.drop_column('size_json')
+        batch_op.drop_column('piece_option_json')
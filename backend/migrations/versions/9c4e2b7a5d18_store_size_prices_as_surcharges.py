@@ -0,0 +1,102 @@
+"""Store size prices as surcharges on every item
+
+Revision ID: 9c4e2b7a5d18
+Revises: 6b1d9e4f2a70
+Create Date: 2026-10-18 10:05:31.774092
+
+A size price is what the size adds to the item's price, which is how the
+Burgers and Breakfast pages always showed it. Every other page (Sides,
+Drinks and the pages of categories added by admins) showed it as the
+price of the item in that size, so sizes outside those two categories are
+converted: each becomes its difference from the item's price. Where a size
+cost less than the item, the item's price drops to the cheapest size
+first, so no surcharge is negative and every size still costs what it did.
+
+The menu version is reset so kiosks reload the whole menu.
+
+"""
+from datetime import datetime
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c4e2b7a5d18'
+down_revision = '6b1d9e4f2a70'
+branch_labels = None
+depends_on = None
+
+SURCHARGE_CATEGORIES = ('burgers', 'breakfast')  # priced sizes as surcharges already
+
+category_table = sa.table('category', sa.column('id', sa.Integer), sa.column('name', sa.String))
+menu_item_table = sa.table(
+    'menu_item',
+    sa.column('id', sa.Integer),
+    sa.column('price', sa.Numeric(10, 2)),
+    sa.column('category_id', sa.Integer)
+)
+size_table = sa.table(
+    'size',
+    sa.column('id', sa.Integer),
+    sa.column('menu_item_id', sa.Integer),
+    sa.column('price', sa.Numeric(10, 2))
+)
+menu_change_table = sa.table(
+    'menu_change',
+    sa.column('entity', sa.String),
+    sa.column('entity_id', sa.Integer),
+    sa.column('operation', sa.String),
+    sa.column('created_at', sa.DateTime)
+)
+shared_version_table = sa.table('shared_version', sa.column('name', sa.String))
+
+
+def converted_items(conn):
+    """Return {item id: (item price, {size id: size price})} for items whose sizes change."""
+    rows = conn.execute(
+        sa.select(menu_item_table.c.id, menu_item_table.c.price, size_table.c.id, size_table.c.price)
+        .select_from(
+            size_table
+            .join(menu_item_table, size_table.c.menu_item_id == menu_item_table.c.id)
+            .join(category_table, menu_item_table.c.category_id == category_table.c.id)
+        )
+        .where(sa.func.lower(category_table.c.name).notin_(SURCHARGE_CATEGORIES))
+    )
+    items = {}
+    for item_id, item_price, size_id, size_price in rows:
+        items.setdefault(item_id, (item_price, {}))[1][size_id] = size_price
+    return items
+
+
+def record_changes(conn, item_ids):
+    if item_ids:
+        now = datetime.utcnow()
+        conn.execute(menu_change_table.insert(), [
+            {'entity': 'menu_item', 'entity_id': item_id, 'operation': 'update', 'created_at': now}
+            for item_id in sorted(item_ids)
+        ])
+    # Cached snapshots carry the old prices; a new menu version retires them
+    conn.execute(shared_version_table.delete().where(shared_version_table.c.name.like('menu%')))
+
+
+def upgrade():
+    conn = op.get_bind()
+    items = converted_items(conn)
+    for item_id, (item_price, sizes) in items.items():
+        base = min([item_price, *sizes.values()])
+        if base != item_price:
+            conn.execute(menu_item_table.update().where(menu_item_table.c.id == item_id).values(price=base))
+        for size_id, size_price in sizes.items():
+            conn.execute(size_table.update().where(size_table.c.id == size_id).values(price=size_price - base))
+    record_changes(conn, items)
+
+
+def downgrade():
+    # Sizes go back to full prices; an item price lowered on upgrade stays lowered
+    conn = op.get_bind()
+    items = converted_items(conn)
+    for item_id, (item_price, sizes) in items.items():
+        for size_id, size_price in sizes.items():
+            conn.execute(size_table.update().where(size_table.c.id == size_id).values(price=size_price + item_price))
+    record_changes(conn, items)
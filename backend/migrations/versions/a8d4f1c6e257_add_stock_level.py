@@ -0,0 +1,31 @@
+"""Add stock_level for sold-out flags and remaining counts
+
+Revision ID: a8d4f1c6e257
+Revises: f5b8c2e7a913
+Create Date: 2026-10-17 22:24:51.308114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a8d4f1c6e257'
+down_revision = 'f5b8c2e7a913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('stock_level',
+    sa.Column('entity', sa.String(length=20), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('is_available', sa.Boolean(), nullable=False),
+    sa.Column('remaining', sa.Integer(), nullable=True),
+    sa.Column('updated_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('entity', 'entity_id')
+    )
+
+
+def downgrade():
+    op.drop_table('stock_level')
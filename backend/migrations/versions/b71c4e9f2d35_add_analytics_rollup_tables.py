@@ -0,0 +1,41 @@
+"""Add analytics rollup tables
+
+Revision ID: b71c4e9f2d35
+Revises: 8d2e5b7c1a90
+Create Date: 2026-10-17 11:22:05.917364
+
+Revision 6b1d9e4f2a70 backfills the rollups from existing orders.
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b71c4e9f2d35'
+down_revision = '8d2e5b7c1a90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sales_rollup',
+    sa.Column('period', sa.String(length=5), nullable=False),
+    sa.Column('bucket_start', sa.DateTime(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.PrimaryKeyConstraint('period', 'bucket_start')
+    )
+    op.create_table('product_rollup',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('item_name', sa.String(length=100), nullable=False),
+    sa.Column('category', sa.String(length=50), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.PrimaryKeyConstraint('day', 'item_name')
+    )
+
+
+def downgrade():
+    op.drop_table('product_rollup')
+    op.drop_table('sales_rollup')
@@ -0,0 +1,28 @@
+"""Add a unique idempotency_key to order so checkout retries are replayed
+
+Revision ID: c3e9d5a1b7f4
+Revises: 7e3c5a9d1f62
+Create Date: 2026-10-17 17:04:22.731906
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3e9d5a1b7f4'
+down_revision = '7e3c5a9d1f62'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('idempotency_key', sa.String(length=255), nullable=True))
+        batch_op.create_unique_constraint('uq_order_idempotency_key', ['idempotency_key'])
+
+
+def downgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_order_idempotency_key', type_='unique')
+        batch_op.drop_column('idempotency_key')
@@ -0,0 +1,28 @@
+"""Add shared_version for menu versions and invalidation markers
+
+Revision ID: d2f7a9c4e318
+Revises: a8d4f1c6e257
+Create Date: 2026-10-17 23:40:12.418203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd2f7a9c4e318'
+down_revision = 'a8d4f1c6e257'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('shared_version',
+    sa.Column('name', sa.String(length=64), nullable=False),
+    sa.Column('version', sa.BigInteger(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('shared_version')
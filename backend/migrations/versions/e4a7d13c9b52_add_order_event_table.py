@@ -0,0 +1,31 @@
+"""Add order_event table for the live order stream
+
+Revision ID: e4a7d13c9b52
+Revises: b71c4e9f2d35
+Create Date: 2026-10-17 12:40:51.774102
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4a7d13c9b52'
+down_revision = 'b71c4e9f2d35'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('order_event',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_number', sa.String(length=10), nullable=False),
+    sa.Column('event_type', sa.String(length=30), nullable=False),
+    sa.Column('payload', sa.Text(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('order_event')
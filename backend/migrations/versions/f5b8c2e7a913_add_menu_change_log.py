@@ -0,0 +1,31 @@
+"""Add menu_change log for menu delta sync
+
+Revision ID: f5b8c2e7a913
+Revises: c3e9d5a1b7f4
+Create Date: 2026-10-17 19:22:08.615730
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f5b8c2e7a913'
+down_revision = 'c3e9d5a1b7f4'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('menu_change',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('entity', sa.String(length=20), nullable=False),
+    sa.Column('entity_id', sa.Integer(), nullable=False),
+    sa.Column('operation', sa.String(length=10), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+
+
+def downgrade():
+    op.drop_table('menu_change')
@@ -0,0 +1,125 @@
+"""Shared fixtures: a fresh SQLite database and cold per-process caches per test."""
+import os
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+# The app reads its configuration at import time
+scratch = tempfile.mkdtemp(prefix='kiosk-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(scratch, 'test.db')}"
+os.environ['JWT_SECRET_KEY'] = 'test-secret-key-not-for-production-use'
+os.environ['ORDER_NUMBER_KEY'] = 'test-order-number-key'
+os.environ['NOTIFICATION_PROVIDER'] = 'fake'
+os.environ['CACHE_TYPE'] = 'SimpleCache'
+os.environ['IMAGE_CACHE_DIR'] = os.path.join(scratch, 'images')
+# Twilio's client insists on credentials when the app module is imported
+os.environ.setdefault('TWILIO_ACCOUNT_SID', 'ACtest')
+os.environ.setdefault('TWILIO_AUTH_TOKEN', 'test')
+# Reload the stock index only when a test invalidates it, so counts are exact
+os.environ['STOCK_INDEX_TTL_SECONDS'] = '3600'
+# Likewise poll for other workers' invalidations only when a test asks to
+os.environ['INVALIDATION_POLL_SECONDS'] = '3600'
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import jwt  # noqa: E402
+import app as kiosk  # noqa: E402
+from app import app as flask_app, db, Admin, Category, MenuItem, Extra, Size  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+
+
+def reset_process_state():
+    kiosk.cache.clear()
+    kiosk.token_cache.clear()
+    kiosk.token_cache_stats.update(hits=0, misses=0, evictions=0, revocations=0)
+    kiosk.checkout_keys.clear()
+    kiosk.histograms.clear()
+    for state in kiosk.provider_breakers.values():
+        state.update(failures=0, opened_at=None, trial=False)
+    kiosk.counters.clear()
+    kiosk.snapshot_memo.clear()
+    kiosk.price_table.update(version=None, by_id={}, by_name={})
+    kiosk.image_sources.update(version=None, by_id={})
+    kiosk.category_index.update(version=None, by_name={})
+    kiosk.invalidate_stock_index()
+    kiosk.order_number_block.update(next=0, end=0)
+    kiosk.invalidation_state.update(checked_at=time.monotonic(), generations={})
+
+
+@pytest.fixture
+def app():
+    flask_app.config.update(TESTING=True, ENFORCE_QUERY_BUDGET=True)
+    with flask_app.app_context():
+        db.drop_all()
+        db.create_all()
+        reset_process_state()
+        yield flask_app
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def admin(app):
+    admin = Admin(username='admin', password=kiosk.generate_password_hash('secret'), email='admin@example.com')
+    db.session.add(admin)
+    db.session.commit()
+    return admin
+
+
+@pytest.fixture
+def auth(admin):
+    token = jwt.encode({
+        'admin_id': admin.id,
+        'pwd': kiosk.password_fingerprint(admin),
+        'exp': datetime.now(timezone.utc) + timedelta(hours=1)
+    }, os.environ['JWT_SECRET_KEY'], algorithm='HS256')
+    return {'Authorization': f'Bearer {token}'}
+
+
+@pytest.fixture
+def menu(app):
+    """Two categories; a burger with extras and sizes, a side and a drink."""
+    burgers = Category(name='Burgers')
+    sides = Category(name='Sides')
+    db.session.add_all([burgers, sides])
+    db.session.flush()
+    burger = MenuItem(name='Cheese Burger', description='', price=50, category=burgers, is_available=True,
+                      extras=[Extra(name='Bacon', price=12), Extra(name='Egg', price=8)],
+                      sizes=[Size(name='Regular', price=0), Size(name='Large', price=15)])
+    chips = MenuItem(name='Chips', description='', price=20, category=sides, is_available=True,
+                     sizes=[Size(name='Regular', price=0), Size(name='Large', price=15)])
+    soda = MenuItem(name='Soda', description='', price=15, category=sides, is_available=True)
+    db.session.add_all([burger, chips, soda])
+    db.session.commit()
+    kiosk.bump_menu_version()
+    return {'burgers': burgers, 'sides': sides, 'burger': burger, 'chips': chips, 'soda': soda}
+
+
+@pytest.fixture
+def count_statements(app):
+    """Count the SQL statements issued inside a `with count_statements() as n:` block."""
+    @contextmanager
+    def counter():
+        counted = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            counted.append(statement)
+
+        # Requests share the test's app context, and so its session; start
+        # from an empty one, as a request in production would
+        db.session.close()
+        engine = db.engine
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            yield counted
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+    return counter
@@ -0,0 +1,92 @@
+"""The admin order list: keyset pages, filters and field projection."""
+import base64
+import json
+from datetime import datetime
+
+import pytest
+
+from app import db, Order, OrderItem
+
+
+@pytest.fixture
+def history(app):
+    """Six orders over three days; two share a timestamp to exercise the id tie-break."""
+    rows = [
+        ('A0000001', datetime(2026, 3, 1, 9), 'completed'),
+        ('A0000002', datetime(2026, 3, 1, 12), 'cancelled'),
+        ('A0000003', datetime(2026, 3, 2, 10), 'completed'),
+        ('A0000004', datetime(2026, 3, 2, 10), 'completed'),
+        ('A0000005', datetime(2026, 3, 2, 23, 59), 'pending'),
+        ('A0000006', datetime(2026, 3, 3, 8), 'completed'),
+    ]
+    for number, created_at, status in rows:
+        order = Order(order_number=number, total_amount=20, status=status, created_at=created_at)
+        order.items.append(OrderItem(item_name='Chips', quantity=1, price=20))
+        db.session.add(order)
+    db.session.commit()
+
+
+def order_numbers(response):
+    assert response.status_code == 200, response.get_json()
+    return [order['order_number'] for order in response.get_json()]
+
+
+def test_cursor_walks_every_order_once_newest_first(client, auth, history):
+    seen, cursor = [], None
+    while True:
+        params = {'limit': 4}
+        if cursor:
+            params['cursor'] = cursor
+        response = client.get('/api/admin/orders', headers=auth, query_string=params)
+        seen += order_numbers(response)
+        cursor = response.headers.get('X-Next-Cursor')
+        if cursor is None:
+            break
+    assert seen == ['A0000006', 'A0000005', 'A0000004', 'A0000003', 'A0000002', 'A0000001']
+
+
+def test_page_breaks_between_orders_with_the_same_timestamp(client, auth, history):
+    first = client.get('/api/admin/orders', headers=auth, query_string={'limit': 3})
+    assert order_numbers(first) == ['A0000006', 'A0000005', 'A0000004']
+    second = client.get('/api/admin/orders', headers=auth,
+                        query_string={'limit': 3, 'cursor': first.headers['X-Next-Cursor']})
+    assert order_numbers(second) == ['A0000003', 'A0000002', 'A0000001']
+    assert 'X-Next-Cursor' not in second.headers
+
+
+@pytest.mark.parametrize('cursor', [
+    'not-a-cursor',
+    base64.urlsafe_b64encode(b'[1]').decode(),
+    base64.urlsafe_b64encode(json.dumps(['yesterday', 1]).encode()).decode(),
+])
+def test_bad_cursor_is_rejected(client, auth, history, cursor):
+    response = client.get('/api/admin/orders', headers=auth, query_string={'cursor': cursor})
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('params, expected', [
+    ({'status': 'cancelled,pending'}, ['A0000005', 'A0000002']),
+    ({'start_date': '2026-03-02'}, ['A0000006', 'A0000005', 'A0000004', 'A0000003']),
+    # A bare end date covers the whole day
+    ({'end_date': '2026-03-02'}, ['A0000005', 'A0000004', 'A0000003', 'A0000002', 'A0000001']),
+    ({'start_date': '2026-03-02', 'end_date': '2026-03-02', 'status': 'completed'}, ['A0000004', 'A0000003']),
+    ({'end_date': '2026-03-01T10:00:00'}, ['A0000001']),
+])
+def test_filters(client, auth, history, params, expected):
+    assert order_numbers(client.get('/api/admin/orders', headers=auth, query_string=params)) == expected
+
+
+def test_bad_date_is_rejected(client, auth, history):
+    assert client.get('/api/admin/orders?start_date=March', headers=auth).status_code == 400
+
+
+def test_fields_projection(client, auth, history):
+    response = client.get('/api/admin/orders', headers=auth, query_string={'fields': 'order_number,status', 'limit': 1})
+    assert response.get_json() == [{'order_number': 'A0000006', 'status': 'completed'}]
+
+    response = client.get('/api/admin/orders', headers=auth, query_string={'fields': 'order_number,items', 'limit': 1})
+    assert response.get_json()[0]['items'][0]['item_name'] == 'Chips'
+
+    response = client.get('/api/admin/orders', headers=auth, query_string={'fields': 'order_number,secret'})
+    assert response.status_code == 400
+    assert response.get_json()['error'] == 'Unknown fields: secret'
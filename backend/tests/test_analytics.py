@@ -0,0 +1,35 @@
+"""Admin analytics read from the sales and product rollups."""
+from datetime import datetime, timedelta
+
+import app as kiosk
+from app import db, Order, OrderItem, SalesRollup
+
+
+def completed_order(number, created_at, quantity):
+    order = Order(order_number=number, total_amount=15 * quantity, status='completed', created_at=created_at)
+    order.items.append(OrderItem(item_name='Soda', quantity=quantity, price=15))
+    db.session.add(order)
+    db.session.flush()
+    kiosk.record_order_rollups(order)
+    db.session.commit()
+
+
+def test_totals_and_lists_share_one_start(client, auth, app):
+    start = (datetime.utcnow() - timedelta(days=7)).replace(hour=0, minute=0, second=0, microsecond=0)
+    # The first hour of the window is in; the last hour before it is out
+    completed_order('IN000001', start + timedelta(minutes=5), 2)
+    completed_order('OUT00001', start - timedelta(minutes=5), 3)
+
+    data = client.get('/api/admin/analytics', headers=auth).get_json()
+    assert data['totalOrders'] == 1
+    assert data['totalRevenue'] == 30
+    assert data['daily'] == [{'date': start.strftime('%Y-%m-%d'), 'revenue': 30}]
+    assert data['topProducts'] == [{'name': 'Soda', 'quantity': 2}]
+    assert sum(row['revenue'] for row in data['daily']) == data['totalRevenue']
+
+
+def test_rollups_are_kept_per_day(app):
+    completed_order('DAY00001', datetime(2026, 3, 1, 10, 15), 1)
+    completed_order('DAY00002', datetime(2026, 3, 1, 18, 40), 2)
+    rows = [(row.period, row.bucket_start, row.order_count, row.revenue) for row in SalesRollup.query]
+    assert rows == [('day', datetime(2026, 3, 1), 2, 45)]
@@ -0,0 +1,71 @@
+"""Idempotent checkout: a resubmitted order replays the first one."""
+import app as kiosk
+from app import db, NotificationOutbox, Order, OrderItem
+
+
+def order_data(menu, payment_intent, amount=50, **extra):
+    return dict({
+        'items': [{'id': menu['burger'].id, 'name': 'Cheese Burger', 'quantity': 1}],
+        'amount': amount,
+        'paymentIntent': payment_intent,
+        'phone': '+27820000000'
+    }, **extra)
+
+
+def test_resubmitted_payment_intent_replays_the_order(client, menu):
+    first = client.post('/api/complete-order', json=order_data(menu, 'pi_1'))
+    assert first.status_code == 200 and 'Idempotent-Replayed' not in first.headers
+
+    again = client.post('/api/complete-order', json=order_data(menu, 'pi_1'))
+    assert again.status_code == 200
+    assert again.headers['Idempotent-Replayed'] == 'true'
+    assert again.get_json()['order_number'] == first.get_json()['order_number']
+    assert Order.query.count() == 1
+    assert NotificationOutbox.query.count() == 1
+
+
+def test_replay_survives_a_cold_process(client, menu):
+    order_number = client.post('/api/complete-order', json=order_data(menu, 'pi_1')).get_json()['order_number']
+    # Another worker, or this one after a restart, only has the database
+    kiosk.checkout_keys.clear()
+
+    again = client.post('/api/complete-order', json=order_data(menu, 'pi_1'))
+    assert again.headers['Idempotent-Replayed'] == 'true'
+    assert again.get_json()['order_number'] == order_number
+
+
+def test_idempotency_key_header_takes_precedence(client, menu):
+    headers = {'Idempotency-Key': 'basket-7'}
+    first = client.post('/api/complete-order', headers=headers, json=order_data(menu, 'pi_1'))
+    again = client.post('/api/complete-order', headers=headers, json=order_data(menu, 'pi_2'))
+    assert again.headers['Idempotent-Replayed'] == 'true'
+    assert again.get_json()['order_number'] == first.get_json()['order_number']
+
+    other = client.post('/api/complete-order', json=order_data(menu, 'pi_1'))
+    assert 'Idempotent-Replayed' not in other.headers
+    assert Order.query.count() == 2
+
+
+def test_order_is_stored_at_server_prices(client, menu):
+    response = client.post('/api/complete-order', json=order_data(menu, 'pi_1', amount=1))
+    assert response.status_code == 200
+    order = Order.query.one()
+    assert order.total_amount == 50
+    assert [(item.item_name, item.price) for item in OrderItem.query] == [('Cheese Burger', 50)]
+
+
+def test_mismatched_total_is_refused_when_enforced(client, menu, monkeypatch):
+    monkeypatch.setattr(kiosk, 'PRICING_ENFORCE_TOTALS', True)
+    response = client.post('/api/complete-order', json=order_data(menu, 'pi_1', amount=1))
+    assert response.status_code == 400
+    assert response.get_json()['expected_amount'] == 50
+    # The key was never claimed, so the corrected order goes through
+    assert client.post('/api/complete-order', json=order_data(menu, 'pi_1')).status_code == 200
+
+
+def test_incomplete_orders_are_refused(client, menu):
+    for missing in ('items', 'amount', 'paymentIntent'):
+        data = order_data(menu, 'pi_1')
+        del data[missing]
+        assert client.post('/api/complete-order', json=data).status_code == 400
+    assert db.session.query(Order).count() == 0
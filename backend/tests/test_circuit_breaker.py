@@ -0,0 +1,151 @@
+"""Outbound calls: bounded timeouts and a circuit breaker per provider."""
+import pytest
+import requests
+import stripe
+from twilio.base.exceptions import TwilioRestException
+
+import app as kiosk
+from app import ProviderUnavailable
+
+
+@pytest.fixture
+def breaker(app, monkeypatch):
+    monkeypatch.setattr(kiosk, 'BREAKER_FAILURE_THRESHOLD', 3)
+    return kiosk.provider_breakers['twilio']
+
+
+def call(error=None, provider='twilio'):
+    """Run one guarded call; returns whether its body ran."""
+    ran = []
+    try:
+        with kiosk.provider_call(provider, 'test'):
+            ran.append(True)
+            if error:
+                raise error
+    except ProviderUnavailable:
+        assert not ran
+    except Exception as e:
+        assert e is error
+    return bool(ran)
+
+
+def http_error(status):
+    response = requests.Response()
+    response.status_code = status
+    return requests.HTTPError(response=response)
+
+
+def rejected(provider='twilio'):
+    return kiosk.counters.get('outbound_rejected_total', {}).get((('provider', provider),), 0)
+
+
+def test_circuit_opens_after_consecutive_outages(breaker):
+    for _ in range(2):
+        assert call(requests.ConnectionError())
+    assert breaker['opened_at'] is None
+
+    assert call(requests.Timeout())
+    assert breaker['opened_at'] is not None
+    # Open: refused without calling the provider, and counted
+    assert not call()
+    assert not call()
+    assert rejected() == 2
+    assert 'outbound_circuit_open{provider="twilio"} 1' in kiosk.render_metrics()
+    # Other providers are unaffected
+    assert call(provider='stripe')
+
+
+def test_success_resets_the_failure_count(breaker):
+    for _ in range(2):
+        call(http_error(503))
+    call()
+    for _ in range(2):
+        call(http_error(502))
+    assert breaker['opened_at'] is None
+
+
+@pytest.mark.parametrize('error', [
+    http_error(400),
+    http_error(429),
+    TwilioRestException(400, '/Messages.json', 'Invalid phone number'),
+    stripe.error.CardError('Card declined', None, 'card_declined', http_status=402),
+    ValueError('bug on our side'),
+])
+def test_client_errors_do_not_count(breaker, error):
+    for _ in range(5):
+        assert call(error)
+    assert breaker['opened_at'] is None and breaker['failures'] == 0
+
+
+@pytest.mark.parametrize('error', [
+    http_error(500),
+    TwilioRestException(503, '/Messages.json'),
+    stripe.error.APIConnectionError('connection reset'),
+    stripe.error.APIError('server error', http_status=502),
+])
+def test_outages_count(error):
+    assert kiosk.is_provider_outage(error)
+
+
+def test_half_open_lets_one_trial_through_and_closes_on_success(breaker, monkeypatch):
+    for _ in range(3):
+        call(requests.ConnectionError())
+    monkeypatch.setattr(kiosk, 'BREAKER_RESET_SECONDS', 0)
+
+    assert kiosk.breaker_allows('twilio')
+    # While the trial is in flight every other call is refused
+    assert not kiosk.breaker_allows('twilio')
+    kiosk.breaker_record('twilio', False)
+
+    assert breaker == {'failures': 0, 'opened_at': None, 'trial': False}
+    assert call() and call()
+
+
+def test_failed_trial_reopens_the_circuit(breaker, monkeypatch):
+    for _ in range(3):
+        call(requests.ConnectionError())
+    opened_at = breaker['opened_at']
+    monkeypatch.setattr(kiosk, 'BREAKER_RESET_SECONDS', 0)
+    assert call(requests.ConnectionError())
+
+    monkeypatch.setattr(kiosk, 'BREAKER_RESET_SECONDS', 30)
+    assert breaker['opened_at'] > opened_at
+    assert not call()
+
+
+def test_open_circuit_fails_payment_fast(client, menu, monkeypatch):
+    kiosk.provider_breakers['stripe']['opened_at'] = kiosk.time.monotonic()
+
+    def unreachable(**kwargs):
+        raise AssertionError('Stripe was called while its circuit was open')
+    monkeypatch.setattr(stripe.PaymentIntent, 'create', unreachable)
+
+    response = client.post('/api/create-payment-intent', json={'amount': 15})
+    assert response.status_code == 503
+    assert response.get_json()['error'] == 'Payments are temporarily unavailable'
+
+
+def test_open_circuit_is_raised_to_the_outbox(breaker):
+    breaker['opened_at'] = kiosk.time.monotonic()
+    with pytest.raises(ProviderUnavailable):
+        kiosk.send_sms('+27820000001', 'Your order is ready')
+
+
+def test_every_provider_has_a_bounded_timeout(monkeypatch):
+    assert kiosk.stripe.default_http_client._timeout == kiosk.OUTBOUND_TIMEOUT
+    assert kiosk.twilio_client.http_client is kiosk.twilio_http_client
+    assert kiosk.twilio_http_client.timeout == kiosk.OUTBOUND_TIMEOUT[1]
+
+    posts = []
+
+    class Sent:
+        def raise_for_status(self):
+            pass
+
+    def post(url, **kwargs):
+        posts.append(kwargs)
+        return Sent()
+    monkeypatch.setattr(kiosk.sendgrid_session, 'post', post)
+
+    assert kiosk.send_email('customer@example.com', 'Receipt', '<p>Thanks</p>')
+    assert posts[0]['timeout'] == kiosk.OUTBOUND_TIMEOUT
@@ -0,0 +1,142 @@
+"""Menu images proxied through /api/images as resized variants."""
+import hashlib
+import io
+
+import pytest
+import requests
+from PIL import Image
+
+import app as kiosk
+from app import db
+
+
+def picture(size=(800, 600), mode='RGB', fmt='JPEG', color='red'):
+    output = io.BytesIO()
+    Image.new(mode, size, color).save(output, format=fmt)
+    return output.getvalue()
+
+
+@pytest.fixture
+def served(menu, monkeypatch, request):
+    """Give the burger a remote image (unique per test) and serve `picture()` for it."""
+    url = f'https://images.example.com/{request.node.name}.jpg'
+    menu['burger'].image_url = url
+    db.session.commit()
+    kiosk.bump_menu_version()
+    sources = {url: picture()}
+    monkeypatch.setattr(kiosk, 'fetch_image_source', lambda source_url: sources[source_url])
+    return {'url': url, 'sources': sources, 'path': f'/api/images/{kiosk.image_source_id(url)}',
+            'burger_category_id': menu['burgers'].id}
+
+
+def burger_image_url(client):
+    items = client.get('/api/menu-items', query_string={'category': 'burgers'}).get_json()
+    return items[0]['image_url']
+
+
+def test_menu_links_images_by_relative_path(client, served):
+    # Snapshots are shared, so the host a request came in on must not leak into them
+    response = client.get('/api/menu-items', query_string={'category': 'burgers'},
+                          base_url='http://kiosk-7.local:5000')
+    assert response.get_json()[0]['image_url'] == served['path']
+
+
+def test_image_base_url_makes_links_absolute(client, served, monkeypatch):
+    monkeypatch.setattr(kiosk, 'IMAGE_BASE_URL', 'https://cdn.example.com/')
+    assert burger_image_url(client) == f"https://cdn.example.com{served['path']}"
+
+
+def test_variant_is_resized_and_negotiated(client, served):
+    response = client.get(served['path'], query_string={'w': 300}, headers={'Accept': 'image/webp,*/*'})
+    assert response.status_code == 200
+    assert response.mimetype == 'image/webp'
+    with Image.open(io.BytesIO(response.data)) as image:
+        assert image.size == (320, 240)
+
+    response = client.get(served['path'], query_string={'w': 300})
+    assert response.mimetype == 'image/jpeg'
+
+
+def test_menu_links_the_content_hash_once_fetched(client, served):
+    # Not fetched yet: the bare URL, which caches must check back on
+    assert burger_image_url(client) == served['path']
+    response = client.get(served['path'])
+    assert 'no-cache' in response.headers['Cache-Control']
+    assert 'immutable' not in response.headers['Cache-Control']
+    assert client.get(served['path'], headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+    digest = hashlib.sha256(served['sources'][served['url']]).hexdigest()[:kiosk.IMAGE_DIGEST_LENGTH]
+    assert burger_image_url(client) == f"{served['path']}/{digest}"
+    response = client.get(f"{served['path']}/{digest}")
+    assert 'immutable' in response.headers['Cache-Control']
+    assert f'max-age={kiosk.IMAGE_MAX_AGE}' in response.headers['Cache-Control']
+
+
+def test_replaced_image_gets_a_new_url(client, served, monkeypatch):
+    client.get(served['path'])
+    old_url = burger_image_url(client)
+    version = kiosk.get_menu_version()
+
+    # Same source URL, new picture behind it; picked up once the source is due
+    served['sources'][served['url']] = picture(color='blue')
+    monkeypatch.setattr(kiosk, 'IMAGE_SOURCE_TTL_SECONDS', 0)
+    response = client.get(old_url)
+    assert response.status_code == 200
+    assert 'no-cache' in response.headers['Cache-Control']
+
+    new_url = burger_image_url(client)
+    assert new_url != old_url
+    assert kiosk.get_menu_version() > version
+    assert kiosk.changed_category_ids(version) == {served['burger_category_id']}
+    with Image.open(io.BytesIO(client.get(new_url).data)) as image:
+        assert image.getpixel((0, 0))[2] > 200
+
+
+def test_failed_download_keeps_the_stored_image(client, served, monkeypatch):
+    client.get(served['path'])
+    url = burger_image_url(client)
+    version = kiosk.get_menu_version()
+
+    def unreachable(source_url):
+        raise requests.ConnectionError('origin is down')
+    monkeypatch.setattr(kiosk, 'fetch_image_source', unreachable)
+    monkeypatch.setattr(kiosk, 'IMAGE_SOURCE_TTL_SECONDS', 0)
+    response = client.get(url)
+    assert response.status_code == 200
+    assert 'immutable' in response.headers['Cache-Control']
+    assert burger_image_url(client) == url
+    assert kiosk.get_menu_version() == version
+
+
+def test_refresh_images_command_moves_changed_images(app, served):
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['refresh-images'])
+    assert 'Checked 1 images: 1 changed, 0 failed' in result.output
+
+    result = runner.invoke(args=['refresh-images'])
+    assert 'Checked 1 images: 0 changed, 0 failed' in result.output
+
+    served['sources'][served['url']] = picture(color='green')
+    result = runner.invoke(args=['refresh-images'])
+    assert 'Checked 1 images: 1 changed, 0 failed' in result.output
+
+
+def test_transparent_source_is_flattened_for_jpeg(client, served):
+    served['sources'][served['url']] = picture(mode='RGBA', fmt='PNG')
+    response = client.get(served['path'], headers={'Accept': 'image/jpeg'})
+    assert response.status_code == 200
+    with Image.open(io.BytesIO(response.data)) as image:
+        assert image.mode == 'RGB'
+
+
+def test_decompression_bomb_is_refused(client, served, monkeypatch):
+    # A picture no other test renders, so no variant of it is on disk yet
+    served['sources'][served['url']] = picture(color='purple')
+    monkeypatch.setattr(Image, 'MAX_IMAGE_PIXELS', 1000)
+    response = client.get(served['path'])
+    assert response.status_code == 502
+    assert response.get_json()['error'] == 'Image unavailable'
+
+
+def test_only_menu_images_are_served(client, served):
+    assert client.get('/api/images/0123456789abcdef01234567').status_code == 404
@@ -0,0 +1,62 @@
+"""The kiosk start-up snapshot and its per-category deltas."""
+import app as kiosk
+
+
+def bootstrap(client, since=None):
+    query_string = {'since': since} if since is not None else {}
+    response = client.get('/api/menu/bootstrap', query_string=query_string)
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def bootstrap_keys():
+    return sorted(key.rsplit(':', 1)[1] for key in kiosk.snapshot_memo)
+
+
+def test_full_snapshot_lists_every_category(client, menu):
+    data = bootstrap(client)
+    assert data['full'] is True
+    assert {category['name'] for category in data['categories']} == {'Burgers', 'Sides'}
+    assert len(data['items'][str(menu['sides'].id)]) == 2
+
+
+def test_delta_only_carries_changed_categories(client, auth, menu):
+    version = bootstrap(client)['version']
+    response = client.put(f"/api/admin/menu-items/{menu['soda'].id}", headers=auth, json={'price': 18})
+    assert response.status_code == 200
+
+    data = bootstrap(client, version)
+    assert data['full'] is False
+    assert list(data['items']) == [str(menu['sides'].id)]
+    assert bootstrap(client, data['version'])['items'] == {}
+
+
+def test_client_since_is_rounded_to_a_recorded_version(client, auth, menu):
+    version = bootstrap(client)['version']
+    client.put(f"/api/admin/menu-items/{menu['soda'].id}", headers=auth, json={'price': 18})
+    kiosk.snapshot_memo.clear()
+
+    # Any value a client sends shares one of a few snapshots
+    for since in (version, version + 1, version + 7, 10 ** 15):
+        bootstrap(client, since)
+    for since in (0, -5, version - 1):
+        assert bootstrap(client, since)['full'] is True
+    assert len(bootstrap_keys()) == 3
+
+
+def test_history_reset_sends_the_whole_menu(client, menu):
+    version = bootstrap(client)['version']
+    kiosk.bump_menu_version()
+    assert bootstrap(client, version)['full'] is True
+
+
+def test_version_state_survives_cache_eviction(client, auth, menu):
+    version = bootstrap(client)['version']
+    client.put(f"/api/admin/menu-items/{menu['soda'].id}", headers=auth, json={'price': 18})
+    # Cache backends prune entries without a timeout first
+    kiosk.cache.clear()
+    kiosk.snapshot_memo.clear()
+
+    data = bootstrap(client, version)
+    assert data['full'] is False
+    assert list(data['items']) == [str(menu['sides'].id)]
@@ -0,0 +1,96 @@
+"""Menu change log and the /api/menu/changes deltas built from it."""
+from app import db, Category, Extra, MenuChange, MenuItem
+
+
+def logged(since=0):
+    return [(row.entity, row.entity_id, row.operation)
+            for row in MenuChange.query.filter(MenuChange.id > since).order_by(MenuChange.id)]
+
+
+def latest_id():
+    return db.session.query(db.func.max(MenuChange.id)).scalar() or 0
+
+
+def changes_since(client, since):
+    response = client.get('/api/menu/changes', query_string={'since': since})
+    assert response.status_code == 200
+    return response.get_json()
+
+
+def test_new_item_is_logged_without_its_category(client, auth, menu):
+    since = latest_id()
+    response = client.post('/api/admin/menu-items', headers=auth, json={
+        'name': 'Wrap', 'description': 'd', 'price': 40, 'category': 'burgers'
+    })
+    # Appending to the category's backref must not log the category
+    assert logged(since) == [('menu_item', response.get_json()['id'], 'insert')]
+
+
+def test_removed_option_is_logged_as_an_item_update(client, menu):
+    burger = db.session.get(MenuItem, menu['burger'].id)
+    since = latest_id()
+    burger.extras.remove(db.session.query(Extra).filter_by(name='Bacon').one())
+    db.session.commit()
+    assert logged(since) == [('menu_item', burger.id, 'update')]
+
+    delta = changes_since(client, since)
+    assert [change['op'] for change in delta['changes']] == ['upsert']
+    assert [extra['name'] for extra in delta['changes'][0]['data']['extras']] == ['Egg']
+
+
+def test_deleted_option_row_is_logged(client, menu):
+    since = latest_id()
+    db.session.delete(db.session.query(Extra).filter_by(name='Egg').one())
+    db.session.commit()
+    assert logged(since) == [('menu_item', menu['burger'].id, 'update')]
+
+
+def test_category_rename_logs_its_items(client, auth, menu):
+    since = latest_id()
+    response = client.put(f"/api/admin/categories/{menu['sides'].id}", headers=auth, json={'name': 'Extras'})
+    assert response.status_code == 200
+    assert sorted(logged(since)) == sorted([
+        ('category', menu['sides'].id, 'update'),
+        ('menu_item', menu['chips'].id, 'update'),
+        ('menu_item', menu['soda'].id, 'update'),
+    ])
+    delta = changes_since(client, since)
+    items = [change['data'] for change in delta['changes'] if change['type'] == 'menu_item']
+    assert {item['category'] for item in items} == {'Extras'}
+
+
+def test_category_description_change_leaves_items_alone(client, auth, menu):
+    since = latest_id()
+    client.put(f"/api/admin/categories/{menu['sides'].id}", headers=auth, json={'description': 'On the side'})
+    assert logged(since) == [('category', menu['sides'].id, 'update')]
+
+
+def test_unavailable_and_deleted_items_become_tombstones(client, auth, menu):
+    since = latest_id()
+    client.put(f"/api/admin/menu-items/{menu['chips'].id}", headers=auth, json={'is_available': False})
+    client.delete(f"/api/admin/menu-items/{menu['soda'].id}", headers=auth)
+    delta = changes_since(client, since)
+    assert [(c['id'], c['op']) for c in delta['changes']] == [(menu['chips'].id, 'delete'), (menu['soda'].id, 'delete')]
+    assert delta['version'] == latest_id()
+
+
+def test_changes_page_and_reset_after_pruning(client, menu):
+    for i in range(3):
+        db.session.add(Category(name=f'Specials {i}'))
+        db.session.commit()
+    first = client.get('/api/menu/changes', query_string={'since': 0, 'limit': 2}).get_json()
+    assert first['more'] and len(first['changes']) == 2
+    rest = changes_since(client, first['version'])
+    assert not rest['more'] and rest['version'] == latest_id()
+
+    MenuChange.query.filter(MenuChange.id < latest_id()).delete()
+    db.session.commit()
+    assert changes_since(client, 0)['reset'] is True
+
+
+def test_menu_flush_without_changes_writes_nothing(client, menu, count_statements):
+    burger = db.session.get(MenuItem, menu['burger'].id)
+    burger.name = burger.name  # no net change
+    with count_statements() as statements:
+        db.session.commit()
+    assert statements == []
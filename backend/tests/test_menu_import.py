@@ -0,0 +1,94 @@
+"""Bulk menu export and import: exported files load back as they were."""
+import json
+
+import pytest
+
+from app import db, MenuItem, PieceOption
+
+
+@pytest.fixture
+def full_menu(menu):
+    # Cases export writes that import once refused: a free item with no description
+    db.session.add_all([
+        PieceOption(menu_item_id=menu['chips'].id, quantity=6, price=32, is_default=True),
+        MenuItem(name='Water', description='', price=0, category=menu['sides'], is_available=False),
+    ])
+    db.session.commit()
+    return menu
+
+
+def export(client, auth, fmt):
+    response = client.get(f'/api/admin/menu-items/bulk?format={fmt}', headers=auth)
+    assert response.status_code == 200
+    return response.get_data(as_text=True)
+
+
+def load(client, auth, fmt, body):
+    return client.post(f'/api/admin/menu-items/bulk?format={fmt}', data=body.encode('utf-8'), headers=auth)
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'ndjson'])
+def test_exported_menu_imports_back(client, auth, full_menu, fmt):
+    exported = export(client, auth, fmt)
+    response = load(client, auth, fmt, exported)
+    assert response.status_code == 201
+    assert response.get_json()['imported'] == 4
+
+    # Imported copies follow the originals and export exactly as they did
+    again = export(client, auth, fmt)
+    if fmt == 'csv':
+        header, _, rows = exported.partition('\r\n')
+        assert again == header + '\r\n' + rows + rows
+    else:
+        assert again == exported * 2
+
+
+@pytest.mark.parametrize('price', ['nan', 'NaN', 'inf', '-Infinity', 'sNaN', '-1', '1e12', 'cheap'])
+def test_invalid_prices_are_reported_per_row(client, auth, menu, price):
+    body = '\n'.join([
+        json.dumps({'name': 'Shake', 'price': 30, 'category': 'Sides'}),
+        json.dumps({'name': 'Float', 'price': price, 'category': 'Sides'}),
+        json.dumps({'name': 'Wrap', 'price': 40, 'category': 'Sides',
+                    'sizes': [{'name': 'Large', 'price': price}]}),
+    ])
+    response = load(client, auth, 'ndjson', body)
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [
+        {'row': 2, 'error': f'Invalid price: {price}'},
+        {'row': 3, 'error': f'Invalid price: {price}'},
+    ]
+    assert MenuItem.query.filter(MenuItem.name.in_(['Shake', 'Float', 'Wrap'])).count() == 0
+
+
+def test_non_finite_json_numbers_are_refused(client, auth, menu):
+    # json.dumps writes NaN and Infinity as bare tokens, which json.loads accepts
+    body = json.dumps({'name': 'Float', 'price': float('nan'), 'category': 'Sides',
+                       'piece_options': [{'quantity': float('inf'), 'price': 5}]})
+    response = load(client, auth, 'ndjson', body)
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [{'row': 1, 'error': 'Invalid price: nan'}]
+
+    body = json.dumps({'name': 'Float', 'price': 5, 'category': 'Sides',
+                       'piece_options': [{'quantity': float('inf'), 'price': 5}]})
+    response = load(client, auth, 'ndjson', body)
+    assert response.status_code == 400
+    assert response.get_json()['errors'][0]['row'] == 1
+
+
+def test_bad_rows_reject_the_whole_import(client, auth, menu):
+    body = ('name,description,price,category\r\n'
+            'Shake,,30,Sides\r\n'
+            ',,30,Sides\r\n'
+            'Pizza,,90,Pizza\r\n')
+    response = load(client, auth, 'csv', body)
+    assert response.status_code == 400
+    assert response.get_json()['errors'] == [
+        {'row': 2, 'error': 'name is required'},
+        {'row': 3, 'error': 'Unknown category: Pizza'},
+    ]
+    assert MenuItem.query.filter_by(name='Shake').count() == 0
+
+
+def test_bulk_menu_requires_an_admin(client, menu):
+    assert client.get('/api/admin/menu-items/bulk?format=csv').status_code == 401
+    assert client.post('/api/admin/menu-items/bulk?format=csv', data='').status_code == 401
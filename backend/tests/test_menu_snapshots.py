@@ -0,0 +1,148 @@
+"""Versioned menu snapshots behind /api/menu-items and /api/categories."""
+import gzip
+import os
+import runpy
+from types import SimpleNamespace
+
+import brotli
+import pytest
+
+import app as kiosk
+from app import db
+
+
+def snapshot_names():
+    return sorted(key.split(':', 3)[3] for key in kiosk.snapshot_memo)
+
+
+def test_category_spellings_share_one_snapshot(client, menu):
+    for category in ('burgers', 'Burgers', ' BURGERS '):
+        items = client.get('/api/menu-items', query_string={'category': category}).get_json()
+        assert [item['name'] for item in items] == ['Cheese Burger']
+    assert snapshot_names() == [f"items:{menu['burgers'].id}"]
+
+
+def test_unknown_category_is_empty_and_not_cached(client, menu):
+    for category in ('wraps', 'Wraps', 'x' * 200):
+        response = client.get('/api/menu-items', query_string={'category': category})
+        assert response.status_code == 200
+        assert response.get_json() == []
+    assert snapshot_names() == []
+
+
+def test_renamed_category_is_found_by_its_new_name(client, auth, menu):
+    assert len(client.get('/api/menu-items?category=sides').get_json()) == 2
+    response = client.put(f"/api/admin/categories/{menu['sides'].id}", headers=auth, json={'name': 'Extras'})
+    assert response.status_code == 200
+
+    assert client.get('/api/menu-items?category=sides').get_json() == []
+    assert len(client.get('/api/menu-items?category=extras').get_json()) == 2
+
+
+def test_matching_etag_is_answered_with_304(client, menu):
+    for url in ('/api/menu-items?category=burgers', '/api/categories', '/api/menu/bootstrap'):
+        first = client.get(url)
+        assert first.status_code == 200
+        etag = first.headers['ETag']
+        assert not etag.startswith('W/')
+
+        again = client.get(url, headers={'If-None-Match': etag})
+        assert again.status_code == 304
+        assert again.data == b''
+        assert again.headers['ETag'] == etag
+        assert client.get(url, headers={'If-None-Match': '"stale"'}).status_code == 200
+
+
+def test_etag_changes_with_the_menu_version(client, auth, menu):
+    first = client.get('/api/menu-items?category=sides')
+    response = client.put(f"/api/admin/menu-items/{menu['soda'].id}", headers=auth, json={'price': 18})
+    assert response.status_code == 200
+
+    second = client.get('/api/menu-items?category=sides', headers={'If-None-Match': first.headers['ETag']})
+    assert second.status_code == 200
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert int(second.headers['X-Menu-Version']) > int(first.headers['X-Menu-Version'])
+    assert {item['name']: item['price'] for item in second.get_json()}['Soda'] == 18
+
+
+@pytest.mark.parametrize('accept, encoding', [
+    ('gzip, deflate, br', 'br'),
+    ('gzip', 'gzip'),
+    ('br;q=0, gzip', 'gzip'),
+    ('deflate', 'identity'),
+    (None, 'identity'),
+])
+def test_encoding_is_negotiated(client, menu, accept, encoding):
+    plain = client.get('/api/menu/bootstrap', headers={'Accept-Encoding': 'identity'})
+    headers = {'Accept-Encoding': accept} if accept else {}
+    response = client.get('/api/menu/bootstrap', headers=headers)
+
+    assert response.status_code == 200
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert response.headers.get('Content-Encoding') == (None if encoding == 'identity' else encoding)
+    decode = {'br': brotli.decompress, 'gzip': gzip.decompress, 'identity': bytes}[encoding]
+    assert decode(response.data) == plain.data
+    if encoding != 'identity':
+        # Each encoding has its own strong ETag, and revalidates against it
+        assert response.headers['ETag'] != plain.headers['ETag']
+        again = client.get('/api/menu/bootstrap', headers=dict(headers, **{'If-None-Match': response.headers['ETag']}))
+        assert again.status_code == 304
+
+
+def test_worker_with_its_own_cache_sees_another_workers_menu_change(client, menu):
+    def poll():
+        kiosk.invalidation_state['checked_at'] = 0.0
+
+    def served_version():
+        return int(client.get('/api/menu-items').headers['X-Menu-Version'])
+
+    poll()
+    version = served_version()
+    # Another worker moved the menu on; this worker's cache still holds the old state
+    with db.engine.begin() as connection:
+        kiosk.write_shared_versions(connection, {
+            'menu': version + 1, 'menu:reset': version + 1, 'invalidate:menu': kiosk.new_generation()
+        })
+    assert served_version() == version
+
+    poll()
+    assert served_version() == version + 1
+
+
+def test_own_menu_change_is_not_read_back_on_the_next_poll(client, auth, menu, monkeypatch):
+    kiosk.invalidation_state['checked_at'] = 0.0
+    client.get('/api/menu-items')
+    kiosk.bump_menu_version()
+    dropped = []
+    monkeypatch.setattr(kiosk.cache, 'delete', dropped.append)
+
+    kiosk.invalidation_state['checked_at'] = 0.0
+    client.get('/api/menu-items')
+    assert kiosk.MENU_VERSION_KEY not in dropped
+
+
+@pytest.mark.parametrize('cache_type, workers, refused', [
+    ('SimpleCache', 4, True),
+    ('flask_caching.backends.SimpleCache', 2, True),
+    ('SimpleCache', 1, False),
+    ('FileSystemCache', 4, False),
+    ('RedisCache', 4, False),
+])
+def test_gunicorn_refuses_a_per_worker_cache(monkeypatch, cache_type, workers, refused):
+    monkeypatch.setenv('ORDER_STREAM_MAX_PER_WORKER', os.environ.get('ORDER_STREAM_MAX_PER_WORKER', '4'))
+    config = runpy.run_path(os.path.join(os.path.dirname(kiosk.__file__), 'gunicorn.conf.py'))
+    monkeypatch.setattr(kiosk, 'CACHE_TYPE', cache_type)
+    server = SimpleNamespace(cfg=SimpleNamespace(workers=workers))
+    if refused:
+        with pytest.raises(RuntimeError, match='separate cache'):
+            config['on_starting'](server)
+    else:
+        config['on_starting'](server)
+
+
+def test_gunicorn_shares_a_cache_between_workers_by_default(monkeypatch):
+    monkeypatch.setenv('ORDER_STREAM_MAX_PER_WORKER', os.environ.get('ORDER_STREAM_MAX_PER_WORKER', '4'))
+    monkeypatch.delenv('CACHE_TYPE')
+    monkeypatch.setenv('WEB_CONCURRENCY', '4')
+    runpy.run_path(os.path.join(os.path.dirname(kiosk.__file__), 'gunicorn.conf.py'))
+    assert os.environ['CACHE_TYPE'] == 'FileSystemCache'
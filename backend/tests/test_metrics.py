@@ -0,0 +1,92 @@
+"""/metrics: token-guarded, in the Prometheus text exposition format."""
+import re
+
+import pytest
+
+import app as kiosk
+
+SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(\{(?:[a-zA-Z_][a-zA-Z0-9_]*="(?:[^"\\]|\\.)*",?)*\})? (\S+)$')
+
+
+@pytest.fixture
+def token(monkeypatch):
+    monkeypatch.setattr(kiosk, 'METRICS_TOKEN', 'scrape-secret')
+    return {'Authorization': 'Bearer scrape-secret'}
+
+
+def scrape(client, token):
+    response = client.get('/metrics', headers=token)
+    assert response.status_code == 200
+    assert response.mimetype == 'text/plain'
+    assert 'version=0.0.4' in response.headers['Content-Type']
+    return response.get_data(as_text=True)
+
+
+def parse(text):
+    """Check the layout a Prometheus scraper expects and return {name: (type, samples)}."""
+    assert text.endswith('\n')
+    families, current = {}, None
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            current = line.split(' ')[2]
+            assert current not in families, f'{current} is described twice'
+            families[current] = [None, []]
+        elif line.startswith('# TYPE '):
+            _, _, name, kind = line.split(' ')
+            assert name == current and kind in ('counter', 'gauge', 'histogram')
+            families[name][0] = kind
+        else:
+            match = SAMPLE.match(line)
+            assert match, f'malformed sample: {line!r}'
+            name, labels, value = match.group(1), match.group(2) or '', float(match.group(3))
+            family = re.sub(r'_(bucket|sum|count)$', '', name) if families[current][0] == 'histogram' else name
+            assert family == current, f'{name} is outside its family'
+            families[current][1].append((name, labels, value))
+    return families
+
+
+def test_metrics_are_off_without_a_token(client, monkeypatch):
+    monkeypatch.setattr(kiosk, 'METRICS_TOKEN', None)
+    assert client.get('/metrics').status_code == 404
+
+
+@pytest.mark.parametrize('header', [None, 'Bearer wrong', 'Bearer scrape-secret-and-more', 'scrape-secret'])
+def test_metrics_refuse_a_wrong_token(client, token, header):
+    headers = {'Authorization': header} if header else {}
+    response = client.get('/metrics', headers=headers)
+    assert response.status_code == 401
+    assert b'http_request' not in response.get_data()
+
+
+def test_exposition_format(client, token, menu):
+    client.get('/api/menu-items?category=burgers')
+    client.get('/api/menu-items?category=burgers')
+    kiosk.increment('outbound_rejected_total', provider='twi"lio\\\n')
+
+    families = parse(scrape(client, token))
+    assert families['outbound_rejected_total'][0] == 'counter'
+    assert ('outbound_rejected_total', '{provider="twi\\"lio\\\\\\n"}', 1.0) in families['outbound_rejected_total'][1]
+    assert families['outbound_circuit_open'][0] == 'gauge'
+    assert families['cache_requests_total'][0] == 'counter'
+
+    kind, samples = families['http_request_duration_seconds']
+    assert kind == 'histogram'
+    route = 'route="/api/menu-items"'
+    series = [(name, labels, value) for name, labels, value in samples if route in labels]
+    buckets = [value for name, labels, value in series if name.endswith('_bucket')]
+    # Cumulative buckets, one per bound plus +Inf, ending at the count
+    assert len(buckets) == len(kiosk.LATENCY_BUCKETS) + 1
+    assert buckets == sorted(buckets)
+    assert series[len(buckets) - 1][1].endswith('le="+Inf"}')
+    (count,) = [value for name, labels, value in series if name.endswith('_count')]
+    (total,) = [value for name, labels, value in series if name.endswith('_sum')]
+    assert buckets[-1] == count == 2
+    assert total > 0
+
+
+def test_statement_histogram_uses_its_own_buckets(client, token, menu):
+    client.get('/api/menu-items')
+    samples = parse(scrape(client, token))['http_request_db_statements'][1]
+    bounds = [re.search(r'le="([^"]+)"', labels).group(1)
+              for name, labels, value in samples if name.endswith('_bucket') and 'menu-items' in labels]
+    assert bounds == [str(bound) for bound in kiosk.STATEMENT_BUCKETS] + ['+Inf']
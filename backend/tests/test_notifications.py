@@ -0,0 +1,146 @@
+"""The notification outbox, drained through the fake provider."""
+from concurrent.futures import Future
+from datetime import datetime, timedelta
+
+import pytest
+
+import app as kiosk
+from app import db, NotificationOutbox
+
+
+class ManualExecutor:
+    """Holds submitted deliveries until the test runs them."""
+
+    def __init__(self):
+        self.pending = []
+
+    def submit(self, fn, *args):
+        future = Future()
+        self.pending.append((future, fn, args))
+        return future
+
+    def run(self, count=None):
+        count = len(self.pending) if count is None else count
+        ran, self.pending = self.pending[:count], self.pending[count:]
+        for future, fn, args in ran:
+            future.set_result(fn(*args))
+        return len(ran)
+
+
+@pytest.fixture
+def outbox(app, monkeypatch):
+    executors = {channel: ManualExecutor() for channel in kiosk.NOTIFICATION_CONCURRENCY}
+    monkeypatch.setattr(kiosk, 'notification_executors', executors)
+    monkeypatch.setattr(kiosk, 'notification_in_flight', {channel: 0 for channel in executors})
+    kiosk.fake_notifications.clear()
+    return executors
+
+
+def drain_all(outbox):
+    kiosk.drain_notifications()
+    return sum(executor.run() for executor in outbox.values())
+
+
+def queue(channel='sms', count=1, **values):
+    rows = [NotificationOutbox(channel=channel, recipient=f'+2782000000{i}', body=f'Message {i}', **values)
+            for i in range(count)]
+    db.session.add_all(rows)
+    db.session.commit()
+    return [row.id for row in rows]
+
+
+def reload(notification_id):
+    db.session.expire_all()
+    return db.session.get(NotificationOutbox, notification_id)
+
+
+def test_checkout_queues_notifications_that_the_drain_sends(client, menu, outbox):
+    response = client.post('/api/complete-order', json={
+        'items': [{'id': menu['soda'].id, 'name': 'Soda', 'quantity': 1}],
+        'amount': 15, 'paymentIntent': 'pi_1', 'phone': '+27820000001', 'email': 'customer@example.com'
+    })
+    order_number = response.get_json()['order_number']
+    assert {row.status for row in NotificationOutbox.query} == {'pending'}
+    assert kiosk.fake_notifications == []
+
+    assert drain_all(outbox) == 2
+    assert sorted(sent['channel'] for sent in kiosk.fake_notifications) == ['email', 'sms']
+    assert all(order_number in sent['body'] for sent in kiosk.fake_notifications)
+    db.session.expire_all()
+    for row in NotificationOutbox.query:
+        assert (row.status, row.attempts, row.locked_at) == ('sent', 1, None)
+        assert row.sent_at is not None
+    assert drain_all(outbox) == 0
+
+
+def test_failed_delivery_is_retried_after_a_backoff(outbox, monkeypatch):
+    def failing(recipient, subject, body):
+        raise RuntimeError('SMS provider rejected the message')
+    monkeypatch.setattr(kiosk, 'get_notification_provider', lambda channel: failing)
+    [notification_id] = queue()
+
+    before = datetime.utcnow()
+    assert drain_all(outbox) == 1
+    row = reload(notification_id)
+    assert (row.status, row.attempts, row.last_error) == ('pending', 1, 'SMS provider rejected the message')
+    delay = (row.next_attempt_at - before).total_seconds()
+    assert 0.8 * kiosk.NOTIFICATION_BACKOFF_SECONDS <= delay <= 1.2 * kiosk.NOTIFICATION_BACKOFF_SECONDS + 1
+    # Not due yet
+    assert drain_all(outbox) == 0
+
+    # The last attempt gives up for good
+    row.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+    row.attempts = kiosk.NOTIFICATION_MAX_ATTEMPTS - 1
+    db.session.commit()
+    assert drain_all(outbox) == 1
+    assert reload(notification_id).status == 'failed'
+
+
+def test_backoff_doubles_up_to_its_cap():
+    for attempts in (1, 2, 3, 4):
+        expected = kiosk.NOTIFICATION_BACKOFF_SECONDS * 2 ** (attempts - 1)
+        assert 0.8 * expected <= kiosk.notification_backoff(attempts) <= 1.2 * expected
+    assert kiosk.notification_backoff(30) <= 1.2 * kiosk.NOTIFICATION_MAX_BACKOFF_SECONDS
+
+
+def test_open_circuit_costs_no_attempt(outbox, monkeypatch):
+    def unavailable(recipient, subject, body):
+        raise kiosk.ProviderUnavailable('twilio is unavailable, try again shortly')
+    monkeypatch.setattr(kiosk, 'get_notification_provider', lambda channel: unavailable)
+    [notification_id] = queue()
+
+    drain_all(outbox)
+    row = reload(notification_id)
+    assert (row.status, row.attempts) == ('pending', 0)
+
+
+def test_expired_sending_lease_is_reclaimed(outbox):
+    now = datetime.utcnow()
+    [abandoned] = queue(status='sending', attempts=1,
+                        locked_at=now - timedelta(seconds=kiosk.NOTIFICATION_LEASE_SECONDS + 5))
+    [in_flight] = queue(status='sending', attempts=1, locked_at=now)
+
+    assert drain_all(outbox) == 1
+    row = reload(abandoned)
+    assert (row.status, row.attempts) == ('sent', 2)
+    assert reload(in_flight).status == 'sending'
+
+
+def test_each_channel_is_limited_to_its_concurrency(outbox, monkeypatch):
+    monkeypatch.setitem(kiosk.NOTIFICATION_CONCURRENCY, 'sms', 2)
+    queue('sms', count=3)
+    queue('email', count=1)
+
+    kiosk.drain_notifications()
+    assert [len(outbox['sms'].pending), len(outbox['email'].pending)] == [2, 1]
+    assert kiosk.notification_in_flight['sms'] == 2
+    # Both SMS slots are busy, so the third message waits
+    kiosk.drain_notifications()
+    assert len(outbox['sms'].pending) == 2
+
+    outbox['sms'].run(1)
+    assert kiosk.notification_in_flight['sms'] == 1
+    kiosk.drain_notifications()
+    assert len(outbox['sms'].pending) == 2
+    assert outbox['sms'].run() == 2
+    assert NotificationOutbox.query.filter_by(channel='sms', status='sent').count() == 3
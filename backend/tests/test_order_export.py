@@ -0,0 +1,110 @@
+"""The accounting export: one row per line item, streamed as CSV or NDJSON."""
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+import app as kiosk
+from app import db, Order, OrderItem
+
+
+@pytest.fixture
+def history(app):
+    """Three orders over two days; one has two lines and one has none."""
+    first = Order(order_number='A0000001', total_amount=85, status='completed', created_at=datetime(2026, 3, 1, 9),
+                  email='a@example.com', phone='+27820000001')
+    first.items.append(OrderItem(item_name='Cheese Burger', quantity=1, price=65,
+                                 size={'id': 2, 'name': 'Large', 'price': 15},
+                                 extras=[{'id': 1, 'name': 'Bacon', 'price': 12}]))
+    first.items.append(OrderItem(item_name='Chips', quantity=2, price=10))
+    second = Order(order_number='A0000002', total_amount=32, status='cancelled', created_at=datetime(2026, 3, 1, 12))
+    second.items.append(OrderItem(item_name='Nuggets', quantity=1, price=32,
+                                  piece_option={'id': 1, 'quantity': 6, 'price': 32}))
+    third = Order(order_number='A0000003', total_amount=0, status='completed', created_at=datetime(2026, 3, 2, 10))
+    db.session.add_all([first, second, third])
+    db.session.commit()
+
+
+def export(client, auth, **params):
+    response = client.get('/api/admin/orders/export', headers=auth, query_string=params)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return response
+
+
+def csv_rows(text):
+    return list(csv.DictReader(io.StringIO(text)))
+
+
+def test_csv_has_one_row_per_line_item(client, auth, history):
+    response = export(client, auth)
+    assert response.mimetype == 'text/csv'
+    assert response.headers['Content-Disposition'] == 'attachment; filename=orders.csv'
+    rows = csv_rows(response.get_data(as_text=True))
+    assert [(row['order_number'], row['item_name'], row['line_total']) for row in rows] == [
+        ('A0000001', 'Cheese Burger', '65.0'),
+        ('A0000001', 'Chips', '20.0'),
+        ('A0000002', 'Nuggets', '32.0'),
+        ('A0000003', '', ''),  # an order without lines still appears once
+    ]
+    assert list(rows[0]) == list(kiosk.ORDER_EXPORT_FIELDS)
+    assert json.loads(rows[0]['size']) == {'id': 2, 'name': 'Large', 'price': 15}
+    assert json.loads(rows[0]['extras']) == [{'id': 1, 'name': 'Bacon', 'price': 12}]
+    assert json.loads(rows[2]['piece_option'])['quantity'] == 6
+    assert rows[1]['extras'] == rows[1]['size'] == ''
+
+
+def test_ndjson_keeps_nested_choices_as_json(client, auth, history):
+    response = export(client, auth, format='ndjson')
+    assert response.mimetype == 'application/x-ndjson'
+    rows = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    assert rows[0] == {
+        'order_number': 'A0000001', 'created_at': '2026-03-01T09:00:00', 'status': 'completed',
+        'email': 'a@example.com', 'phone': '+27820000001', 'total_amount': 85.0,
+        'item_name': 'Cheese Burger', 'quantity': 1, 'price': 65.0, 'line_total': 65.0,
+        'extras': [{'id': 1, 'name': 'Bacon', 'price': 12}],
+        'size': {'id': 2, 'name': 'Large', 'price': 15}, 'piece_option': None,
+    }
+    assert rows[3]['item_name'] is None and rows[3]['line_total'] is None
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'ndjson'])
+def test_gzip_export_decompresses_to_the_plain_export(client, auth, history, fmt):
+    plain = export(client, auth, format=fmt).get_data()
+    response = export(client, auth, format=fmt, gzip='1')
+    assert response.mimetype == 'application/gzip'
+    assert response.headers['Content-Disposition'] == f'attachment; filename=orders.{fmt}.gz'
+    assert gzip.decompress(response.get_data()) == plain
+
+
+def test_export_streams_in_cursor_batches(client, auth, history, monkeypatch):
+    monkeypatch.setattr(kiosk, 'ORDER_EXPORT_BATCH_SIZE', 2)
+    response = client.get('/api/admin/orders/export', headers=auth, query_string={'format': 'ndjson'})
+    chunks = [chunk for chunk in response.response if chunk]
+    # Four rows in batches of two, each batch written as it is read
+    assert len(chunks) == 2
+    assert sum(chunk.count(b'\n') for chunk in chunks) == 4
+
+
+@pytest.mark.parametrize('params, expected', [
+    ({'status': 'completed'}, ['A0000001', 'A0000003']),
+    ({'status': 'cancelled,completed'}, ['A0000001', 'A0000002', 'A0000003']),
+    ({'start_date': '2026-03-02'}, ['A0000003']),
+    ({'end_date': '2026-03-01'}, ['A0000001', 'A0000002']),
+    ({'start_date': '2026-03-01T10:00:00', 'end_date': '2026-03-02'}, ['A0000002', 'A0000003']),
+])
+def test_export_filters(client, auth, history, params, expected):
+    rows = csv_rows(export(client, auth, **params).get_data(as_text=True))
+    assert sorted({row['order_number'] for row in rows}) == expected
+
+
+@pytest.mark.parametrize('params', [{'format': 'xlsx'}, {'start_date': 'yesterday'}])
+def test_bad_export_parameters(client, auth, history, params):
+    response = client.get('/api/admin/orders/export', headers=auth, query_string=params)
+    assert response.status_code == 400
+
+
+def test_export_requires_an_admin(client, history):
+    assert client.get('/api/admin/orders/export').status_code == 401
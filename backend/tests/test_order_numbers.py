@@ -0,0 +1,71 @@
+"""Order numbers: unique, in allocation order, and not guessable from each other."""
+import os
+import subprocess
+import sys
+
+import app as kiosk
+from app import db, Order
+
+
+def checkout(client, menu, payment_intent):
+    return client.post('/api/complete-order', json={
+        'items': [{'id': menu['soda'].id, 'name': 'Soda', 'quantity': 1}],
+        'amount': 15,
+        'paymentIntent': payment_intent
+    })
+
+
+def test_numbers_sort_in_allocation_order():
+    values = range(kiosk.ORDER_NUMBER_START, kiosk.ORDER_NUMBER_START + 5000)
+    numbers = [kiosk.encode_order_number(value) for value in values]
+    assert numbers == sorted(numbers)
+    assert len(set(numbers)) == len(numbers)
+    assert all(len(number) == 10 and set(number) <= set(kiosk.ORDER_NUMBER_ALPHABET) for number in numbers)
+
+
+def test_check_depends_on_the_key(monkeypatch):
+    value = kiosk.ORDER_NUMBER_START + 12345
+    number = kiosk.encode_order_number(value)
+    monkeypatch.setattr(kiosk, 'ORDER_NUMBER_KEY', b'another-key')
+    other = kiosk.encode_order_number(value)
+    assert other[:kiosk.ORDER_SEQUENCE_LENGTH] == number[:kiosk.ORDER_SEQUENCE_LENGTH]
+    assert other != number
+
+
+def test_neighbours_do_not_share_a_check():
+    checks = {kiosk.encode_order_number(kiosk.ORDER_NUMBER_START + i)[kiosk.ORDER_SEQUENCE_LENGTH:]
+              for i in range(50)}
+    assert len(checks) > 45
+
+
+def test_app_refuses_to_start_without_its_own_key():
+    backend = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    for key in ('', os.environ['JWT_SECRET_KEY']):
+        result = subprocess.run([sys.executable, '-c', 'import app'], cwd=backend, capture_output=True, text=True,
+                                env=dict(os.environ, ORDER_NUMBER_KEY=key))
+        assert result.returncode != 0
+        assert 'Set ORDER_NUMBER_KEY' in result.stderr
+
+
+def test_number_held_by_another_row_is_skipped(client, menu):
+    value = kiosk.ORDER_NUMBER_START + 12345
+    kiosk.order_number_block.update(next=value, end=value + 10)
+    taken = kiosk.encode_order_number(value)
+    db.session.add(Order(order_number=taken, total_amount=99, status='completed'))
+    db.session.commit()
+
+    response = checkout(client, menu, 'pi_1')
+    assert response.status_code == 200
+    assert response.get_json()['order_number'] == kiosk.encode_order_number(value + 1)
+    assert Order.query.filter_by(order_number=taken).one().total_amount == 99
+    assert Order.query.count() == 2
+
+
+def test_order_status_lookup(client, menu):
+    order_number = checkout(client, menu, 'pi_1').get_json()['order_number']
+    response = client.get(f'/api/order-status/{order_number}')
+    assert response.status_code == 200
+    assert response.get_json()['status'] == 'completed'
+    # Right sequence, wrong check
+    wrong = order_number[:-1] + ('0' if order_number[-1] != '0' else '1')
+    assert client.get(f'/api/order-status/{wrong}').status_code == 404
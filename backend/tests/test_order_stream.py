@@ -0,0 +1,149 @@
+"""The admin order stream: tickets, re-validation and the per-worker limit."""
+import json
+import os
+import threading
+import time
+
+import jwt
+import pytest
+
+import app as kiosk
+from app import db
+
+
+def ticket_for(client, auth):
+    response = client.post('/api/admin/orders/stream-ticket', headers=auth)
+    assert response.status_code == 200
+    return response.get_json()['ticket']
+
+
+def open_stream(client, ticket):
+    return client.get('/api/admin/orders/stream', query_string={'ticket': ticket})
+
+
+@pytest.fixture
+def fast_stream(monkeypatch):
+    monkeypatch.setattr(kiosk, 'ORDER_STREAM_POLL_SECONDS', 0.01)
+    monkeypatch.setattr(kiosk, 'ORDER_STREAM_REVALIDATE_SECONDS', 0)
+
+
+def place_order(client, menu, payment_intent):
+    response = client.post('/api/complete-order', json={
+        'items': [{'id': menu['soda'].id, 'name': 'Soda', 'quantity': 1}],
+        'amount': 15, 'paymentIntent': payment_intent
+    })
+    assert response.status_code == 200
+    return response.get_json()['order_number']
+
+
+def parse_event(chunk):
+    fields = dict(line.split(': ', 1) for line in chunk.decode().strip().split('\n'))
+    return int(fields['id']), fields['event'], json.loads(fields['data'])
+
+
+def test_stream_opens_with_a_ticket(client, auth):
+    response = open_stream(client, ticket_for(client, auth))
+    assert response.status_code == 200
+    assert response.mimetype == 'text/event-stream'
+    assert next(response.response) == b'retry: 3000\n\n'
+    response.close()
+
+
+def test_access_token_is_not_accepted_in_the_url(client, auth):
+    token = auth['Authorization'].split(' ')[1]
+    assert client.get('/api/admin/orders/stream', query_string={'token': token}).status_code == 401
+    assert open_stream(client, token).status_code == 401
+
+
+def test_ticket_opens_nothing_but_the_stream(client, auth):
+    ticket = ticket_for(client, auth)
+    assert client.get('/api/admin/orders', headers={'Authorization': f'Bearer {ticket}'}).status_code == 401
+    assert client.post('/api/admin/orders/stream-ticket').status_code == 401
+
+
+def test_expired_ticket_is_refused(client, admin):
+    ticket = jwt.encode({
+        'admin_id': admin.id,
+        'pwd': kiosk.password_fingerprint(admin),
+        'purpose': 'order_stream',
+        'session_exp': int(time.time()) + 3600,
+        'exp': int(time.time()) - 1
+    }, os.environ['JWT_SECRET_KEY'], algorithm='HS256')
+    assert open_stream(client, ticket).status_code == 401
+
+
+def test_open_stream_ends_when_the_password_changes(client, auth, admin, fast_stream):
+    response = open_stream(client, ticket_for(client, auth))
+    chunks = iter(response.response)
+    assert next(chunks) == b'retry: 3000\n\n'
+
+    admin.password = kiosk.generate_password_hash('changed')
+    db.session.commit()
+    assert list(chunks) == [b'event: unauthorized\ndata: {}\n\n']
+    response.close()
+
+
+def test_streams_per_worker_are_limited(client, auth, monkeypatch):
+    monkeypatch.setattr(kiosk, 'order_stream_slots', threading.BoundedSemaphore(2))
+    ticket = ticket_for(client, auth)
+    first, second = open_stream(client, ticket), open_stream(client, ticket)
+    refused = open_stream(client, ticket)
+    assert refused.status_code == 503
+    assert refused.headers['Retry-After'] == '10'
+
+    # Closing a stream frees its slot, even one that was never read
+    second.close()
+    third = open_stream(client, ticket)
+    assert third.status_code == 200
+    third.close()
+    first.close()
+
+
+def test_order_events_are_delivered(client, auth, menu, fast_stream):
+    response = open_stream(client, ticket_for(client, auth))
+    chunks = iter(response.response)
+    assert next(chunks) == b'retry: 3000\n\n'
+
+    order_number = place_order(client, menu, 'pi_1')
+    created_id, event_type, data = parse_event(next(chunks))
+    assert event_type == 'order.created'
+    assert data['order_number'] == order_number
+    assert data['items'][0]['item_name'] == 'Soda'
+
+    updated = client.put(f'/api/admin/orders/{order_number}/status', headers=auth, json={'status': 'ready'})
+    assert updated.status_code == 200
+    changed_id, event_type, data = parse_event(next(chunks))
+    assert changed_id > created_id
+    assert event_type == 'order.status_changed'
+    assert data == {'order_number': order_number, 'status': 'ready', 'previous_status': 'completed'}
+    response.close()
+
+
+@pytest.mark.parametrize('resume', ['header', 'query'])
+def test_resume_skips_events_already_seen(client, auth, menu, fast_stream, resume):
+    first, second = place_order(client, menu, 'pi_1'), place_order(client, menu, 'pi_2')
+    seen = kiosk.OrderEvent.query.filter_by(order_number=first).one().id
+
+    ticket = ticket_for(client, auth)
+    if resume == 'header':
+        response = client.get('/api/admin/orders/stream', query_string={'ticket': ticket},
+                              headers={'Last-Event-ID': str(seen)})
+    else:
+        response = client.get('/api/admin/orders/stream', query_string={'ticket': ticket, 'last_event_id': seen})
+    chunks = iter(response.response)
+    assert next(chunks) == b'retry: 3000\n\n'
+    event_id, event_type, data = parse_event(next(chunks))
+    assert (event_type, data['order_number']) == ('order.created', second)
+    assert event_id > seen
+    response.close()
+
+
+def test_new_stream_starts_after_existing_events(client, auth, menu, fast_stream):
+    place_order(client, menu, 'pi_1')
+    response = open_stream(client, ticket_for(client, auth))
+    chunks = iter(response.response)
+    assert next(chunks) == b'retry: 3000\n\n'
+
+    later = place_order(client, menu, 'pi_2')
+    assert parse_event(next(chunks))[2]['order_number'] == later
+    response.close()
@@ -0,0 +1,138 @@
+"""Server-side pricing: what the kiosk sends is looked up, never trusted."""
+import os
+
+import app as kiosk
+from app import db, MenuChange, PieceOption, SharedVersion, Size
+
+
+def quote(client, *items):
+    return client.post('/api/price-order', json={'items': list(items)})
+
+
+def size_of(item, name):
+    return next(size for size in item.sizes if size.name == name)
+
+
+def test_size_price_is_a_surcharge_on_the_base_price(client, menu):
+    # Chips are R20 and Large adds R15, as the kiosk shows it: R35, not R55
+    large = size_of(menu['chips'], 'Large')
+    response = quote(client, {'id': menu['chips'].id, 'name': 'Chips', 'quantity': 1,
+                              'selectedSize': {'id': large.id, 'name': 'Large', 'price': 15}})
+    assert response.status_code == 200
+    assert response.get_json()['total'] == 35
+
+
+def test_size_is_found_by_name_and_client_prices_are_ignored(client, menu):
+    response = quote(client, {'id': menu['chips'].id, 'name': 'Chips', 'quantity': 2, 'price': 1,
+                              'selectedSize': {'name': 'Large', 'price': 0}})
+    line = response.get_json()['lines'][0]
+    assert (line['unit_price'], line['line_total']) == (35, 70)
+
+    response = quote(client, {'id': menu['chips'].id, 'name': 'Chips', 'quantity': 1,
+                              'selectedSize': {'name': 'Regular'}})
+    assert response.get_json()['total'] == 20
+
+
+def test_extras_and_quantity(client, menu):
+    large = size_of(menu['burger'], 'Large')
+    response = quote(
+        client,
+        {'id': menu['burger'].id, 'name': 'Cheese Burger', 'quantity': 2,
+         'selectedSize': {'id': large.id}, 'selectedExtras': [{'name': 'Bacon'}, {'name': 'Egg'}]},
+        {'name': 'Soda', 'quantity': 1}
+    )
+    assert response.status_code == 200
+    assert response.get_json()['total'] == (50 + 15 + 12 + 8) * 2 + 15
+
+
+def test_piece_option_price_replaces_the_base_price(client, menu):
+    option = PieceOption(menu_item_id=menu['chips'].id, quantity=6, price=32, is_default=True)
+    db.session.add(option)
+    db.session.commit()
+    kiosk.bump_menu_version()
+
+    response = quote(client, {'id': menu['chips'].id, 'name': 'Chips', 'quantity': 1,
+                              'selectedOption': str(option.id)})
+    assert response.get_json()['total'] == 32
+
+
+def test_unknown_choices_are_refused(client, menu):
+    cases = [
+        ({'name': 'Pizza', 'quantity': 1}, 'Unknown menu item: Pizza'),
+        ({'name': 'Chips', 'quantity': 0}, 'Invalid quantity for Chips'),
+        ({'name': 'Chips', 'quantity': 1, 'selectedSize': {'name': 'Huge'}}, 'Unknown size for Chips'),
+        ({'name': 'Chips', 'quantity': 1, 'selectedExtras': [{'name': 'Bacon'}]}, 'Unknown extra for Chips'),
+        ({'name': 'Chips', 'quantity': 1, 'selectedOption': '999'}, 'Unknown piece option for Chips'),
+    ]
+    for item, error in cases:
+        response = quote(client, item)
+        assert response.status_code == 400
+        assert response.get_json()['error'] == error
+
+
+def test_unavailable_item_is_refused(client, auth, menu):
+    response = client.put(f"/api/admin/menu-items/{menu['soda'].id}", headers=auth, json={'is_available': False})
+    assert response.status_code == 200
+    assert quote(client, {'name': 'Soda', 'quantity': 1}).get_json()['error'] == 'Soda is not available'
+
+
+def test_payment_intent_charges_and_returns_the_server_total(client, menu, monkeypatch):
+    charged = []
+
+    def create(amount, currency):
+        charged.append(amount)
+        return {'client_secret': 'pi_test_secret'}
+    monkeypatch.setattr(kiosk.stripe.PaymentIntent, 'create', create)
+
+    large = size_of(menu['chips'], 'Large')
+    response = client.post('/api/create-payment-intent', json={
+        'amount': 55,
+        'items': [{'id': menu['chips'].id, 'name': 'Chips', 'quantity': 1, 'selectedSize': {'id': large.id}}]
+    })
+    assert response.status_code == 200
+    assert response.get_json() == {'clientSecret': 'pi_test_secret', 'amount': 35}
+    assert charged == [3500]
+
+
+def run_migration(step):
+    import importlib.util
+    from alembic.migration import MigrationContext
+    from alembic.operations import Operations
+
+    path = os.path.join(os.path.dirname(kiosk.__file__), 'migrations', 'versions',
+                        '9c4e2b7a5d18_store_size_prices_as_surcharges.py')
+    spec = importlib.util.spec_from_file_location('store_size_prices_as_surcharges', path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    with db.engine.begin() as connection, Operations.context(MigrationContext.configure(connection)):
+        getattr(migration, step)()
+    db.session.expire_all()
+
+
+def test_migration_turns_absolute_size_prices_into_surcharges(client, menu):
+    # Sizes as Sides and Drinks stored them before: the price of the item in that size
+    chips, soda = menu['chips'], menu['soda']
+    size_of(chips, 'Regular').price = 20
+    size_of(chips, 'Large').price = 35
+    soda.sizes = [Size(name='Small', price=12), Size(name='Large', price=22)]
+    db.session.commit()
+
+    run_migration('upgrade')
+    assert [(size.name, size.price) for size in chips.sizes] == [('Regular', 0), ('Large', 15)]
+    # Small cost less than Soda itself, so Soda drops to R12 and no surcharge goes negative
+    assert soda.price == 12
+    assert sorted((size.name, size.price) for size in soda.sizes) == [('Large', 10), ('Small', 0)]
+    # Burgers always priced sizes as surcharges and are left alone
+    assert [size.price for size in menu['burger'].sizes] == [0, 15]
+    assert {change.entity_id for change in MenuChange.query.filter_by(operation='update')} == {chips.id, soda.id}
+    assert SharedVersion.query.filter(SharedVersion.name.like('menu%')).count() == 0
+
+    # Every size still costs what it was stored as
+    kiosk.cache.clear()  # workers restart after an upgrade
+    totals = [quote(client, {'id': item.id, 'name': item.name, 'quantity': 1,
+                             'selectedSize': {'name': size}}).get_json()['total']
+              for item, size in [(chips, 'Regular'), (chips, 'Large'), (soda, 'Small'), (soda, 'Large')]]
+    assert totals == [20, 35, 12, 22]
+
+    run_migration('downgrade')
+    assert [size.price for size in chips.sizes] == [20, 35]
@@ -0,0 +1,122 @@
+"""SQL statement counts per endpoint.
+
+Reads run with ENFORCE_QUERY_BUDGET on, so going over a route's budget fails
+the request; the exact counts are pinned here so a change shows up in review.
+"""
+import pytest
+
+
+def place_order(client, items, payment_intent):
+    quote = client.post('/api/price-order', json={'items': items}).get_json()
+    response = client.post('/api/complete-order', json={
+        'items': items,
+        'amount': quote['total'],
+        'paymentIntent': payment_intent,
+        'email': 'customer@example.com'
+    })
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()['order_number']
+
+
+@pytest.fixture
+def orders(client, menu):
+    for i in range(3):
+        place_order(client, [
+            {'id': menu['burger'].id, 'name': 'Cheese Burger', 'quantity': 1, 'selectedExtras': [{'id': 1}]},
+            {'id': menu['soda'].id, 'name': 'Soda', 'quantity': 2}
+        ], f'pi_budget_{i}')
+
+
+@pytest.fixture
+def warm_token(client, auth):
+    # The first request with a token verifies it against the database
+    client.get('/api/admin/stock', headers=auth)
+    return auth
+
+
+@pytest.mark.parametrize('url, as_admin, expected', [
+    ('/api/menu-items?category=burgers', False, 5),
+    ('/api/menu/bootstrap', False, 6),
+    ('/api/menu/changes?since=0', False, 7),
+    ('/api/categories', False, 1),
+    ('/api/admin/menu-items', True, 4),
+    ('/api/admin/stock', True, 1),
+    ('/api/admin/orders', True, 2),
+    ('/api/admin/analytics', True, 4),
+])
+def test_read_statement_counts(client, warm_token, orders, count_statements, url, as_admin, expected):
+    with count_statements() as statements:
+        response = client.get(url, headers=warm_token if as_admin else {})
+    assert response.status_code == 200
+    assert len(statements) == expected, statements
+
+
+def test_cached_menu_reads_skip_the_database(client, menu, count_statements):
+    client.get('/api/menu-items?category=burgers')
+    with count_statements() as statements:
+        response = client.get('/api/menu-items?category=burgers')
+    assert response.status_code == 200
+    assert statements == []
+
+
+def test_writes_are_not_budgeted(client, auth, menu, app):
+    # A write over the read budget must not turn into a 500
+    response = client.post('/api/admin/menu-items', headers=auth, json={
+        'name': 'Double Burger', 'description': 'Two patties', 'price': 80, 'category': 'burgers',
+        'extras': [{'name': 'Cheese', 'price': 5}], 'sizes': [{'name': 'Large', 'price': 20}],
+        'piece_options': [{'quantity': 2, 'price': 90}]
+    })
+    assert response.status_code == 201
+
+
+@pytest.mark.parametrize('options, expected', [
+    # category lookup, item insert, change log insert, then the menu
+    # version bump: version read and upsert
+    ({}, 5),
+    # plus one insert per option row; SQLite cannot batch inserts that return ids
+    ({'extras': [{'name': 'Cheese', 'price': 5}, {'name': 'Egg', 'price': 8}],
+      'sizes': [{'name': 'Large', 'price': 20}]}, 8),
+])
+def test_create_menu_item_statement_count(client, warm_token, menu, count_statements, options, expected):
+    with count_statements() as statements:
+        response = client.post('/api/admin/menu-items', headers=warm_token, json={
+            'name': 'Double Burger', 'description': 'Two patties', 'price': 80, 'category': 'burgers', **options
+        })
+    assert response.status_code == 201
+    assert len(statements) == expected, statements
+
+
+def test_create_menu_item_rejects_unknown_category(client, warm_token, menu):
+    response = client.post('/api/admin/menu-items', headers=warm_token, json={
+        'name': 'Wrap', 'description': 'd', 'price': 40, 'category': 'wraps'
+    })
+    assert response.status_code == 400
+
+
+def test_category_rename_statement_count(client, warm_token, menu, count_statements):
+    url = f"/api/admin/categories/{menu['sides'].id}"
+    with count_statements() as statements:
+        response = client.put(url, headers=warm_token, json={'name': 'Extras'})
+    assert response.status_code == 200
+    # category load, name check, update, its item ids, change log insert,
+    # version read and upsert, reload after commit
+    assert len(statements) == 8, statements
+
+
+def test_update_menu_item_statement_count(client, warm_token, menu, count_statements):
+    url = f"/api/admin/menu-items/{menu['burger'].id}"
+    with count_statements() as statements:
+        response = client.put(url, headers=warm_token, json={'name': 'Cheese Burger Deluxe', 'price': 60})
+    assert response.status_code == 200
+    # item with its options (4), update, change log insert, version read
+    # and upsert, reload after commit (4), stock index
+    assert len(statements) == 13, statements
+
+
+def test_stock_toggle_statement_count(client, warm_token, menu, count_statements):
+    url = f"/api/admin/stock/menu_item/{menu['burger'].id}"
+    with count_statements() as statements:
+        response = client.put(url, headers=warm_token, json={'is_available': False})
+    assert response.status_code == 200
+    # existence check, upsert, invalidation marker, reload of the row
+    assert len(statements) == 4, statements
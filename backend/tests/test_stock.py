@@ -0,0 +1,166 @@
+"""Sold-out flags, counted stock and their reservation at checkout."""
+import app as kiosk
+from app import db, Order, SharedVersion, StockLevel
+
+
+def burger_line(menu, quantity=1, extras=()):
+    return {'id': menu['burger'].id, 'name': 'Cheese Burger', 'quantity': quantity,
+            'selectedExtras': [{'name': name} for name in extras]}
+
+
+def checkout(client, items, payment_intent):
+    return client.post('/api/complete-order', json={
+        'items': items, 'amount': 0, 'paymentIntent': payment_intent
+    })
+
+
+def set_stock(client, auth, entity, entity_id, **values):
+    response = client.put(f'/api/admin/stock/{entity}/{entity_id}', headers=auth, json=values)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_counted_item_is_decremented_until_sold_out(client, auth, menu):
+    set_stock(client, auth, 'menu_item', menu['burger'].id, remaining=3)
+
+    assert checkout(client, [burger_line(menu, 2)], 'pi_1').status_code == 200
+    assert db.session.get(StockLevel, ('menu_item', menu['burger'].id)).remaining == 1
+
+    response = checkout(client, [burger_line(menu, 2)], 'pi_2')
+    assert response.status_code == 409
+    assert response.get_json()['error'] == 'Only 1 Cheese Burger left'
+
+    assert checkout(client, [burger_line(menu, 1)], 'pi_3').status_code == 200
+    assert checkout(client, [burger_line(menu, 1)], 'pi_4').status_code == 409
+    assert Order.query.count() == 2
+
+
+def test_sold_out_extra_is_refused_before_payment(client, auth, menu):
+    bacon = next(e for e in menu['burger'].extras if e.name == 'Bacon')
+    set_stock(client, auth, 'extra', bacon.id, is_available=False)
+
+    response = client.post('/api/price-order', json={'items': [burger_line(menu, extras=['Bacon'])]})
+    assert response.status_code == 400 and response.get_json()['error'] == 'Bacon is sold out'
+    response = client.post('/api/create-payment-intent', json={'items': [burger_line(menu, extras=['Bacon'])]})
+    assert response.status_code == 409
+    assert client.post('/api/price-order', json={'items': [burger_line(menu, extras=['Egg'])]}).status_code == 200
+
+
+def test_checkout_reads_stock_the_index_has_not_seen(client, menu):
+    # Another worker switched the item to counted stock; this worker's index
+    # still says it is untracked
+    kiosk.get_stock_index()
+    db.session.add(StockLevel(entity='menu_item', entity_id=menu['burger'].id, is_available=True, remaining=1))
+    db.session.commit()
+
+    assert checkout(client, [burger_line(menu, 1)], 'pi_1').status_code == 200
+    assert checkout(client, [burger_line(menu, 1)], 'pi_2').status_code == 409
+
+
+def test_checkout_honours_a_sold_out_flag_the_index_has_not_seen(client, menu):
+    kiosk.get_stock_index()
+    db.session.add(StockLevel(entity='menu_item', entity_id=menu['burger'].id, is_available=False))
+    db.session.commit()
+
+    response = checkout(client, [burger_line(menu, 1)], 'pi_1')
+    assert response.status_code == 409
+    assert Order.query.count() == 0
+
+
+def test_refused_checkout_can_be_retried_with_the_same_key(client, auth, menu):
+    set_stock(client, auth, 'menu_item', menu['burger'].id, is_available=False)
+    assert checkout(client, [burger_line(menu, 1)], 'pi_1').status_code == 409
+    set_stock(client, auth, 'menu_item', menu['burger'].id, is_available=True)
+    assert checkout(client, [burger_line(menu, 1)], 'pi_1').status_code == 200
+
+
+def test_overlay_lists_sold_out_and_counted_entries(client, auth, menu):
+    set_stock(client, auth, 'menu_item', menu['chips'].id, is_available=False)
+    set_stock(client, auth, 'menu_item', menu['burger'].id, remaining=4)
+
+    response = client.get('/api/menu/stock')
+    overlay = response.get_json()
+    assert overlay['menu_item'] == {'sold_out': [menu['chips'].id], 'remaining': {str(menu['burger'].id): 4}}
+    assert client.get('/api/menu/stock', headers={'If-None-Match': response.headers['ETag']}).status_code == 304
+
+    assert client.delete(f"/api/admin/stock/menu_item/{menu['chips'].id}", headers=auth).status_code == 204
+    assert client.get('/api/menu/stock').get_json()['menu_item']['sold_out'] == []
+
+
+def test_stock_updates_are_validated(client, auth, menu):
+    assert client.put('/api/admin/stock/combo/1', headers=auth, json={'is_available': False}).status_code == 404
+    assert client.put('/api/admin/stock/menu_item/999', headers=auth, json={'is_available': False}).status_code == 404
+    url = f"/api/admin/stock/menu_item/{menu['burger'].id}"
+    assert client.put(url, headers=auth, json={'remaining': -1}).status_code == 400
+    assert client.put(url, headers=auth, json={'is_available': 'no'}).status_code == 400
+    assert client.put(url, headers=auth, json={}).status_code == 400
+
+
+def test_invalidation_from_another_worker_survives_cache_eviction(client, menu):
+    def poll():
+        kiosk.invalidation_state['checked_at'] = 0.0
+        assert client.get('/api/categories').status_code == 200
+
+    poll()
+    kiosk.get_stock_index()
+    # Another worker changed stock and broadcast it; then the cache was pruned
+    with db.engine.begin() as connection:
+        kiosk.write_shared_versions(connection, {'invalidate:stock_levels': 1})
+    kiosk.cache.clear()
+
+    poll()
+    assert kiosk.stock_index['loaded_at'] is None
+
+
+def set_status(client, auth, order_number, status):
+    return client.put(f'/api/admin/orders/{order_number}/status', headers=auth, json={'status': status})
+
+
+def remaining(entity, entity_id):
+    db.session.expire_all()
+    return db.session.get(StockLevel, (entity, entity_id)).remaining
+
+
+def test_cancelling_an_order_gives_its_stock_back(client, auth, menu):
+    burger = menu['burger']
+    bacon = next(e for e in burger.extras if e.name == 'Bacon')
+    set_stock(client, auth, 'menu_item', burger.id, remaining=3)
+    set_stock(client, auth, 'extra', bacon.id, remaining=5)
+    set_stock(client, auth, 'menu_item', menu['chips'].id, is_available=True)  # not counted
+    order_number = checkout(client, [burger_line(menu, 2, extras=['Bacon'])], 'pi_1').get_json()['order_number']
+    assert (remaining('menu_item', burger.id), remaining('extra', bacon.id)) == (1, 3)
+
+    kiosk.get_stock_index()
+    marker = db.session.get(SharedVersion, 'invalidate:stock_levels')
+    before = marker.version if marker else None
+    assert set_status(client, auth, order_number, 'cancelled').status_code == 200
+    assert (remaining('menu_item', burger.id), remaining('extra', bacon.id)) == (3, 5)
+    assert remaining('menu_item', menu['chips'].id) is None
+    # Every worker is told, since theirs may still say the burger is short
+    assert db.session.get(SharedVersion, 'invalidate:stock_levels').version != before
+    assert kiosk.stock_index['loaded_at'] is None
+
+    # Cancelling twice gives nothing more back
+    assert set_status(client, auth, order_number, 'cancelled').status_code == 200
+    assert remaining('menu_item', burger.id) == 3
+    assert checkout(client, [burger_line(menu, 3)], 'pi_2').status_code == 200
+
+
+def test_reopening_a_cancelled_order_takes_its_stock_again(client, auth, menu):
+    burger = menu['burger']
+    set_stock(client, auth, 'menu_item', burger.id, remaining=2)
+    first = checkout(client, [burger_line(menu, 2)], 'pi_1').get_json()['order_number']
+    set_status(client, auth, first, 'cancelled')
+
+    assert set_status(client, auth, first, 'completed').status_code == 200
+    assert remaining('menu_item', burger.id) == 0
+
+    # Once the stock has gone to another order the cancelled one cannot come back
+    set_status(client, auth, first, 'cancelled')
+    second = checkout(client, [burger_line(menu, 1)], 'pi_2').get_json()['order_number']
+    response = set_status(client, auth, first, 'completed')
+    assert response.status_code == 409
+    assert response.get_json()['error'] == 'Cheese Burger is sold out'
+    assert Order.query.filter_by(order_number=first).one().status == 'cancelled'
+    assert remaining('menu_item', burger.id) == 1
+    assert Order.query.filter_by(order_number=second).one().status == 'completed'
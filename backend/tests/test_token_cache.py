@@ -0,0 +1,95 @@
+"""The verified admin token cache: expiry, revocation and its counters."""
+import os
+import time
+
+import jwt
+import pytest
+
+import app as kiosk
+from app import db
+
+
+def stats(client, auth):
+    return client.get('/api/admin/cache-stats', headers=auth).get_json()['token_cache']
+
+
+def stock(client, auth):
+    return client.get('/api/admin/stock', headers=auth).status_code
+
+
+def poll_now():
+    kiosk.invalidation_state['checked_at'] = 0.0
+
+
+def test_repeat_requests_are_served_from_the_cache(client, auth, count_statements):
+    assert stock(client, auth) == 200
+    with count_statements() as statements:
+        assert stock(client, auth) == 200
+    # Only the stock query itself; no admin lookup
+    assert len(statements) == 1, statements
+    assert stats(client, auth) == {'hits': 2, 'misses': 1, 'evictions': 0, 'revocations': 0, 'size': 1}
+
+
+def test_entry_expires_after_the_ttl(client, auth, monkeypatch):
+    monkeypatch.setattr(kiosk, 'TOKEN_CACHE_TTL_SECONDS', 0.05)
+    stock(client, auth)
+    time.sleep(0.1)
+    stock(client, auth)
+    assert stats(client, auth)['misses'] == 2
+
+
+def test_entry_never_outlives_the_token(client, auth):
+    stock(client, auth)
+    token = auth['Authorization'].split(' ')[1]
+    _, expires_at = kiosk.token_cache[token]
+    assert expires_at <= time.time() + kiosk.TOKEN_CACHE_TTL_SECONDS
+
+
+def test_cache_is_bounded(client, admin, monkeypatch):
+    monkeypatch.setattr(kiosk, 'TOKEN_CACHE_SIZE', 2)
+    for i in range(3):
+        token = jwt.encode({'admin_id': admin.id, 'pwd': kiosk.password_fingerprint(admin),
+                            'exp': int(time.time()) + 3600 + i}, os.environ['JWT_SECRET_KEY'], algorithm='HS256')
+        kiosk.verify_admin_token(token)
+    assert len(kiosk.token_cache) == 2
+    assert kiosk.token_cache_stats['evictions'] == 1
+
+
+@pytest.mark.parametrize('change', ['password', 'delete'])
+def test_cached_token_is_revoked(client, auth, admin, change):
+    assert stock(client, auth) == 200
+    if change == 'password':
+        admin.password = kiosk.generate_password_hash('changed')
+    else:
+        db.session.delete(admin)
+    db.session.commit()
+
+    assert kiosk.token_cache == {}
+    assert kiosk.token_cache_stats['revocations'] == 1
+    assert stock(client, auth) == 401
+
+
+def test_revocation_reaches_other_workers(client, auth, admin):
+    stock(client, auth)
+    poll_now()
+    stock(client, auth)  # records the current marker
+
+    # Another worker changes a password: its commit moves the shared marker
+    with db.engine.begin() as connection:
+        kiosk.write_shared_versions(connection, {'invalidate:admin_tokens': 12345})
+    assert stock(client, auth) == 200  # not polled yet, still cached
+    poll_now()
+    stock(client, auth)
+    assert kiosk.token_cache_stats['revocations'] == 1
+    assert kiosk.token_cache_stats['misses'] == 2
+
+
+def test_password_change_moves_the_shared_marker(client, auth, admin):
+    stock(client, auth)
+    with db.engine.connect() as connection:
+        before = kiosk.read_shared_versions(connection, ['invalidate:admin_tokens'])
+    admin.password = kiosk.generate_password_hash('changed')
+    db.session.commit()
+    with db.engine.connect() as connection:
+        after = kiosk.read_shared_versions(connection, ['invalidate:admin_tokens'])
+    assert after and after != before
@@ -0,0 +1,3 @@
+from app import configure_app
+
+app = configure_app()
@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { useDispatch } from 'react-redux';
 import { addToCart } from '../redux/slices/cartSlice';
 import { motion, AnimatePresence } from 'framer-motion';
+import { getCategoryItems } from '../services/menu';
 
 const Breakfasts = () => {
   const dispatch = useDispatch();
@@ -17,11 +18,7 @@ const Breakfasts = () => {
 
   const fetchBreakfasts = async () => {
     try {
-      const response = await fetch('http://localhost:5000/api/menu-items');
-      if (!response.ok) throw new Error('Failed to fetch breakfasts');
-      const data = await response.json();
-      // Filter only breakfast category items
-      const breakfastItems = data.filter(item => item.category.toLowerCase() === 'breakfast');
+      const breakfastItems = await getCategoryItems('breakfast');
       setBreakfasts(breakfastItems);
     } catch (error) {
       setError(error.message);
@@ -165,7 +162,7 @@ const Breakfasts = () => {
                             onChange={() => selectSize(breakfast.id, size)}
                             className="form-radio text-yellow-500"
                           />
-                          <span>{size.name} (R{size.price.toFixed(2)})</span>
+                          <span>{size.name} (+R{size.price.toFixed(2)})</span>
                         </label>
                       ))}
                     </div>
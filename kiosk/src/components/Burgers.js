@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { useDispatch } from 'react-redux';
 import { addToCart } from '../redux/slices/cartSlice';
 import { motion, AnimatePresence } from 'framer-motion';
+import { getCategoryItems } from '../services/menu';
 
 const Burgers = () => {
   const dispatch = useDispatch();
@@ -19,12 +20,7 @@ const Burgers = () => {
   const fetchBurgers = async () => {
     try {
       console.log('Fetching burgers...');
-      const response = await fetch('http://localhost:5000/api/menu-items');
-      if (!response.ok) throw new Error('Failed to fetch burgers');
-      const data = await response.json();
-      console.log('All menu items:', data);
-      // Filter only burger category items
-      const burgerItems = data.filter(item => item.category.toLowerCase() === 'burgers');
+      const burgerItems = await getCategoryItems('burgers');
       console.log('Filtered burger items:', burgerItems);
       setBurgers(burgerItems);
     } catch (error) {
@@ -170,7 +166,7 @@ const Burgers = () => {
                             onChange={() => selectSize(burger.id, size)}
                             className="form-radio text-yellow-500"
                           />
-                          <span>{size.name} (R{size.price.toFixed(2)})</span>
+                          <span>{size.name} (+R{size.price.toFixed(2)})</span>
                         </label>
                       ))}
                     </div>
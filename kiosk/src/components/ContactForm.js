@@ -10,14 +10,15 @@ const ContactForm = () => {
   const location = useLocation();
   const dispatch = useDispatch();
   const cartItems = useSelector((state) => state.cart.items);
-  const totalAmount = useSelector((state) => state.cart.total);
+  const cartTotal = useSelector((state) => state.cart.total);
   const [email, setEmail] = useState('');
   const [phone, setPhone] = useState('');
   const [isSubmitting, setIsSubmitting] = useState(false);
   const [error, setError] = useState('');
   
-  // Get payment intent from location state
+  // Get payment intent and the amount actually charged from location state
   const paymentIntent = location.state?.paymentIntent;
+  const totalAmount = location.state?.amount ?? cartTotal;
 
   const handleSubmit = async (e) => {
     e.preventDefault();
@@ -49,6 +50,7 @@ const ContactForm = () => {
         email: email || '',
         phone: phone || '',
         items: cartItems.map(item => ({
+          id: item.id,
           name: item.name,
           quantity: item.quantity,
           price: item.price,
@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { useDispatch } from 'react-redux';
 import { addToCart } from '../redux/slices/cartSlice';
 import { motion, AnimatePresence } from 'framer-motion';
+import { getCategoryItems } from '../services/menu';
 
 const Drinks = () => {
   const dispatch = useDispatch();
@@ -16,10 +17,7 @@ const Drinks = () => {
 
   const fetchDrinks = async () => {
     try {
-      const response = await fetch('http://localhost:5000/api/menu-items');
-      if (!response.ok) throw new Error('Failed to fetch drinks');
-      const data = await response.json();
-      const drinkItems = data.filter(item => item.category.toLowerCase() === 'drinks');
+      const drinkItems = await getCategoryItems('drinks');
       // console.log('Filtered drink items:', drinkItems);
       setDrinks(drinkItems);
     } catch (error) {
@@ -33,17 +31,20 @@ const Drinks = () => {
     const size = selectedOption[drink.id] || 'Regular';
     const selectedSizeObj = drink.sizes.find(s => s.name === size) || drink.sizes[0];
     const basePrice = parseFloat(drink.price);
-    const totalPrice = parseFloat(selectedSizeObj.price);
+    // Size prices are surcharges on the base price, as the server prices them
+    const sizePrice = selectedSizeObj ? parseFloat(selectedSizeObj.price) : 0;
+    const totalPrice = basePrice + sizePrice;
 
     const cartItem = {
       ...drink,
-      selectedSize: { 
-        name: size, 
-        price: totalPrice - basePrice // Price difference from base price
-      },
+      selectedSize: selectedSizeObj ? {
+        id: selectedSizeObj.id,
+        name: selectedSizeObj.name,
+        price: sizePrice
+      } : null,
       price: basePrice,
       totalPrice: totalPrice,
-      sizeText: `${size} (+R${(totalPrice - basePrice).toFixed(2)})`,
+      sizeText: selectedSizeObj ? `${selectedSizeObj.name} (+R${sizePrice.toFixed(2)})` : '',
       itemTotal: totalPrice
     };
 
@@ -113,7 +114,7 @@ const Drinks = () => {
                   >
                     {drink.sizes.map(size => (
                       <option key={size.name} value={size.name}>
-                        {size.name} (R{parseFloat(size.price).toFixed(2)})
+                        {size.name} (+R{parseFloat(size.price).toFixed(2)})
                       </option>
                     ))}
                   </select>
@@ -121,9 +122,9 @@ const Drinks = () => {
 
                 <div className="mt-4">
                   <div className="text-lg font-bold mb-2">
-                    Total: R{parseFloat(drink.sizes.find(s => 
+                    Total: R{(parseFloat(drink.price) + parseFloat(drink.sizes.find(s => 
                       s.name === (selectedOption[drink.id] || 'Regular')
-                    )?.price || drink.price).toFixed(2)}
+                    )?.price || 0)).toFixed(2)}
                   </div>
                   <motion.button
                     whileHover={{ scale: 1.05 }}
@@ -5,6 +5,7 @@ import { AnimatePresence } from 'framer-motion';
 import { useQuery } from 'react-query';
 import { addToCart } from '../redux/slices/cartSlice';
 import MenuItemCard from './MenuItemCard';
+import { getCategoryItems } from '../services/menu';
 
 const DynamicCategory = () => {
   const { categoryId } = useParams();
@@ -18,9 +19,7 @@ const DynamicCategory = () => {
     ['menuItems', category?.name],
     async () => {
       if (!category) return [];
-      const response = await fetch(`http://localhost:5000/api/menu-items?category=${encodeURIComponent(category.name)}`);
-      if (!response.ok) throw new Error('Failed to fetch items');
-      return response.json();
+      return getCategoryItems(category.name);
     }, 
     {
       enabled: !!category,
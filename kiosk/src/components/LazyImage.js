@@ -1,6 +1,14 @@
 import React, { useState, useEffect } from 'react';
 
-const LazyImage = ({ src, alt, className, fallbackSrc }) => {
+// Widths the backend image proxy renders; the browser picks one from srcset
+const VARIANT_WIDTHS = [160, 320, 480, 640, 960];
+const DEFAULT_SIZES = '(min-width: 1024px) 33vw, (min-width: 640px) 50vw, 100vw';
+
+const variantSrcSet = (src) => (src && src.includes('/api/images/')
+  ? VARIANT_WIDTHS.map(width => `${src}?w=${width} ${width}w`).join(', ')
+  : undefined);
+
+const LazyImage = ({ src, alt, className, fallbackSrc, sizes = DEFAULT_SIZES }) => {
   const [error, setError] = useState(false);
   const [loaded, setLoaded] = useState(false);
   const [imageSrc, setImageSrc] = useState(null);
@@ -11,8 +19,13 @@ const LazyImage = ({ src, alt, className, fallbackSrc }) => {
     setLoaded(false);
     setImageSrc(null);
 
-    // Create a new image object
+    // Create a new image object; with a srcset it preloads the variant the <img> will use
     const img = new Image();
+    const srcSet = variantSrcSet(src);
+    if (srcSet) {
+      img.sizes = sizes;
+      img.srcset = srcSet;
+    }
     img.src = src;
 
     // Preload the image
@@ -32,7 +45,7 @@ const LazyImage = ({ src, alt, className, fallbackSrc }) => {
       img.onload = null;
       img.onerror = null;
     };
-  }, [src, fallbackSrc]);
+  }, [src, fallbackSrc, sizes]);
 
   return (
     <div className={`relative ${className}`}>
@@ -47,6 +60,8 @@ const LazyImage = ({ src, alt, className, fallbackSrc }) => {
       {imageSrc && (
         <img
           src={imageSrc}
+          srcSet={imageSrc === src ? variantSrcSet(src) : undefined}
+          sizes={sizes}
           alt={alt}
           className={`w-full h-full object-cover transition-opacity duration-300 ${
             loaded ? 'opacity-100' : 'opacity-0'
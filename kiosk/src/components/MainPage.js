@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { Link } from 'react-router-dom';
 import { motion } from 'framer-motion';
 import { images } from '../constant/images';
+import { loadMenu, resolveImage } from '../services/menu';
 
 const MainPage = () => {
   const [currentTime, setCurrentTime] = useState(new Date());
@@ -23,11 +24,8 @@ const MainPage = () => {
   useEffect(() => {
     const fetchCategories = async () => {
       try {
-        const response = await fetch('http://localhost:5000/api/categories');
-        if (!response.ok) {
-          throw new Error('Failed to fetch categories');
-        }
-        const data = await response.json();
+        // One request syncs the whole menu, so category pages need none of their own
+        const { categories: data } = await loadMenu({ refresh: true });
 
         // Map default images to categories
         const categoriesWithImages = data.map(category => {
@@ -51,7 +49,7 @@ const MainPage = () => {
               path = '/breakfast';
               break;
             default:
-              image = category.image_url || images.default;
+              image = resolveImage(category.image_url) || images.default;
               path = `/category/${category.id}`;
           }
 
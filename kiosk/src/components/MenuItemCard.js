@@ -35,8 +35,9 @@ const MenuItemCard = ({ item, onAddToCart }) => {
       const selectedPieceOption = item.piece_options.find(opt => opt.id.toString() === selectedOption);
       totalPrice = parseFloat(selectedPieceOption?.price || item.price);
     } else if (item.sizes?.length > 0 && selectedOption) {
+      // Size prices are surcharges on the base price, as the server prices them
       const selectedSize = item.sizes.find(s => s.name === selectedOption);
-      totalPrice = parseFloat(selectedSize?.price || item.price);
+      totalPrice += parseFloat(selectedSize?.price || 0);
     }
 
     const extrasTotal = selectedExtras.reduce((sum, extra) => 
@@ -65,11 +66,12 @@ const MenuItemCard = ({ item, onAddToCart }) => {
       const selectedSize = item.sizes.find(s => s.name === selectedOption);
       cartItem = {
         ...cartItem,
-        selectedSize: {
-          name: selectedOption,
-          price: parseFloat(selectedSize?.price || item.price) - parseFloat(item.price)
-        },
-        sizeText: selectedSize ? `${selectedSize.name} (+R${(parseFloat(selectedSize.price) - parseFloat(item.price)).toFixed(2)})` : ''
+        selectedSize: selectedSize ? {
+          id: selectedSize.id,
+          name: selectedSize.name,
+          price: parseFloat(selectedSize.price)
+        } : null,
+        sizeText: selectedSize ? `${selectedSize.name} (+R${parseFloat(selectedSize.price).toFixed(2)})` : ''
       };
     }
 
@@ -123,7 +125,7 @@ const MenuItemCard = ({ item, onAddToCart }) => {
                 ) : (
                   item.sizes?.map(size => (
                     <option key={size.name} value={size.name}>
-                      {size.name} (R{parseFloat(size.price).toFixed(2)})
+                      {size.name} (+R{parseFloat(size.price).toFixed(2)})
                     </option>
                   ))
                 )}
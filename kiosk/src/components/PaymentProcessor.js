@@ -86,6 +86,7 @@ const CheckoutForm = ({ amount, clientSecret }) => {
 
 const PaymentProcessor = () => {
   const [clientSecret, setClientSecret] = useState('');
+  const [amount, setAmount] = useState(null);
   const [error, setError] = useState(null);
   const cart = useSelector((state) => state.cart);
   const cartTotal = cart.total;
@@ -96,7 +97,9 @@ const PaymentProcessor = () => {
         if (!cartTotal) {
           throw new Error('Cart total is required');
         }
-        const response = await createPaymentIntent(cartTotal);
+        const response = await createPaymentIntent(cartTotal, cart.items);
+        // The server prices the cart itself; show and pass on what it charges
+        setAmount(response.amount);
         setClientSecret(response.clientSecret);
       } catch (err) {
         setError(err.message);
@@ -104,7 +107,7 @@ const PaymentProcessor = () => {
     };
 
     initializePayment();
-  }, [cartTotal]);
+  }, [cartTotal, cart.items]);
 
   if (error) {
     return (
@@ -140,12 +143,17 @@ const PaymentProcessor = () => {
         <div className="mb-6">
           <h3 className="text-lg font-semibold text-gray-700">Order Summary</h3>
           <motion.p className="text-xl font-bold text-gray-900 mt-2">
-            Total: R{cartTotal.toFixed(2)}
+            Total: R{amount.toFixed(2)}
           </motion.p>
+          {Math.abs(amount - cartTotal) >= 0.01 && (
+            <p className="text-sm text-gray-600 mt-1">
+              Menu prices have changed since you added these items.
+            </p>
+          )}
         </div>
 
         <Elements stripe={stripePromise} options={options}>
-          <CheckoutForm amount={cartTotal} clientSecret={clientSecret} />
+          <CheckoutForm amount={amount} clientSecret={clientSecret} />
         </Elements>
       </div>
     </div>
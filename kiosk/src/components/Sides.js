@@ -2,6 +2,7 @@ import React, { useState, useEffect } from 'react';
 import { useDispatch } from 'react-redux';
 import { addToCart } from '../redux/slices/cartSlice';
 import { motion, AnimatePresence } from 'framer-motion';
+import { getCategoryItems } from '../services/menu';
 
 const Sides = () => {
   const dispatch = useDispatch();
@@ -17,10 +18,7 @@ const Sides = () => {
  
   const fetchSides = async () => {
     try {
-      const response = await fetch('http://localhost:5000/api/menu-items');
-      if (!response.ok) throw new Error('Failed to fetch sides');
-      const data = await response.json();
-      const sideItems = data.filter(item => item.category.toLowerCase() === 'sides');
+      const sideItems = await getCategoryItems('sides');
       setSides(sideItems);
       const initialExtras = {};
       sideItems.forEach(side => {
@@ -74,8 +72,9 @@ const Sides = () => {
       const optionDetails = side.piece_options.find(opt => opt.id.toString() === selectedValue);
       basePrice = optionDetails ? parseFloat(optionDetails.price) : parseFloat(side.price);
     } else {
+      // Size prices are surcharges on the base price, as the server prices them
       const selectedSizeObj = side.sizes.find(s => s.name === selectedValue) || side.sizes[0];
-      basePrice = selectedSizeObj ? parseFloat(selectedSizeObj.price) : parseFloat(side.price);
+      basePrice = parseFloat(side.price) + (selectedSizeObj ? parseFloat(selectedSizeObj.price) : 0);
     }
 
     const extrasTotal = (selectedExtras[side.id] || []).reduce((sum, extra) => 
@@ -88,6 +87,7 @@ const Sides = () => {
   const handleAddToCart = (side) => {
     const selectedValue = selectedOption[side.id] || getDefaultOption(side);
     let optionDetails;
+    let selectedSizeObj = null;
     let sizeText;
     let basePrice = side.price;
     let totalPrice;
@@ -98,20 +98,21 @@ const Sides = () => {
       totalPrice = parseFloat(optionDetails.price);
       sizeText = `${optionDetails.quantity} pieces`;
     } else {
-      const selectedSizeObj = side.sizes.find(s => s.name === selectedValue) || side.sizes[0];
+      selectedSizeObj = side.sizes.find(s => s.name === selectedValue) || side.sizes[0];
       basePrice = parseFloat(side.price);
-      totalPrice = parseFloat(selectedSizeObj.price);
-      sizeText = `${selectedSizeObj.name} (+R${(totalPrice - basePrice).toFixed(2)})`;
+      totalPrice = basePrice + (selectedSizeObj ? parseFloat(selectedSizeObj.price) : 0);
+      sizeText = selectedSizeObj ? `${selectedSizeObj.name} (+R${parseFloat(selectedSizeObj.price).toFixed(2)})` : '';
     }
 
     const cartItem = {
       ...side,
       selectedOption: side.piece_options?.length > 0 ? selectedValue : null,
       selectedExtras: selectedExtras[side.id] || [],
-      selectedSize: side.piece_options?.length > 0 ? null : {
-        name: selectedValue,
-        price: totalPrice - basePrice
-      },
+      selectedSize: selectedSizeObj ? {
+        id: selectedSizeObj.id,
+        name: selectedSizeObj.name,
+        price: parseFloat(selectedSizeObj.price)
+      } : null,
       price: basePrice,
       totalPrice: totalPrice + (selectedExtras[side.id] || []).reduce((sum, extra) => 
         sum + parseFloat(extra.price), 0
@@ -170,7 +171,7 @@ const Sides = () => {
                   {side.piece_options?.length > 0 ? (
                     `From R${Math.min(...side.piece_options.map(opt => opt.price)).toFixed(2)}`
                   ) : (
-                    `From R${parseFloat(side.sizes[0]?.price || side.price).toFixed(2)}`
+                    `From R${(parseFloat(side.price) + (side.sizes?.length > 0 ? Math.min(...side.sizes.map(size => parseFloat(size.price))) : 0)).toFixed(2)}`
                   )}
                 </div>
               </div>
@@ -200,7 +201,7 @@ const Sides = () => {
                     ) : (
                       side.sizes.map(size => (
                         <option key={size.name} value={size.name}>
-                          {size.name} (R{parseFloat(size.price).toFixed(2)})
+                          {size.name} (+R{parseFloat(size.price).toFixed(2)})
                         </option>
                       ))
                     )}
@@ -340,6 +340,36 @@ const MenuItems = () => {
     }
   };
 
+  // 86 an item or bring it back; only the stock row changes, not the menu
+  const handleToggleStock = async (item) => {
+    setError(null);
+    try {
+      const response = await fetch(`http://localhost:5000/api/admin/stock/menu_item/${item.id}`, {
+        method: 'PUT',
+        headers: {
+          'Content-Type': 'application/json',
+          'Authorization': `Bearer ${localStorage.getItem('adminToken')}`
+        },
+        body: JSON.stringify(isSoldOut(item) ? { is_available: true, remaining: null } : { is_available: false })
+      });
+
+      if (!response.ok) {
+        throw new Error('Failed to update stock');
+      }
+
+      const stock = await response.json();
+      setItems(items => items.map(i => (i.id === item.id
+        ? { ...i, stock: { is_available: stock.is_available, remaining: stock.remaining } }
+        : i)));
+    } catch (error) {
+      setError(error.message);
+      console.error('Error updating stock:', error);
+    }
+  };
+
+  const isSoldOut = (item) => item.stock
+    && (!item.stock.is_available || item.stock.remaining === 0);
+
   const sortItems = (items) => {
     return [...items].sort((a, b) => {
       let compareA = a[sortBy];
@@ -536,7 +566,7 @@ const MenuItems = () => {
                   </select>
                   <input
                     type="number"
-                    placeholder="Price"
+                    placeholder="+ Price"
                     value={sizeInput.price}
                     onChange={(e) => setSizeInput({ ...sizeInput, price: e.target.value })}
                     className="p-2 border rounded w-24"
@@ -802,6 +832,11 @@ const MenuItems = () => {
                 <p className={`${item.is_available ? 'text-green-500' : 'text-red-500'} font-medium`}>
                   {item.is_available ? '✓ Available' : '✗ Not Available'}
                 </p>
+                {isSoldOut(item) ? (
+                  <p className="text-red-500 font-medium">Sold out</p>
+                ) : item.stock?.remaining != null && (
+                  <p className="text-gray-600">{item.stock.remaining} left</p>
+                )}
                 <div className="mt-2 space-x-2">
                   <button
                     onClick={() => handleEdit(item)}
@@ -815,6 +850,12 @@ const MenuItems = () => {
                   >
                     Delete
                   </button>
+                  <button
+                    onClick={() => handleToggleStock(item)}
+                    className="bg-gray-600 text-white px-3 py-1 rounded hover:bg-gray-700 transition-colors"
+                  >
+                    {isSoldOut(item) ? 'Back in stock' : 'Sold out'}
+                  </button>
                 </div>
               </motion.div>
             ))}
@@ -7,16 +7,36 @@ const Orders = () => {
   const [error, setError] = useState('');
   const [expandedOrder, setExpandedOrder] = useState(null);
 
+  const [nextCursor, setNextCursor] = useState(null);
+  const [isLoadingMore, setIsLoadingMore] = useState(false);
+
+  const fetchOrderPage = async (cursor) => {
+    const url = cursor
+      ? `http://localhost:5000/api/admin/orders?cursor=${encodeURIComponent(cursor)}`
+      : 'http://localhost:5000/api/admin/orders';
+    const response = await fetch(url, {
+      headers: {
+        'Authorization': `Bearer ${localStorage.getItem('adminToken')}`,
+      },
+    });
+    const data = await response.json();
+    if (!response.ok) throw new Error(data.error);
+    return { data, cursor: response.headers.get('X-Next-Cursor') };
+  };
+
   const fetchOrders = async () => {
     try {
-      const response = await fetch('http://localhost:5000/api/admin/orders', {
-        headers: {
-          'Authorization': `Bearer ${localStorage.getItem('adminToken')}`,
-        },
+      const { data, cursor } = await fetchOrderPage();
+      // Refresh the newest page but keep any older pages already loaded
+      setOrders((prev) => {
+        const freshIds = new Set(data.map((order) => order.id));
+        const oldest = data.length ? data[data.length - 1].created_at : null;
+        const older = prev.filter(
+          (order) => !freshIds.has(order.id) && oldest && order.created_at < oldest
+        );
+        if (older.length === 0) setNextCursor(cursor);
+        return [...data, ...older];
       });
-      const data = await response.json();
-      if (!response.ok) throw new Error(data.error);
-      setOrders(data);
     } catch (err) {
       setError(err.message);
     } finally {
@@ -24,11 +44,82 @@ const Orders = () => {
     }
   };
 
+  const loadMoreOrders = async () => {
+    if (!nextCursor) return;
+    setIsLoadingMore(true);
+    try {
+      const { data, cursor } = await fetchOrderPage(nextCursor);
+      setOrders((prev) => [...prev, ...data]);
+      setNextCursor(cursor);
+    } catch (err) {
+      setError(err.message);
+    } finally {
+      setIsLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchOrders();
-    // Set up polling for new orders
-    const interval = setInterval(fetchOrders, 30000); // Poll every 30 seconds
-    return () => clearInterval(interval);
+    // Live feed of new orders and status changes. EventSource cannot send the
+    // admin token, so the stream is opened with a short-lived ticket instead
+    // of putting the token in the URL; a refused or ended stream is reopened
+    // with a fresh ticket from the last event id it saw
+    let stream = null;
+    let retryTimer = null;
+    let lastEventId = null;
+    let unmounted = false;
+
+    const onEvent = (handler) => (event) => {
+      lastEventId = event.lastEventId || lastEventId;
+      handler(JSON.parse(event.data));
+    };
+
+    const reopen = () => {
+      if (stream) stream.close();
+      if (!unmounted) retryTimer = setTimeout(openStream, 5000);
+    };
+
+    const openStream = async () => {
+      try {
+        const response = await fetch('http://localhost:5000/api/admin/orders/stream-ticket', {
+          method: 'POST',
+          headers: { 'Authorization': `Bearer ${localStorage.getItem('adminToken')}` },
+        });
+        if (response.status === 401) return; // signed out; the feed stays closed
+        if (!response.ok) throw new Error('Failed to open the order feed');
+        const { ticket } = await response.json();
+        if (unmounted) return;
+
+        const params = new URLSearchParams({ ticket });
+        if (lastEventId) params.set('last_event_id', lastEventId);
+        stream = new EventSource(`http://localhost:5000/api/admin/orders/stream?${params}`);
+        stream.addEventListener('order.created', onEvent((order) => {
+          setOrders((prev) =>
+            prev.some((o) => o.id === order.id) ? prev : [order, ...prev]
+          );
+        }));
+        stream.addEventListener('order.status_changed', onEvent(({ order_number, status }) => {
+          setOrders((prev) =>
+            prev.map((o) => (o.order_number === order_number ? { ...o, status } : o))
+          );
+        }));
+        stream.addEventListener('unauthorized', reopen);
+        stream.onerror = () => {
+          // EventSource retries dropped connections itself; a refused one
+          // (expired ticket, server busy) stays closed and needs a new ticket
+          if (stream.readyState === EventSource.CLOSED) reopen();
+        };
+      } catch (err) {
+        reopen();
+      }
+    };
+
+    openStream();
+    return () => {
+      unmounted = true;
+      clearTimeout(retryTimer);
+      if (stream) stream.close();
+    };
   }, []);
 
   const handleStatusChange = async (orderNumber, newStatus) => {
@@ -148,50 +239,23 @@ const Orders = () => {
                       >
                         <span>
                           {item.item_name} x {item.quantity}
-                          {item.extras && (() => {
-                            try {
-                              const extras = JSON.parse(item.extras.replace(/'/g, '"'));
-                              if (extras && extras.length > 0) {
-                                return (
-                                  <div className="ml-4 text-sm text-gray-600">
-                                    <p>Extras: {extras.map(extra => 
-                                      `${extra.name} (+R${extra.price.toFixed(2)})`
-                                    ).join(', ')}</p>
-                                  </div>
-                                );
-                              }
-                            } catch (e) {
-                              return null;
-                            }
-                          })()}
-                          {item.size && (() => {
-                            try {
-                              const size = JSON.parse(item.size.replace(/'/g, '"'));
-                              if (size && size.name) {
-                                return (
-                                  <div className="ml-4 text-sm text-gray-600">
-                                    <p>Size: {size.name} {size.price > 0 ? `(+R${size.price.toFixed(2)})` : ''}</p>
-                                  </div>
-                                );
-                              }
-                            } catch (e) {
-                              return null;
-                            }
-                          })()}
-                          {item.piece_option && (() => {
-                            try {
-                              const option = JSON.parse(item.piece_option.replace(/'/g, '"'));
-                              if (option && option.quantity) {
-                                return (
-                                  <div className="ml-4 text-sm text-gray-600">
-                                    <p>{item.piece_option && item.piece_option.length > 0} pieces(R{parseFloat(option.price).toFixed(2)})</p>
-                                  </div>
-                                );
-                              }
-                            } catch (e) {
-                              return null;
-                            }
-                          })()}
+                          {item.extras && item.extras.length > 0 && (
+                            <div className="ml-4 text-sm text-gray-600">
+                              <p>Extras: {item.extras.map(extra =>
+                                `${extra.name} (+R${extra.price.toFixed(2)})`
+                              ).join(', ')}</p>
+                            </div>
+                          )}
+                          {item.size && item.size.name && (
+                            <div className="ml-4 text-sm text-gray-600">
+                              <p>Size: {item.size.name} {item.size.price > 0 ? `(+R${item.size.price.toFixed(2)})` : ''}</p>
+                            </div>
+                          )}
+                          {item.piece_option && item.piece_option.quantity && (
+                            <div className="ml-4 text-sm text-gray-600">
+                              <p>{item.piece_option.quantity} pieces (R{parseFloat(item.piece_option.price).toFixed(2)})</p>
+                            </div>
+                          )}
                         </span>
                         <span>R{(item.price * item.quantity).toFixed(2)}</span>
                       </li>
@@ -222,6 +286,18 @@ const Orders = () => {
             No orders found
           </div>
         )}
+
+        {nextCursor && (
+          <div className="text-center">
+            <button
+              onClick={loadMoreOrders}
+              disabled={isLoadingMore}
+              className="text-sm text-yellow-600 hover:text-yellow-700 disabled:opacity-50"
+            >
+              {isLoadingMore ? 'Loading...' : 'Load older orders'}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );
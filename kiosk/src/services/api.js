@@ -1,12 +1,12 @@
 const API_URL = 'http://localhost:5000/api';
 
-export const createPaymentIntent = async (amount) => {
+export const createPaymentIntent = async (amount, items) => {
   const response = await fetch(`${API_URL}/create-payment-intent`, {
     method: 'POST',
     headers: {
       'Content-Type': 'application/json',
     },
-    body: JSON.stringify({ amount }),
+    body: JSON.stringify({ amount, items }),
   });
   
   if (!response.ok) {
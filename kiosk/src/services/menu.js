@@ -0,0 +1,162 @@
+const API_URL = 'http://localhost:5000/api';
+const STORAGE_KEY = 'menuBootstrap';
+const STOCK_TTL_MS = 5000;
+
+let menuPromise = null;
+let menuLoading = false;
+let stockPromise = null;
+let stockLoadedAt = 0;
+
+const readStoredMenu = () => {
+  try {
+    return JSON.parse(localStorage.getItem(STORAGE_KEY));
+  } catch (error) {
+    return null;
+  }
+};
+
+// Apply a bootstrap response on top of the menu we already have. A delta only
+// carries items for categories that changed; removed categories are dropped.
+const mergeMenu = (stored, update) => {
+  const items = update.full ? {} : { ...(stored?.items || {}) };
+  Object.assign(items, update.items);
+  const categoryIds = new Set(update.categories.map(category => String(category.id)));
+  Object.keys(items).forEach(id => {
+    if (!categoryIds.has(id)) delete items[id];
+  });
+  return {
+    version: update.version,
+    changeVersion: update.change_version,
+    categories: update.categories,
+    items
+  };
+};
+
+// Patch the menu with entries from /menu/changes: each one is the current
+// state of an item or category, or a tombstone when it is gone or sold out.
+const applyChanges = (menu, changes) => {
+  let categories = [...menu.categories];
+  const items = { ...menu.items };
+  changes.forEach(change => {
+    if (change.type === 'category') {
+      categories = categories.filter(category => category.id !== change.id);
+      if (change.op === 'upsert') {
+        categories.push(change.data);
+        items[String(change.id)] = items[String(change.id)] || [];
+      } else {
+        delete items[String(change.id)];
+      }
+      return;
+    }
+    Object.keys(items).forEach(id => {
+      items[id] = items[id].filter(item => item.id !== change.id);
+    });
+    if (change.op === 'upsert') {
+      const categoryId = String(change.data.category_id);
+      items[categoryId] = [...(items[categoryId] || []), change.data].sort((a, b) => a.id - b.id);
+    }
+  });
+  categories.sort((a, b) => a.id - b.id);
+  return { ...menu, categories, items };
+};
+
+const fetchBootstrap = async (stored) => {
+  const query = stored?.version ? `?since=${stored.version}` : '';
+  const response = await fetch(`${API_URL}/menu/bootstrap${query}`);
+  if (!response.ok) {
+    throw new Error('Failed to fetch menu');
+  }
+  return mergeMenu(stored, await response.json());
+};
+
+// Follow the change log from where the stored menu left off; null means the
+// log no longer reaches back that far and the menu must be reloaded.
+const fetchChanges = async (stored) => {
+  let menu = stored;
+  let more = true;
+  while (more) {
+    const response = await fetch(`${API_URL}/menu/changes?since=${menu.changeVersion}`);
+    if (!response.ok) {
+      throw new Error('Failed to fetch menu changes');
+    }
+    const update = await response.json();
+    if (update.reset) return null;
+    menu = { ...applyChanges(menu, update.changes), changeVersion: update.version };
+    more = update.more;
+  }
+  return menu;
+};
+
+const fetchMenu = async () => {
+  const stored = readStoredMenu();
+  let menu;
+  if (Number.isInteger(stored?.changeVersion)) {
+    // A pruned log means starting over from the full menu
+    menu = (await fetchChanges(stored)) || (await fetchBootstrap(null));
+  } else {
+    menu = await fetchBootstrap(stored);
+  }
+  localStorage.setItem(STORAGE_KEY, JSON.stringify(menu));
+  return menu;
+};
+
+// One request serves every page; pass refresh to pick up menu changes.
+// A refresh while a load is already in flight shares that load.
+export const loadMenu = ({ refresh = false } = {}) => {
+  if (!menuPromise || (refresh && !menuLoading)) {
+    menuLoading = true;
+    menuPromise = fetchMenu()
+      .catch(error => {
+        menuPromise = null;
+        throw error;
+      })
+      .finally(() => {
+        menuLoading = false;
+      });
+  }
+  return menuPromise;
+};
+
+// Sold-out flags change far more often than the menu, so they come from a
+// small overlay of their own instead of invalidating the cached menu
+const loadStock = () => {
+  if (!stockPromise || Date.now() - stockLoadedAt > STOCK_TTL_MS) {
+    stockLoadedAt = Date.now();
+    stockPromise = fetch(`${API_URL}/menu/stock`)
+      .then(response => (response.ok ? response.json() : null))
+      // Without the overlay the server still refuses sold-out items at checkout
+      .catch(() => null);
+  }
+  return stockPromise;
+};
+
+// Proxied images come as /api/images/... paths unless the server has an
+// IMAGE_BASE_URL; they are served by the API, not by the kiosk
+export const resolveImage = (url) => (url?.startsWith('/api/') ? new URL(url, API_URL).href : url);
+
+const withImage = (entry) => ({ ...entry, image_url: resolveImage(entry.image_url) });
+
+const applyStock = (items, stock) => {
+  if (!stock) return items.map(withImage);
+  const soldOut = entity => new Set(stock[entity]?.sold_out || []);
+  const items86 = soldOut('menu_item');
+  const extras86 = soldOut('extra');
+  const sizes86 = soldOut('size');
+  return items
+    .filter(item => !items86.has(item.id))
+    .map(item => ({
+      ...withImage(item),
+      extras: item.extras.filter(extra => !extras86.has(extra.id)),
+      sizes: item.sizes.filter(size => !sizes86.has(size.id))
+    }));
+};
+
+export const getCategories = async () => (await loadMenu()).categories.map(withImage);
+
+export const getCategoryItems = async (categoryName) => {
+  const [menu, stock] = await Promise.all([loadMenu(), loadStock()]);
+  const category = menu.categories.find(
+    cat => cat.name.toLowerCase() === categoryName.toLowerCase()
+  );
+  return category ? applyStock(menu.items[String(category.id)] || [], stock) : [];
+};